@@ -1,76 +1,802 @@
 # duplicate_tracker.py - Windows compatible duplicate tracking
+#
+# Copy of python/duplicate_tracker.py plus the DuplicateTracker signature the
+# Windows test build has always used, so this folder runs on its own.  Keep
+# the shared part in step; python/test_duplicate_tracker.py checks it.
 
-import sqlite3
+"""Duplicate tracking for scanned QR codes with pluggable storage backends.
+
+DuplicateTracker is the front end used by the scan paths.  Where recorded
+codes are stored is up to a backend:
+
+- SQLiteBackend: one SQLite file per batch (the default)
+- BitsetBackend: memory-mapped bitset files, one bit per serial
+- MemoryBackend: process memory only, for tests and benchmarks
+
+create_backend picks one by name, as configured in settings.ini.
+"""
+
+from __future__ import annotations
+
+import logging
+import mmap
 import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from collections import OrderedDict
 from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+_DB_FILENAME = "scan_state.db"
+_PARTITION_SUFFIX = ".db"
+
+_logger = logging.getLogger("duplicates")
+
+# Codes end in an alpha block letter and a 4-digit serial, e.g. VAN142536A0001
+_SERIAL_TAIL = re.compile(r"^(.*)([A-Z])(\d{4})$")
+_SERIALS_PER_BLOCK = 10000
+
+
+def _serial_ordinal(qr_code: str) -> Optional[Tuple[str, int]]:
+    """Split a QR code into (prefix, dense serial number) or None."""
+    match = _SERIAL_TAIL.match(qr_code)
+    if not match:
+        return None
+    prefix, alpha, serial = match.groups()
+    return prefix, (ord(alpha) - ord("A")) * _SERIALS_PER_BLOCK + int(serial)
+
+
+def _safe_name(batch: str) -> str:
+    """File name for a batch: letters, digits and "-" kept, every other byte as _XX.
+
+    Reversible, so distinct batches ("B.1", "B 1", "B_1") never share a file;
+    ordinary batch numbers map to themselves.
+    """
+    return "".join(
+        chr(byte) if chr(byte).isascii() and (chr(byte).isalnum() or chr(byte) == "-") else f"_{byte:02X}"
+        for byte in batch.encode("utf-8")
+    ) or "_"
+
+
+def _legacy_safe_name(batch: str) -> str:
+    """The lossy name older versions used, for migrating their files."""
+    return re.sub(r"[^A-Za-z0-9_-]", "_", batch) or "_"
+
+
+def _archive_target(archive_dir: Path, stem: str, suffix: str = "") -> Path:
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    target = archive_dir / f"{stem}_{stamp}{suffix}"
+    counter = 1
+    while target.exists():
+        target = archive_dir / f"{stem}_{stamp}_{counter}{suffix}"
+        counter += 1
+    return target
+
+
+class _BatchIndex:
+    """In-memory membership set for one batch.
+
+    Each mould range gets a bitset with one bit per cartridge, capacities[mould]
+    bits long (logic.calculate_batch_size of the range), so a 100k-cartridge
+    batch costs a few kilobytes.  A code's bit is its position counted the
+    same way: the start block from the start serial, later blocks from 0001.
+    Codes the bitsets cannot address (a range whose ends differ before the
+    alpha block, a mould without a capacity, serial 0000 after the first
+    block, or a code without a numeric serial) go into a plain set instead.
+    """
+
+    __slots__ = ("_starts", "_ends", "_bitsets", "_extra")
+
+    def __init__(self, mould_ranges: Iterable[Tuple[str, Tuple[str, str]]], capacities: Mapping[str, int]) -> None:
+        self._starts: List[str] = []
+        self._ends: List[str] = []
+        self._bitsets: List[Tuple[str, str, int, bytearray]] = []
+        self._extra: set = set()
+        for mould, (start, end) in sorted(mould_ranges, key=lambda item: item[1]):
+            first, last = _SERIAL_TAIL.match(start), _SERIAL_TAIL.match(end)
+            size = capacities.get(mould, 0)
+            if not first or not last or first.group(1) != last.group(1) or size <= 0:
+                continue
+            self._starts.append(start)
+            self._ends.append(end)
+            self._bitsets.append((first.group(1), first.group(2), int(first.group(3)), bytearray((size + 7) // 8)))
+
+    def _slot(self, qr_code: str) -> Optional[Tuple[bytearray, int]]:
+        pos = bisect_right(self._starts, qr_code) - 1
+        if pos < 0 or qr_code > self._ends[pos]:
+            return None
+        match = _SERIAL_TAIL.match(qr_code)
+        prefix, alpha, start_serial, bits = self._bitsets[pos]
+        if match is None or match.group(1) != prefix:
+            return None
+        blocks, serial = ord(match.group(2)) - ord(alpha), int(match.group(3))
+        if blocks and not serial:
+            return None
+        offset = blocks * (_SERIALS_PER_BLOCK - 1) + serial - start_serial
+        if not 0 <= offset < len(bits) * 8:
+            return None
+        return bits, offset
+
+    def __contains__(self, qr_code: str) -> bool:
+        slot = self._slot(qr_code)
+        if slot is None:
+            return qr_code in self._extra
+        bits, offset = slot
+        return bool(bits[offset >> 3] & (1 << (offset & 7)))
+
+    def add(self, qr_code: str) -> None:
+        slot = self._slot(qr_code)
+        if slot is None:
+            self._extra.add(qr_code)
+            return
+        bits, offset = slot
+        bits[offset >> 3] |= 1 << (offset & 7)
+
+    def clear(self) -> None:
+        for _, _, bits in self._bitsets:
+            bits[:] = bytes(len(bits))
+        self._extra.clear()
+
+
+# ---------------- Storage Backends ----------------
+class BaseDuplicateBackend(ABC):
+    """Interface for storing recorded QR codes, partitioned by batch.
+
+    Backends need not be thread-safe; DuplicateTracker serialises calls.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def contains(self, batch: str, qr_code: str) -> bool:
+        ...
+
+    @abstractmethod
+    def insert(self, batch: str, qr_code: str) -> bool:
+        """Store qr_code; True if it was not stored before."""
+
+    @abstractmethod
+    def insert_many(self, batch: str, qr_codes: List[str]) -> None:
+        ...
+
+    @abstractmethod
+    def codes(self, batch: str) -> List[str]:
+        ...
+
+    @abstractmethod
+    def count(self, batch: str) -> int:
+        ...
+
+    def sync(self) -> None:
+        """Make earlier writes durable; no-op where every write already is."""
+
+    @abstractmethod
+    def drop(self, batch: str) -> None:
+        ...
+
+    @abstractmethod
+    def archive(self, batch: str) -> Optional[Path]:
+        """Move batch out of the working set; return where it went, if anywhere."""
+
+    @abstractmethod
+    def close(self) -> None:
+        ...
+
+
+class SQLiteBackend(BaseDuplicateBackend):
+    """One SQLite file per batch under <db stem>_batches/.
+
+    Dropping a batch unlinks its file and archiving moves it to archive/, so
+    neither cost grows with history.  Rows left in an old shared scanned_qr
+    table in db_path (batch/qr or batch_number/qr_code columns) are moved
+    into a batch's file the first time that batch is opened.
+
+    Looking up a batch that has no file yet does not create one, and at most
+    MAX_OPEN_PARTITIONS connections stay open; the least recently used is
+    closed when another batch is opened.
+    """
+
+    name = "sqlite"
+    MAX_OPEN_PARTITIONS = 4
+
+    def __init__(self, db_path: Optional[Path | str] = None) -> None:
+        path = Path(db_path or _DB_FILENAME)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._partition_dir = path.with_name(f"{path.stem}_batches")
+        self._archive_dir = self._partition_dir / "archive"
+        self._partition_dir.mkdir(exist_ok=True)
+        self._partitions: "OrderedDict[str, sqlite3.Connection]" = OrderedDict()
+        self._legacy_conn: Optional[sqlite3.Connection] = None
+        self._legacy_columns = ("batch", "qr")
+        if path.exists():
+            conn = sqlite3.connect(path, check_same_thread=False)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(scanned_qr)")]
+            if "batch_number" in columns:
+                self._legacy_columns = ("batch_number", "qr_code")
+            if columns and conn.execute("SELECT 1 FROM scanned_qr LIMIT 1").fetchone():
+                self._legacy_conn = conn
+            else:
+                conn.close()
+
+    def _partition_path(self, batch: str) -> Path:
+        return self._partition_dir / f"{_safe_name(batch)}{_PARTITION_SUFFIX}"
+
+    def _has_legacy_rows(self, batch: str) -> bool:
+        if self._legacy_conn is None:
+            return False
+        batch_col, _ = self._legacy_columns
+        row = self._legacy_conn.execute(f"SELECT 1 FROM scanned_qr WHERE {batch_col} = ? LIMIT 1", (batch,))
+        return row.fetchone() is not None
+
+    def _find_partition(self, batch: str) -> Optional[sqlite3.Connection]:
+        """The batch's connection for reading, or None if nothing was ever stored for it."""
+        conn = self._partitions.get(batch)
+        if conn is not None:
+            self._partitions.move_to_end(batch)
+            return conn
+        if self._migrate_file(batch).exists() or self._has_legacy_rows(batch):
+            return self._partition(batch)
+        return None
+
+    def _migrate_file(self, batch: str) -> Path:
+        """Rename a file written under the old lossy naming scheme; return the batch's path."""
+        path = self._partition_path(batch)
+        legacy_path = self._partition_dir / f"{_legacy_safe_name(batch)}{_PARTITION_SUFFIX}"
+        if not path.exists() and legacy_path != path and legacy_path.exists():
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(f"{legacy_path}{suffix}"):
+                    os.replace(f"{legacy_path}{suffix}", f"{path}{suffix}")
+        return path
+
+    def _partition(self, batch: str) -> sqlite3.Connection:
+        conn = self._partitions.get(batch)
+        if conn is not None:
+            self._partitions.move_to_end(batch)
+            return conn
+        conn = sqlite3.connect(self._migrate_file(batch), check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA synchronous=NORMAL;")
+        conn.execute("CREATE TABLE IF NOT EXISTS scanned_qr (qr TEXT PRIMARY KEY) WITHOUT ROWID")
+        if self._legacy_conn is not None:
+            batch_col, qr_col = self._legacy_columns
+            rows = self._legacy_conn.execute(
+                f"SELECT {qr_col} FROM scanned_qr WHERE {batch_col} = ?", (batch,)
+            ).fetchall()
+            if rows:
+                conn.executemany("INSERT OR IGNORE INTO scanned_qr (qr) VALUES (?)", rows)
+                self._legacy_conn.execute(f"DELETE FROM scanned_qr WHERE {batch_col} = ?", (batch,))
+                self._legacy_conn.commit()
+        conn.commit()
+        self._partitions[batch] = conn
+        while len(self._partitions) > self.MAX_OPEN_PARTITIONS:
+            _, idle = self._partitions.popitem(last=False)
+            idle.close()
+        return conn
+
+    def _close_partition(self, batch: str) -> Path:
+        conn = self._partitions.pop(batch, None)
+        if conn is not None:
+            conn.close()
+        return self._migrate_file(batch)
+
+    def contains(self, batch: str, qr_code: str) -> bool:
+        conn = self._find_partition(batch)
+        if conn is None:
+            return False
+        return conn.execute("SELECT 1 FROM scanned_qr WHERE qr = ? LIMIT 1", (qr_code,)).fetchone() is not None
+
+    def insert(self, batch: str, qr_code: str) -> bool:
+        conn = self._partition(batch)
+        cur = conn.execute("INSERT OR IGNORE INTO scanned_qr (qr) VALUES (?)", (qr_code,))
+        conn.commit()
+        return cur.rowcount == 1
+
+    def insert_many(self, batch: str, qr_codes: List[str]) -> None:
+        conn = self._partition(batch)
+        conn.executemany("INSERT OR IGNORE INTO scanned_qr (qr) VALUES (?)", ((qr,) for qr in qr_codes))
+        conn.commit()
+
+    def codes(self, batch: str) -> List[str]:
+        conn = self._find_partition(batch)
+        return [qr for (qr,) in conn.execute("SELECT qr FROM scanned_qr")] if conn is not None else []
+
+    def count(self, batch: str) -> int:
+        conn = self._find_partition(batch)
+        return conn.execute("SELECT COUNT(*) FROM scanned_qr").fetchone()[0] if conn is not None else 0
+
+    def drop(self, batch: str) -> None:
+        path = self._close_partition(batch)
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.unlink(f"{path}{suffix}")
+            except FileNotFoundError:
+                pass
+        if self._legacy_conn is not None:
+            batch_col, _ = self._legacy_columns
+            self._legacy_conn.execute(f"DELETE FROM scanned_qr WHERE {batch_col} = ?", (batch,))
+            self._legacy_conn.commit()
+
+    def archive(self, batch: str) -> Optional[Path]:
+        path = self._close_partition(batch)
+        if not path.exists():
+            return None
+        target = _archive_target(self._archive_dir, path.stem, _PARTITION_SUFFIX)
+        os.replace(path, target)
+        return target
+
+    def close(self) -> None:
+        for batch in list(self._partitions):
+            self._close_partition(batch)
+        if self._legacy_conn is not None:
+            self._legacy_conn.close()
+            self._legacy_conn = None
+
+
+class MemoryBackend(BaseDuplicateBackend):
+    """Keeps codes in process memory only; nothing survives a restart."""
+
+    name = "memory"
+
+    def __init__(self) -> None:
+        self._batches: Dict[str, Set[str]] = {}
+
+    def contains(self, batch: str, qr_code: str) -> bool:
+        return qr_code in self._batches.get(batch, ())
+
+    def insert(self, batch: str, qr_code: str) -> bool:
+        codes = self._batches.setdefault(batch, set())
+        if qr_code in codes:
+            return False
+        codes.add(qr_code)
+        return True
 
+    def insert_many(self, batch: str, qr_codes: List[str]) -> None:
+        self._batches.setdefault(batch, set()).update(qr_codes)
+
+    def codes(self, batch: str) -> List[str]:
+        return list(self._batches.get(batch, ()))
+
+    def count(self, batch: str) -> int:
+        return len(self._batches.get(batch, ()))
+
+    def drop(self, batch: str) -> None:
+        self._batches.pop(batch, None)
+
+    def archive(self, batch: str) -> Optional[Path]:
+        self._batches.pop(batch, None)
+        return None
+
+    def close(self) -> None:
+        self._batches.clear()
+
+
+class _BitsetPartition:
+    """Memory-mapped bitsets for one batch: one file per QR prefix."""
+
+    _PREFIX = re.compile(r"^[A-Z0-9]+$")
+    _SIZE = (26 * _SERIALS_PER_BLOCK + 7) // 8
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        directory.mkdir(parents=True, exist_ok=True)
+        self._maps: Dict[str, Tuple[object, mmap.mmap]] = {}
+        self._extra_path = directory / "extra.txt"
+        self._extra: Set[str] = set()
+        if self._extra_path.exists():
+            self._extra.update(self._extra_path.read_text(encoding="utf-8").split())
+        for bits_file in directory.glob("*.bits"):
+            self._map(bits_file.stem)
+
+    def _map(self, prefix: str) -> mmap.mmap:
+        entry = self._maps.get(prefix)
+        if entry is not None:
+            return entry[1]
+        path = self.directory / f"{prefix}.bits"
+        if not path.exists():
+            with open(path, "wb") as handle:
+                handle.truncate(self._SIZE)
+        handle = open(path, "r+b")
+        data = mmap.mmap(handle.fileno(), self._SIZE)
+        self._maps[prefix] = (handle, data)
+        return data
+
+    def _slot(self, qr_code: str, create: bool) -> Optional[Tuple[Optional[mmap.mmap], int]]:
+        ordinal = _serial_ordinal(qr_code)
+        if ordinal is None or not self._PREFIX.match(ordinal[0]):
+            return None
+        prefix, offset = ordinal
+        if prefix not in self._maps and not create:
+            return (None, offset)
+        return self._map(prefix), offset
+
+    def contains(self, qr_code: str) -> bool:
+        slot = self._slot(qr_code, create=False)
+        if slot is None:
+            return qr_code in self._extra
+        data, offset = slot
+        return data is not None and bool(data[offset >> 3] >> (offset & 7) & 1)
+
+    def insert(self, qr_code: str) -> bool:
+        slot = self._slot(qr_code, create=True)
+        if slot is None:
+            if qr_code in self._extra:
+                return False
+            self._extra.add(qr_code)
+            with open(self._extra_path, "a", encoding="utf-8") as handle:
+                handle.write(qr_code + "\n")
+            return True
+        data, offset = slot
+        mask = 1 << (offset & 7)
+        if data[offset >> 3] & mask:
+            return False
+        data[offset >> 3] |= mask
+        return True
+
+    def codes(self) -> List[str]:
+        found = list(self._extra)
+        for prefix, (_, data) in self._maps.items():
+            raw = data[:]
+            for index, byte in enumerate(raw):
+                if not byte:
+                    continue
+                for bit in range(8):
+                    if byte >> bit & 1:
+                        ordinal = index * 8 + bit
+                        alpha, serial = divmod(ordinal, _SERIALS_PER_BLOCK)
+                        found.append(f"{prefix}{chr(ord('A') + alpha)}{serial:04d}")
+        return found
+
+    def count(self) -> int:
+        total = len(self._extra)
+        for _, data in self._maps.values():
+            total += bin(int.from_bytes(data[:], "little")).count("1")
+        return total
+
+    def sync(self) -> None:
+        for _, data in self._maps.values():
+            data.flush()
+
+    def close(self) -> None:
+        for handle, data in self._maps.values():
+            data.flush()
+            data.close()
+            handle.close()
+        self._maps.clear()
+
+
+class BitsetBackend(BaseDuplicateBackend):
+    """Memory-mapped bitset files under <db stem>_bitsets/<batch>/.
+
+    Every QR prefix (the code minus its alpha block and serial) gets a 32.5 KB
+    file with one bit per possible serial, so lookups never leave memory and
+    the OS writes dirty pages back; sync() forces them out.  Codes without a
+    numeric serial are appended to extra.txt.
+    """
+
+    name = "bitset"
+
+    def __init__(self, db_path: Optional[Path | str] = None) -> None:
+        path = Path(db_path or _DB_FILENAME)
+        self._root = path.with_name(f"{path.stem}_bitsets")
+        self._archive_dir = self._root / "archive"
+        self._root.mkdir(parents=True, exist_ok=True)
+        self._partitions: Dict[str, _BitsetPartition] = {}
+
+    def _partition(self, batch: str) -> _BitsetPartition:
+        partition = self._partitions.get(batch)
+        if partition is None:
+            partition = _BitsetPartition(self._root / _safe_name(batch))
+            self._partitions[batch] = partition
+        return partition
+
+    def contains(self, batch: str, qr_code: str) -> bool:
+        return self._partition(batch).contains(qr_code)
+
+    def insert(self, batch: str, qr_code: str) -> bool:
+        return self._partition(batch).insert(qr_code)
+
+    def insert_many(self, batch: str, qr_codes: List[str]) -> None:
+        partition = self._partition(batch)
+        for qr_code in qr_codes:
+            partition.insert(qr_code)
+
+    def codes(self, batch: str) -> List[str]:
+        return self._partition(batch).codes()
+
+    def count(self, batch: str) -> int:
+        return self._partition(batch).count()
+
+    def sync(self) -> None:
+        for partition in self._partitions.values():
+            partition.sync()
+
+    def _close_partition(self, batch: str) -> Path:
+        partition = self._partitions.pop(batch, None)
+        if partition is not None:
+            partition.close()
+        return self._root / _safe_name(batch)
+
+    def drop(self, batch: str) -> None:
+        shutil.rmtree(self._close_partition(batch), ignore_errors=True)
+
+    def archive(self, batch: str) -> Optional[Path]:
+        directory = self._close_partition(batch)
+        if not directory.exists():
+            return None
+        target = _archive_target(self._archive_dir, directory.name)
+        os.replace(directory, target)
+        return target
+
+    def close(self) -> None:
+        for batch in list(self._partitions):
+            self._close_partition(batch)
+
+
+_BACKENDS = {
+    SQLiteBackend.name: SQLiteBackend,
+    BitsetBackend.name: BitsetBackend,
+    MemoryBackend.name: MemoryBackend,
+}
+
+
+def create_backend(name: str = "sqlite", db_path: Optional[Path | str] = None) -> BaseDuplicateBackend:
+    """Build the backend called name ("sqlite", "bitset" or "memory")."""
+    key = (name or "sqlite").lower().strip()
+    if key not in _BACKENDS:
+        raise ValueError(f"Unknown duplicate backend: {name}")
+    if key == MemoryBackend.name:
+        return MemoryBackend()
+    return _BACKENDS[key](db_path)
+
+
+# ---------------- Tracker ----------------
 class DuplicateTracker:
+    """Track scanned QR codes per batch on top of a storage backend.
+
+    backend defaults to SQLiteBackend(db_path).  Batches registered with
+    load_batch are answered from an in-memory bitset index, so the backend
+    then only provides durability; other batches ask the backend per check.
+
+    With write_behind enabled, record_scan only queues the row and a
+    background writer stores queued rows together once commit_batch_rows
+    are waiting or commit_interval_ms has passed, whichever comes first, so
+    at most that window of scans is lost on power failure.  Queued rows are
+    still visible to already_scanned, and flush()/close() store them
+    synchronously.
+
+    global_guard is an optional qr_history.GlobalDuplicateGuard: claim then
+    also refuses codes accepted by an earlier batch, and every recorded code
+    is added to the guard as it is stored.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[Path | str] = None,
+        write_behind: bool = False,
+        commit_interval_ms: int = 250,
+        commit_batch_rows: int = 50,
+        global_guard=None,
+        backend: Optional[BaseDuplicateBackend] = None,
+    ) -> None:
+        self._backend = backend if backend is not None else SQLiteBackend(db_path)
+        self._lock = threading.Lock()
+        self._global_guard = global_guard
+        self._indexes: Dict[str, _BatchIndex] = {}
+        self._index_lock = threading.Lock()
+
+        self._pending: List[Tuple[str, str]] = []
+        self._pending_keys: set = set()
+        self._pending_cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._commit_interval = max(commit_interval_ms, 1) / 1000.0
+        self._commit_batch_rows = max(commit_batch_rows, 1)
+        self._closing = False
+        self._writer: Optional[threading.Thread] = None
+        if write_behind:
+            self._writer = threading.Thread(target=self._writer_loop, name="duplicate-writer", daemon=True)
+            self._writer.start()
+
+    @property
+    def backend_name(self) -> str:
+        return self._backend.name
+
+    # ---------------- Queries ----------------
+    def load_batch(
+        self,
+        batch: str,
+        mould_ranges: Iterable[Tuple[str, Tuple[str, str]]],
+        capacities: Mapping[str, int],
+    ) -> None:
+        """Build the in-memory index for batch and fill it from the backend in one pass.
+
+        mould_ranges yields (mould, (start_qr, end_qr)) pairs, e.g. the
+        items() of a MouldRangeIndex, and capacities maps each mould to
+        calculate_batch_size of its range (BatchContext.capacities).
+        """
+        self.flush()
+        index = _BatchIndex(mould_ranges, capacities)
+        with self._index_lock:
+            with self._lock:
+                codes = self._backend.codes(batch)
+            for qr_code in codes:
+                index.add(qr_code)
+            self._indexes[batch] = index
+
+    def already_scanned(self, batch: str, qr_code: str) -> bool:
+        with self._index_lock:
+            index = self._indexes.get(batch)
+            if index is not None:
+                return qr_code in index
+        with self._pending_cond:
+            if (batch, qr_code) in self._pending_keys:
+                return True
+        with self._lock:
+            return self._backend.contains(batch, qr_code)
+
+    def count(self, batch: str) -> int:
+        """Number of codes recorded for batch, including queued ones."""
+        self.flush()
+        with self._lock:
+            return self._backend.count(batch)
+
+    def record_scan(self, batch: str, qr_code: str) -> None:
+        with self._index_lock:
+            index = self._indexes.get(batch)
+            if index is not None:
+                index.add(qr_code)
+        self._persist(batch, qr_code)
+
+    def claim(self, batch: str, qr_code: str) -> bool:
+        """Record qr_code for batch unless it is already recorded.
+
+        Returns True when this call recorded the code and False for a
+        duplicate, replacing an already_scanned/record_scan pair with one
+        atomic step.
+        """
+        if self._global_guard is not None and self._global_guard.seen_in_other_batch(batch, qr_code):
+            return False
+        with self._index_lock:
+            index = self._indexes.get(batch)
+            if index is not None:
+                if qr_code in index:
+                    return False
+                index.add(qr_code)
+        if index is not None:
+            self._persist(batch, qr_code)
+            return True
+        with self._pending_cond:
+            if (batch, qr_code) in self._pending_keys:
+                return False
+        with self._lock:
+            inserted = self._backend.insert(batch, qr_code)
+        if inserted and self._global_guard is not None:
+            self._global_guard.record_many([(batch, qr_code)])
+        return inserted
+
+    # ---------------- Writes ----------------
+    def _persist(self, batch: str, qr_code: str) -> None:
+        if self._writer is not None:
+            with self._pending_cond:
+                if (batch, qr_code) not in self._pending_keys:
+                    self._pending.append((batch, qr_code))
+                    self._pending_keys.add((batch, qr_code))
+                    if len(self._pending) in (1, self._commit_batch_rows):
+                        self._pending_cond.notify()
+            return
+        with self._lock:
+            self._backend.insert(batch, qr_code)
+        if self._global_guard is not None:
+            self._global_guard.record_many([(batch, qr_code)])
+
+    def flush(self) -> None:
+        """Store every queued record before returning."""
+        with self._flush_lock:
+            with self._pending_cond:
+                rows, self._pending = self._pending, []
+            if not rows:
+                return
+            by_batch: Dict[str, List[str]] = {}
+            for batch, qr_code in rows:
+                by_batch.setdefault(batch, []).append(qr_code)
+            try:
+                with self._lock:
+                    for batch, codes in by_batch.items():
+                        self._backend.insert_many(batch, codes)
+                    self._backend.sync()
+            except Exception:
+                with self._pending_cond:
+                    self._pending[:0] = rows
+                raise
+            if self._global_guard is not None:
+                self._global_guard.record_many(rows)
+            with self._pending_cond:
+                self._pending_keys.difference_update(rows)
+
+    def _writer_loop(self) -> None:
+        while True:
+            with self._pending_cond:
+                self._pending_cond.wait_for(lambda: self._pending or self._closing)
+                if self._closing:
+                    return
+                self._pending_cond.wait_for(
+                    lambda: len(self._pending) >= self._commit_batch_rows or self._closing,
+                    timeout=self._commit_interval,
+                )
+            try:
+                self.flush()
+            except Exception:
+                _logger.exception("Duplicate tracker group commit failed")
+                time.sleep(self._commit_interval)
+
+    def _drop_pending(self, batch: str) -> None:
+        """Discard queued rows for batch. Caller holds _flush_lock."""
+        with self._pending_cond:
+            self._pending = [row for row in self._pending if row[0] != batch]
+            self._pending_keys = {row for row in self._pending_keys if row[0] != batch}
+
+    def reset_batch(self, batch: str) -> None:
+        """Forget every code recorded for batch."""
+        with self._index_lock:
+            index = self._indexes.get(batch)
+            if index is not None:
+                index.clear()
+        with self._flush_lock:
+            self._drop_pending(batch)
+            with self._lock:
+                self._backend.drop(batch)
+
+    def archive_batch(self, batch: str) -> Optional[Path]:
+        """Move a finished batch out of the working set.
+
+        Returns where the backend archived it, or None if it kept nothing.
+        """
+        self.flush()
+        with self._index_lock:
+            self._indexes.pop(batch, None)
+        with self._flush_lock:
+            self._drop_pending(batch)
+            with self._lock:
+                return self._backend.archive(batch)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            with self._pending_cond:
+                self._closing = True
+                self._pending_cond.notify_all()
+            self._writer.join()
+            self._writer = None
+        self.flush()
+        with self._index_lock:
+            self._indexes.clear()
+        with self._lock:
+            self._backend.close()
+        if self._global_guard is not None:
+            self._global_guard.close()
+
+
+# ---------------- Windows test build API ----------------
+_SharedDuplicateTracker = DuplicateTracker
+
+
+class DuplicateTracker(_SharedDuplicateTracker):
     """Track scanned QR codes per batch to detect duplicates."""
-    
-    def __init__(self, db_path="scan_state.db"):
-        """Initialize tracker with SQLite database."""
+
+    def __init__(self, db_path="scan_state.db", backend="sqlite"):
+        """Initialize tracker with the named storage backend."""
         self.db_path = db_path
-        self._init_db()
-    
-    def _init_db(self):
-        """Create tables if they don't exist."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS scanned_qr (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                batch_number TEXT NOT NULL,
-                qr_code TEXT NOT NULL,
-                timestamp TEXT NOT NULL,
-                UNIQUE(batch_number, qr_code)
-            )
-        """)
-        conn.commit()
-        conn.close()
-    
-    def already_scanned(self, batch_number: str, qr_code: str) -> bool:
-        """Check if QR code was already scanned for this batch."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT COUNT(*) FROM scanned_qr WHERE batch_number = ? AND qr_code = ?",
-            (batch_number, qr_code)
-        )
-        count = cursor.fetchone()[0]
-        conn.close()
-        return count > 0
-    
-    def record_scan(self, batch_number: str, qr_code: str):
-        """Record a scanned QR code."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        try:
-            cursor.execute(
-                "INSERT INTO scanned_qr (batch_number, qr_code, timestamp) VALUES (?, ?, ?)",
-                (batch_number, qr_code, timestamp)
-            )
-            conn.commit()
-        except sqlite3.IntegrityError:
-            pass  # Already exists
-        conn.close()
-    
+        super().__init__(db_path, backend=create_backend(backend, db_path))
+
     def clear_batch(self, batch_number: str):
         """Clear all scans for a batch."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM scanned_qr WHERE batch_number = ?", (batch_number,))
-        conn.commit()
-        conn.close()
-    
+        self.reset_batch(batch_number)
+
     def get_batch_count(self, batch_number: str) -> int:
         """Get count of scanned QR codes for a batch."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT COUNT(*) FROM scanned_qr WHERE batch_number = ?",
-            (batch_number,)
-        )
-        count = cursor.fetchone()[0]
-        conn.close()
-        return count
+        return self.count(batch_number)
@@ -7,8 +7,12 @@ import os
 import re
 import string
 import time
+from bisect import bisect_right
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Callable, Optional
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Callable, Dict, Mapping, Optional, Tuple
 
 # Minimal shims to avoid hard dependency on tkinter or hardware in SCANNER app
 try:
@@ -25,7 +29,7 @@ except Exception:
 
 # Hardware signaling is optional for SCANNER integration
 try:
-    from hardware import get_hardware_controller  # type: ignore
+    from hardware import FeedbackPattern, FeedbackScheduler, get_hardware_controller  # type: ignore
     _hardware = get_hardware_controller()
 except Exception:  # pragma: no cover - no hardware on dev
     _hardware = None
@@ -58,39 +62,94 @@ def _handle_hardware_exception(exc: Exception) -> None:
             _hardware_logger.exception("Hardware error handler raised an exception")
 
 
+# Feedback runs on the scheduler thread so the UART reply is never delayed.
+_feedback = FeedbackScheduler(_hardware, on_error=_handle_hardware_exception) if _hardware else None
+
+
 def blink_light(color, duration=0.1):
-    if not _hardware:
+    if not _feedback:
         return
-    try:
-        _hardware.light_on(color)
-        time.sleep(duration)
-        _hardware.light_off(color)
-    except Exception as exc:
-        _handle_hardware_exception(exc)
+    _feedback.submit(FeedbackPattern(color, duration))
 
 
 def buzz(duration=0.1):
-    if not _hardware:
+    if not _feedback:
         return
-    try:
-        _hardware.buzz(duration)
-    except Exception as exc:
-        _handle_hardware_exception(exc)
+    _feedback.submit(FeedbackPattern(None, 0.0, duration))
+
+
+def signal_reject(duration=0.1):
+    """Red light with the buzzer sounding over it, as a single pattern."""
+    if not _feedback:
+        return
+    _feedback.submit(FeedbackPattern("RED", duration, duration))
+
+
+# ---------------- Parsed QR Codes ----------------
+
+QR_LENGTH = 14
+_BATCH_NUMBER_PATTERN = re.compile(r"^M[V][A-Z][A-Z]{2}\d{5}$")
+_QR_TAIL_PATTERN = re.compile(r"([A-Z])(\d{4})$")
+
+
+def _range_key(text: str) -> Optional[tuple]:
+    """Range-check key: (the code up to its last 4 characters, those as a number).
+
+    None when the last 4 characters are not digits; such a code is never
+    inside a mould range, even one that spans two alpha blocks.
+    """
+    tail = text[-4:]
+    if not (tail.isascii() and tail.isdigit()):
+        return None
+    return (text[:-4], int(tail))
+
+
+class QRCode:
+    """A QR code split into line, mould type, alpha block and serial once."""
+
+    __slots__ = ("text", "well_formed", "line", "mould_type", "alpha_block", "serial", "key")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.well_formed = len(text) == QR_LENGTH and text.isalnum()
+        self.line = text[1:2]
+        self.mould_type = text[2:5]
+        tail = _QR_TAIL_PATTERN.search(text)
+        self.alpha_block = tail.group(1) if tail else None
+        self.serial = int(tail.group(2)) if tail else None
+        self.key = _range_key(text) if self.well_formed else None
+
+    def __str__(self) -> str:
+        return self.text
+
+    def __repr__(self) -> str:
+        return f"QRCode({self.text!r})"
+
+
+@lru_cache(maxsize=4096)
+def parse_qr(text: str) -> QRCode:
+    return QRCode(text)
+
+
+def as_qr(qr_code) -> QRCode:
+    if isinstance(qr_code, QRCode):
+        return qr_code
+    return parse_qr(qr_code)
 
 
 # ---------------- Validators ----------------
 
 def validate_batch_number(batch_no: str) -> bool:
-    pattern = r"^M[V][A-Z][A-Z]{2}\d{5}$"
-    return re.match(pattern, batch_no) is not None
+    return _BATCH_NUMBER_PATTERN.match(batch_no) is not None
 
 
-def validate_qr_format(qr_code: str) -> bool:
-    return len(qr_code) == 14 and qr_code.isalnum()
+def validate_qr_format(qr_code) -> bool:
+    return as_qr(qr_code).well_formed
 
 
-def validate_qr_match(qr_code: str, line: str, mould_type: str) -> bool:
-    return len(qr_code) >= 5 and qr_code[1] == line and qr_code[2:5] == mould_type
+def validate_qr_match(qr_code, line: str, mould_type: str) -> bool:
+    qr = as_qr(qr_code)
+    return len(qr.text) >= 5 and qr.line == line and qr.mould_type == mould_type
 
 
 def batch_number_validator(val: str) -> bool:
@@ -109,37 +168,170 @@ def mould_name_validator(val: str) -> bool:
     return all(ch.isalnum() for ch in val[1:])
 
 
-def qr_validator(val: str, line_val: str, mould_type: str) -> bool:
+def qr_validator(val, line_val: str, mould_type: str) -> bool:
     return validate_qr_format(val) and validate_qr_match(val, line_val, mould_type)
 
 
+# ---------------- Batch Calculation ----------------
+
+def calculate_batch_size(qr_start, qr_end) -> int:
+    """Calculate the number of QR codes between the provided range."""
+    start, end = as_qr(qr_start), as_qr(qr_end)
+    if start.serial is None or end.serial is None:
+        return 0
+    alpha_list = list(string.ascii_uppercase)
+    start_index = alpha_list.index(start.alpha_block)
+    end_index = alpha_list.index(end.alpha_block)
+    total_count = 0
+    for offset in range(end_index - start_index + 1):
+        if start_index == end_index:
+            total_count += end.serial - start.serial + 1
+        elif offset == 0:
+            total_count += 9999 - start.serial + 1
+        elif offset == (end_index - start_index):
+            total_count += end.serial
+        else:
+            total_count += 9999
+    return total_count
+
+
+# ---------------- Mould Range Index ----------------
+
+class MouldRangeIndex:
+    """Sorted, non-overlapping mould QR ranges with bisect lookup.
+
+    Bounds are compared as parsed QRCode keys (head, numeric serial).
+    Malformed, inverted or overlapping ranges raise ValueError when the
+    index is built.
+    """
+
+    __slots__ = ("_starts", "_ends", "_moulds", "_ranges")
+
+    def __init__(self, mould_ranges: Dict[str, Tuple[str, str]]):
+        entries = []
+        for mould, (start, end) in mould_ranges.items():
+            start_qr, end_qr = as_qr(start), as_qr(end)
+            if start_qr.key is None or end_qr.key is None:
+                raise ValueError(f"Mould {mould}: QR range {start}-{end} is not a pair of valid QR codes")
+            if start_qr.key > end_qr.key:
+                raise ValueError(f"Mould {mould}: QR start {start} is after QR end {end}")
+            entries.append((start_qr.key, end_qr.key, mould))
+        entries.sort()
+        for (_, prev_end, prev_mould), (start, _, mould) in zip(entries, entries[1:]):
+            if start <= prev_end:
+                raise ValueError(f"Mould {mould} QR range overlaps mould {prev_mould}")
+        self._starts = [start for start, _, _ in entries]
+        self._ends = [end for _, end, _ in entries]
+        self._moulds = [mould for _, _, mould in entries]
+        self._ranges = dict(mould_ranges)
+
+    def lookup(self, qr_code) -> Optional[str]:
+        key = as_qr(qr_code).key
+        if key is None:
+            return None
+        pos = bisect_right(self._starts, key) - 1
+        if pos >= 0 and key <= self._ends[pos]:
+            return self._moulds[pos]
+        return None
+
+    def items(self):
+        return self._ranges.items()
+
+    def __len__(self) -> int:
+        return len(self._moulds)
+
+    def __contains__(self, mould) -> bool:
+        return mould in self._ranges
+
+
+def as_range_index(mould_ranges) -> MouldRangeIndex:
+    if isinstance(mould_ranges, MouldRangeIndex):
+        return mould_ranges
+    return MouldRangeIndex(mould_ranges or {})
+
+
 # ---------------- QR Scan Logic ----------------
 
-def handle_qr_scan(qr_code: str, batch_line: str, mould_ranges: dict, duplicate_checker: Optional[Callable[[str], bool]] = None):
-    """Validate a QR code and return (status, mould)."""
-    if not validate_qr_format(qr_code):
-        blink_light("RED")
-        buzz()
+def handle_qr_scan(
+    qr_code,
+    batch_line: str,
+    mould_ranges,
+    duplicate_checker: Optional[Callable[[str], bool]] = None,
+    claim: Optional[Callable[[str], bool]] = None,
+):
+    """Validate a QR code and return (status, mould).
+
+    qr_code may be a string or a QRCode; it is parsed once per scan.
+    mould_ranges is the shared MouldRangeIndex; plain dicts are indexed per call.
+    claim, if given, records the code and returns False for a duplicate; it
+    replaces duplicate_checker plus a later record_scan.
+    """
+    qr = as_qr(qr_code)
+    if not qr.well_formed:
+        signal_reject()
         return "INVALID FORMAT", None
 
-    if not batch_line or qr_code[1] != batch_line:
-        blink_light("RED")
-        buzz()
+    if not batch_line or qr.line != batch_line:
+        signal_reject()
         return "LINE MISMATCH", None
 
-    for mould, (start, end) in mould_ranges.items():
-        if start <= qr_code <= end:
-            if duplicate_checker and duplicate_checker(qr_code):
-                blink_light("YELLOW")
-                return "DUPLICATE", mould
-            blink_light("GREEN")
-            return "PASS", mould
-
-    blink_light("RED")
-    buzz()
+    mould = as_range_index(mould_ranges).lookup(qr)
+    if mould is not None:
+        if claim is not None:
+            duplicate = not claim(qr.text)
+        else:
+            duplicate = bool(duplicate_checker and duplicate_checker(qr.text))
+        if duplicate:
+            blink_light("YELLOW")
+            return "DUPLICATE", mould
+        blink_light("GREEN")
+        return "PASS", mould
+
+    signal_reject()
     return "OUT OF BATCH", None
 
 
+# ---------------- Batch Context ----------------
+
+@dataclass(frozen=True)
+class BatchContext:
+    """Immutable per-batch state built once when the batch is loaded.
+
+    duplicates is a DuplicateTracker-style handle or None; capacities maps
+    each mould to calculate_batch_size for its range.
+    """
+
+    batch_number: str
+    line: str
+    range_index: MouldRangeIndex
+    duplicates: Optional[object] = None
+    capacities: Mapping[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def create(cls, batch_number: str, line: str, mould_ranges, duplicates=None) -> "BatchContext":
+        """Raises ValueError for malformed, inverted or overlapping ranges."""
+        index = as_range_index(mould_ranges)
+        capacities = {mould: calculate_batch_size(start, end) for mould, (start, end) in index.items()}
+        load_batch = getattr(duplicates, "load_batch", None)
+        if load_batch and batch_number:
+            load_batch(batch_number, index.items(), capacities)
+        return cls(batch_number, line, index, duplicates, MappingProxyType(capacities))
+
+    def is_duplicate(self, qr_code) -> bool:
+        if self.duplicates is None or not self.batch_number:
+            return False
+        return self.duplicates.already_scanned(self.batch_number, str(qr_code))
+
+    def claim(self, qr_code) -> bool:
+        if self.duplicates is None or not self.batch_number:
+            return True
+        return self.duplicates.claim(self.batch_number, str(qr_code))
+
+    def scan(self, qr_code) -> Tuple[str, Optional[str]]:
+        """A PASS is already recorded when this returns."""
+        return handle_qr_scan(qr_code, self.line, self.range_index, claim=self.claim)
+
+
 # ---------------- CSV Logging helpers (optional) ----------------
 
 def init_log(batch_number: str):
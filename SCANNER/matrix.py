@@ -19,10 +19,11 @@ import json
 # New validation modules
 try:
     from duplicate_tracker import DuplicateTracker
-    from logic import handle_qr_scan
+    from logic import BatchContext, handle_qr_scan
 except Exception as _e:
     # Fallback no-op shims if modules are unavailable during import-time
     DuplicateTracker = None  # type: ignore
+    BatchContext = None  # type: ignore
     def handle_qr_scan(qr_code, batch_line, mould_ranges, duplicate_checker=None):  # type: ignore
         return "OUT OF BATCH", None
 import settings
@@ -36,6 +37,7 @@ import threading
 import select
 import binascii
 import mmap
+from collections import deque
 mutex_wrkrbusy = threading.Lock()
 
 # Get the directory where matrix.py is located
@@ -45,6 +47,8 @@ cube="NA"
 line="NA"
 batch_number = ""  # Added: batch number for new validation
 _mould_ranges = {}   # Added: mould ranges loaded from setup file
+_batch_context = None  # BatchContext built once from batch_number, line and _mould_ranges
+_duplicate_tracker = None  # shared DuplicateTracker, opened on first use
 user="NA"
 trigger=False
 inscanner=True
@@ -133,6 +137,67 @@ def _load_mould_ranges(batch_no: str, line_letter: str):
         pass
     return ranges
                     
+def _get_duplicate_tracker():
+    global _duplicate_tracker
+    if _duplicate_tracker is None and DuplicateTracker is not None:
+        try:
+            _duplicate_tracker = DuplicateTracker()
+        except Exception as e:
+            print(f"Duplicate tracker unavailable: {e}")
+    return _duplicate_tracker
+
+def _build_batch_context(ranges):
+    """Build the shared BatchContext for the current batch_number and line.
+
+    Overlapping or inverted ranges are reported and leave the batch with no
+    valid ranges, so every cartridge is rejected until the setup is fixed.
+    """
+    if BatchContext is None:
+        return None
+    try:
+        return BatchContext.create(batch_number, line, ranges, _get_duplicate_tracker())
+    except ValueError as e:
+        print(f"Invalid mould ranges: {e}")
+        return BatchContext.create(batch_number, line, {}, _get_duplicate_tracker())
+
+RECENT_SCAN_WINDOW = 50  # accepted cartridges remembered for the repeat check
+
+class RecentScans:
+    """The last `size` accepted cartridge codes, for the repeat check.
+
+    A deque keeps insertion order and a Counter-style dict answers membership
+    in O(1), replacing a query over the newest rows of the cartridge table on
+    every scan.
+    """
+
+    def __init__(self, size=RECENT_SCAN_WINDOW):
+        self._order = deque()
+        self._counts = {}
+        self._size = size
+
+    @classmethod
+    def from_db(cls, conn, size=RECENT_SCAN_WINDOW):
+        recent = cls(size)
+        rows = conn.execute(
+            "SELECT CARTRIDGE FROM cartridge ORDER BY SERIAL DESC LIMIT ?", (size,)
+        ).fetchall()
+        for (qr,) in reversed(rows):
+            recent.add(qr)
+        return recent
+
+    def __contains__(self, qr):
+        return qr in self._counts
+
+    def add(self, qr):
+        self._order.append(qr)
+        self._counts[qr] = self._counts.get(qr, 0) + 1
+        if len(self._order) > self._size:
+            old = self._order.popleft()
+            if self._counts[old] == 1:
+                del self._counts[old]
+            else:
+                self._counts[old] -= 1
+
 # Batch Setup dialog placed before Window2 to satisfy static analyzers
     
 
@@ -212,8 +277,9 @@ class Window2(QMainWindow):
                 # Refresh labels in settings window after save
                 loadsettings()
                 # Refresh global mould ranges in memory
-                global _mould_ranges
+                global _mould_ranges, _batch_context
                 _mould_ranges = _load_mould_ranges(batch_number, line)
+                _batch_context = _build_batch_context(_mould_ranges)
                 self.w.curline.setText("Current line: "+line)
                 self.w.curcube.setText("Current cubicle: "+cube)
         except Exception as e:
@@ -259,8 +325,9 @@ class Window2(QMainWindow):
         try:
             if hasattr(self, 'main_window') and self.main_window:
                 # Reload mould ranges with new batch data
-                global _mould_ranges
+                global _mould_ranges, _batch_context
                 _mould_ranges = _load_mould_ranges(batch_number, line)
+                _batch_context = _build_batch_context(_mould_ranges)
                 print(f"Reloaded mould ranges: {len(_mould_ranges)} moulds for batch {batch_number}")
                 
                 # Update batch display in MATRIX field
@@ -424,10 +491,11 @@ class BatchSetupDialog(QtWidgets.QDialog):
                 print(e)
 
             # Update globals for immediate use
-            global batch_number, line, _mould_ranges
+            global batch_number, line, _mould_ranges, _batch_context
             batch_number = bn
             line = ln
             _mould_ranges = _load_mould_ranges(batch_number, line)
+            _batch_context = _build_batch_context(_mould_ranges)
 
             self.accept()
         except Exception as e:
@@ -710,8 +778,9 @@ class matrix_gui(QtWidgets.QDockWidget):
             
 
             # Load mould ranges for validation
-            global _mould_ranges
+            global _mould_ranges, _batch_context
             _mould_ranges = _load_mould_ranges(batch_number, line)
+            _batch_context = _build_batch_context(_mould_ranges)
             print(f"Mould ranges loaded: {len(_mould_ranges)} moulds")
 
             print("Starting worker threads...")
@@ -1262,11 +1331,6 @@ class Worker(QRunnable):
         self.cond = cond
         self.running=True
         self.uart=self_uart
-        # New: persistent duplicate tracker (safe if module missing)
-        try:
-            self.duplicate_tracker = DuplicateTracker() if DuplicateTracker else None
-        except Exception:
-            self.duplicate_tracker = None
     def stop(self):
         self.running=False
         
@@ -1297,6 +1361,7 @@ class Worker(QRunnable):
             cursor0.execute('''SELECT SEQ from sqlite_sequence WHERE name='cartridge';''')
             count=int(cursor0.fetchone()[0])-int(f2.read())
             self.signals.change_value_count.emit(str(count))
+        recent = RecentScans.from_db(self.matrix_db)
         with open(os.path.join(SCRIPT_DIR, 'matrix.txt'), "r") as f:
             f.seek(0)
             prev_matrix=matrix = f.read()
@@ -1352,23 +1417,18 @@ class Worker(QRunnable):
                         self.signals.change_value_cartridge.emit('QR LENGTH ERROR') 
                         print ("Len error:"+qr)
                         continue
-                    cursor5=self.matrix_db.cursor()
-                    cursor5.execute('''SELECT EXISTS(SELECT * FROM (SELECT * FROM cartridge ORDER BY SERIAL DESC LIMIT 50) WHERE CARTRIDGE="'''+qr+'''" LIMIT 1);''')
-                    repetQr=cursor5.fetchone()[0]
-                    cursor5.close()
-                    if repetQr==1:
+                    if qr in recent:
                         continue
 
                     # New validation using modern logic (keeps UART/GPIO behavior)
                     try:
-                        # Use global mould ranges loaded at startup
+                        # Use the batch context built when the batch was loaded
+                        ctx = _batch_context
                         print(f"Validating QR: {qr}, Line: {line}, Batch: {batch_number}, Moulds: {len(_mould_ranges)}")
-                        status, mould_name = handle_qr_scan(
-                            qr,
-                            line,
-                            _mould_ranges,
-                            duplicate_checker=(lambda code: self.duplicate_tracker.already_scanned(batch_number, code)) if self.duplicate_tracker and batch_number else None,
-                        )
+                        if ctx is not None:
+                            status, mould_name = ctx.scan(qr)
+                        else:
+                            status, mould_name = handle_qr_scan(qr, line, _mould_ranges)
                         print(f"Validation result: {status}, Mould: {mould_name}")
                     except Exception as e:
                         print(f"Validation exception: {e}")
@@ -1379,12 +1439,6 @@ class Worker(QRunnable):
                         self.signals.change_acceptvalue_count.emit(str(accno))
                         accno+=1
 
-                        try:
-                            if self.duplicate_tracker and batch_number:
-                                self.duplicate_tracker.record_scan(batch_number, qr)
-                        except Exception:
-                            pass
-
                         cursor2=self.matrix_db.cursor()
                         count+=1
                         current_datetime=datetime.now().strftime("%Y/%m/%d-%H:%M:%S")
@@ -1392,6 +1446,7 @@ class Worker(QRunnable):
                         data_tuple = (None,current_datetime,line,cube,matrix,qr,1)
                         cursor2.execute(sqlite_insert_with_param, data_tuple)
                         cursor2.close()
+                        recent.add(qr)
 
                         # Show QR with mould type
                         display_text = f"{qr} ({mould_name})" if mould_name else qr
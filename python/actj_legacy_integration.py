@@ -18,7 +18,7 @@ import logging
 import os
 import time
 import threading
-from typing import Optional, Callable, Dict, Tuple
+from typing import Optional, Callable, Tuple
 from enum import Enum
 
 try:
@@ -30,6 +30,11 @@ except ImportError:
     get_uart_protocol = None
     get_hardware_controller = None
 
+try:
+    from logic import as_range_index
+except ImportError:
+    as_range_index = None
+
 class ACTJLegacyState(Enum):
     """State machine for ACTJ legacy integration"""
     INITIALIZING = "INITIALIZING"
@@ -61,8 +66,9 @@ class ACTJLegacyIntegration:
         # Batch context for QR validation
         self.current_batch_line = None
         self.current_batch_number = None
-        self.current_mould_ranges = {}
+        self.current_mould_index = None
         self.duplicate_checker = None
+        self.batch_context = None
         
         # Integration callbacks
         self.qr_result_callback = None
@@ -112,19 +118,33 @@ class ACTJLegacyIntegration:
             self.logger.error(f"Startup sequence failed: {e}")
             self.state = ACTJLegacyState.ERROR
     
-    def set_batch_context(self, batch_line: str, mould_ranges: Dict[str, Tuple[str, str]], 
+    def set_context(self, context):
+        """
+        Validate QR codes against the logic.BatchContext built by the UI at batch start.
+        
+        Scans then go through context.scan, which also records each PASS.
+        """
+        self._apply_batch_context(context.line, context.range_index, context.is_duplicate, context.batch_number)
+        self.batch_context = context
+
+    def set_batch_context(self, batch_line: str, mould_ranges,
                          duplicate_checker: Callable[[str], bool], batch_number: str = ""):
         """
         Set batch context for QR validation.
         
         Args:
             batch_line: Single letter batch line (A, B, C, etc.)
-            mould_ranges: Dict mapping mould names to (start_qr, end_qr) tuples
+            mould_ranges: MouldRangeIndex shared with the UI (a dict of
+                mould -> (start_qr, end_qr) is indexed here once)
             duplicate_checker: Function to check if QR is duplicate
             batch_number: Batch number for display purposes
         """
+        self._apply_batch_context(batch_line, mould_ranges, duplicate_checker, batch_number)
+        self.batch_context = None
+
+    def _apply_batch_context(self, batch_line, mould_ranges, duplicate_checker, batch_number):
         self.current_batch_line = batch_line.upper()
-        self.current_mould_ranges = mould_ranges
+        self.current_mould_index = as_range_index(mould_ranges) if as_range_index else mould_ranges
         self.duplicate_checker = duplicate_checker
         self.current_batch_number = batch_number
         
@@ -165,8 +185,9 @@ class ACTJLegacyIntegration:
             
             # Clear batch context
             self.current_batch_line = None
-            self.current_mould_ranges = {}
+            self.current_mould_index = None
             self.duplicate_checker = None
+            self.batch_context = None
             
             if self.hardware:
                 self.hardware.signal_busy_to_firmware()
@@ -189,7 +210,7 @@ class ACTJLegacyIntegration:
             Tuple of (status, mould) where status is 'PASS', 'FAIL', etc.
         """
         try:
-            if not self.current_batch_line or not self.current_mould_ranges:
+            if not self.current_batch_line or not self.current_mould_index:
                 self.logger.warning("QR validation requested but no batch context set")
                 return ("FAIL", None)
             
@@ -201,12 +222,16 @@ class ACTJLegacyIntegration:
                 self.logger.warning("Logic module not found, using fallback validation")
                 return self._fallback_qr_validation(qr_code)
             
-            status, mould = handle_qr_scan(
-                qr_code,
-                self.current_batch_line,
-                self.current_mould_ranges,
-                duplicate_checker=self.duplicate_checker if self.duplicate_checker else lambda x: False
-            )
+            if self.batch_context is not None:
+                # Checks and records the code in one step; a PASS is already claimed
+                status, mould = self.batch_context.scan(qr_code)
+            else:
+                status, mould = handle_qr_scan(
+                    qr_code,
+                    self.current_batch_line,
+                    self.current_mould_index,
+                    duplicate_checker=self.duplicate_checker if self.duplicate_checker else lambda x: False
+                )
             
             self.logger.info(f"QR validation: {qr_code} -> {status} (mould: {mould})")
             
@@ -236,12 +261,19 @@ class ACTJLegacyIntegration:
                 return ("LINE MISMATCH", None)
             
             # Check if QR is in any mould range
-            for mould_name, (start_qr, end_qr) in self.current_mould_ranges.items():
-                if start_qr <= qr_code <= end_qr:
-                    # Check for duplicates
-                    if self.duplicate_checker and self.duplicate_checker(qr_code):
-                        return ("DUPLICATE", mould_name)
-                    return ("PASS", mould_name)
+            index = self.current_mould_index
+            if hasattr(index, "lookup"):
+                mould_name = index.lookup(qr_code)
+            else:
+                mould_name = next(
+                    (name for name, (start, end) in index.items() if start <= qr_code <= end),
+                    None,
+                )
+            if mould_name is not None:
+                # Check for duplicates
+                if self.duplicate_checker and self.duplicate_checker(qr_code):
+                    return ("DUPLICATE", mould_name)
+                return ("PASS", mould_name)
             
             return ("OUT OF BATCH", None)
             
@@ -301,7 +333,7 @@ class ACTJLegacyIntegration:
             'uart_active': self.uart_protocol is not None,
             'hardware_active': self.hardware is not None,
             'batch_line': self.current_batch_line,
-            'mould_count': len(self.current_mould_ranges) if self.current_mould_ranges else 0
+            'mould_count': len(self.current_mould_index) if self.current_mould_index else 0
         }
     
     def send_firmware_command(self, command: str) -> bool:
@@ -0,0 +1,182 @@
+"""Running per-batch summaries kept next to each batch CSV.
+
+<batch>.summary.json holds per-status and per-mould counts, the first and
+last timestamp, and one entry per hour, in hour order, with that hour's
+status counts, the row index of its first row and the byte span [offset, end)
+of the CSV holding its rows.  BatchLogWriter updates it after every group of
+rows, so dashboards can read totals without touching the CSV and seek
+straight to an hour with read_window.
+
+A summary describes exactly csv_size bytes of its CSV; read_summary returns
+None when the CSV has changed since, and callers fall back to the CSV.
+"""
+
+from __future__ import annotations
+
+import bisect
+import csv
+import io
+import json
+import os
+from datetime import timedelta
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+SUMMARY_SUFFIX = ".summary.json"
+_TIMESTAMP_FORMATS = ("%Y-%m-%d %H:%M:%S", "%d/%m/%Y %H:%M:%S")
+
+
+def summary_path(csv_path) -> Path:
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.stem + SUMMARY_SUFFIX)
+
+
+def _parse_timestamp(value: str) -> Optional[datetime]:
+    for fmt in _TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+class BatchSummary:
+    """Incrementally maintained summary of one batch CSV."""
+
+    def __init__(self, csv_path) -> None:
+        self.csv_path = Path(csv_path)
+        self.csv_size = 0
+        self.rows = 0
+        self.statuses: Dict[str, int] = {}
+        self.moulds: Dict[str, int] = {}
+        self.first_time: Optional[str] = None
+        self.last_time: Optional[str] = None
+        self.hours: List[dict] = []
+        self._hour_index: Dict[str, dict] = {}
+
+    # ---------------- Updates ----------------
+    def add(self, row: List[str], offset: int, size: int) -> None:
+        """Count one CSV row of size bytes that starts at byte offset."""
+        if len(row) < 5 or row[0].strip() == "Timestamp":
+            return
+        stamp = _parse_timestamp(row[0].strip())
+        status = row[4].strip().upper()
+        mould = row[2].strip() or "UNKNOWN"
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.moulds[mould] = self.moulds.get(mould, 0) + 1
+        if stamp is not None:
+            text = stamp.strftime("%Y-%m-%d %H:%M:%S")
+            if self.first_time is None or text < self.first_time:
+                self.first_time = text
+            if self.last_time is None or text > self.last_time:
+                self.last_time = text
+            hour = stamp.strftime("%Y-%m-%d %H:00")
+            entry = self._hour_index.get(hour)
+            if entry is None:
+                # Normally the next hour; a clock set back reopens an earlier one
+                entry = {"hour": hour, "offset": offset, "end": offset, "row": self.rows, "statuses": {}}
+                position = bisect.bisect([h["hour"] for h in self.hours], hour)
+                self.hours.insert(position, entry)
+                self._hour_index[hour] = entry
+            entry["end"] = offset + size
+            bucket = entry["statuses"]
+            bucket[status] = bucket.get(status, 0) + 1
+        self.rows += 1
+
+    def save(self, csv_size: int) -> None:
+        """Atomically write the summary for the first csv_size bytes of the CSV."""
+        self.csv_size = csv_size
+        path = summary_path(self.csv_path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(self.to_dict(), handle, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    # ---------------- Serialisation ----------------
+    def to_dict(self) -> dict:
+        return {
+            "csv_size": self.csv_size,
+            "rows": self.rows,
+            "statuses": self.statuses,
+            "moulds": self.moulds,
+            "first_time": self.first_time,
+            "last_time": self.last_time,
+            "hours": self.hours,
+        }
+
+    @classmethod
+    def from_dict(cls, csv_path, data: dict) -> "BatchSummary":
+        summary = cls(csv_path)
+        summary.csv_size = int(data["csv_size"])
+        summary.rows = int(data["rows"])
+        summary.statuses = dict(data["statuses"])
+        summary.moulds = dict(data["moulds"])
+        summary.first_time = data.get("first_time")
+        summary.last_time = data.get("last_time")
+        summary.hours = [dict(h, end=int(h["end"])) for h in data["hours"]]
+        summary._hour_index = {h["hour"]: h for h in summary.hours}
+        return summary
+
+    @classmethod
+    def build(cls, csv_path) -> "BatchSummary":
+        """Summarise an existing CSV in one pass."""
+        summary = cls(csv_path)
+        with open(csv_path, "rb") as handle:
+            offset = 0
+            for raw in handle:
+                row = next(csv.reader([raw.decode("utf-8", "replace")]), [])
+                summary.add(row, offset, len(raw))
+                offset += len(raw)
+        summary.csv_size = offset
+        return summary
+
+    @classmethod
+    def open(cls, csv_path) -> "BatchSummary":
+        """Summary matching the CSV as it is now, loading or rebuilding it."""
+        summary = read_summary(csv_path)
+        if summary is None:
+            summary = cls.build(csv_path) if Path(csv_path).exists() else cls(csv_path)
+        return summary
+
+
+def read_summary(csv_path) -> Optional[BatchSummary]:
+    """The stored summary if it still matches the CSV, else None."""
+    try:
+        with open(summary_path(csv_path), "r", encoding="utf-8") as handle:
+            summary = BatchSummary.from_dict(csv_path, json.load(handle))
+        if os.path.getsize(csv_path) != summary.csv_size:
+            return None
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return summary
+
+
+def next_hour(hour: str) -> str:
+    """The summary hour key one hour after hour."""
+    return (datetime.strptime(hour, "%Y-%m-%d %H:00") + timedelta(hours=1)).strftime("%Y-%m-%d %H:00")
+
+
+def read_window(csv_path, start_hour: str, end_hour: Optional[str] = None) -> Iterator[List[str]]:
+    """Yield CSV rows from start_hour up to (not including) end_hour.
+
+    Hours use the summary's "YYYY-MM-DD HH:00" keys.  Only the byte span
+    covering those hours is read; rows of other hours inside it (after a
+    clock change) are skipped.
+    """
+    summary = read_summary(csv_path) or BatchSummary.build(csv_path)
+    hours = [h for h in summary.hours if h["hour"] >= start_hour and (end_hour is None or h["hour"] < end_hour)]
+    if not hours:
+        return
+    start_offset = min(h["offset"] for h in hours)
+    end_offset = max(h["end"] for h in hours)
+    with open(csv_path, "rb") as handle:
+        handle.seek(start_offset)
+        data = handle.read(end_offset - start_offset)
+    for row in csv.reader(io.StringIO(data.decode("utf-8", "replace"), newline="")):
+        stamp = _parse_timestamp(row[0].strip()) if len(row) >= 5 else None
+        if stamp is None:
+            continue
+        hour = stamp.strftime("%Y-%m-%d %H:00")
+        if hour >= start_hour and (end_hour is None or hour < end_hour):
+            yield row
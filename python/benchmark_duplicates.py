@@ -0,0 +1,84 @@
+"""Compare duplicate-tracking backends at different batch sizes.
+
+Seeds each backend with N recorded codes, then times already_scanned and
+claim through DuplicateTracker (no in-memory index, no write-behind, so the
+numbers are the backend's own) and prints latency percentiles in
+microseconds.
+
+    python benchmark_duplicates.py --sizes 1000 100000 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from duplicate_tracker import DuplicateTracker, create_backend
+
+_BATCH = "BENCH"
+_CODES_PER_PREFIX = 26 * 10000
+
+
+def _code(ordinal: int) -> str:
+    prefix, rest = divmod(ordinal, _CODES_PER_PREFIX)
+    alpha, serial = divmod(rest, 10000)
+    return f"VAN{142500 + prefix:06d}{chr(ord('A') + alpha)}{serial:04d}"
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+    last = len(samples) - 1
+    return {name: samples[min(last, int(q * len(samples)))] * 1e6 for name, q in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99))}
+
+
+def run(backend_name: str, size: int, samples: int, workdir: Path) -> Dict[str, Dict[str, float]]:
+    db_path = workdir / f"{backend_name}_{size}.db"
+    backend = create_backend(backend_name, db_path)
+    seeded = [_code(i) for i in range(size)]
+    for start in range(0, size, 50000):
+        backend.insert_many(_BATCH, seeded[start:start + 50000])
+    backend.sync()
+    tracker = DuplicateTracker(db_path, backend=backend)
+
+    rng = random.Random(size)
+    # Half the probes hit stored codes, half miss, like a line re-scanning rejects
+    probes = [_code(rng.randrange(size * 2)) for _ in range(samples)]
+    fresh = [_code(size + i) for i in range(samples)]
+
+    check_times = []
+    for qr_code in probes:
+        start = time.perf_counter()
+        tracker.already_scanned(_BATCH, qr_code)
+        check_times.append(time.perf_counter() - start)
+
+    claim_times = []
+    for qr_code in fresh:
+        start = time.perf_counter()
+        tracker.claim(_BATCH, qr_code)
+        claim_times.append(time.perf_counter() - start)
+
+    tracker.close()
+    return {"check": _percentiles(check_times), "claim": _percentiles(claim_times)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000])
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--backends", nargs="+", default=["sqlite", "bitset", "memory"])
+    args = parser.parse_args()
+
+    print(f"{'backend':<8} {'codes':>9} {'op':<6} {'p50 us':>9} {'p95 us':>9} {'p99 us':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            for name in args.backends:
+                for op, stats in run(name, size, args.samples, Path(tmp)).items():
+                    print(f"{name:<8} {size:>9} {op:<6} {stats['p50']:>9.1f} {stats['p95']:>9.1f} {stats['p99']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -87,6 +87,22 @@ _DEFAULTS: Dict[str, Dict[str, Any]] = {
         "command_timeout": "12000",  # Timeout for firmware commands (ms)
         "auto_start": "true",  # Automatically start legacy integration
     },
+    "duplicates": {
+        "backend": "sqlite",  # options: sqlite, bitset, memory
+        "write_behind": "true",  # Queue PASS records and commit them in groups
+        "commit_interval_ms": "250",  # Maximum loss window on power failure
+        "commit_batch_rows": "50",  # Commit early once this many rows are queued
+        "global_guard": "false",  # Also reject codes accepted in any earlier batch
+        "global_capacity": "5000000",  # Codes the Bloom filter is sized for
+        "global_error_rate": "0.001",  # Bloom false-positive rate (hits are confirmed in SQLite)
+    },
+    "batch_log": {
+        "flush_rows": "50",  # Write queued CSV rows once this many are waiting
+        "flush_interval_ms": "250",  # ...or once the oldest has waited this long
+        "fsync": "batch",  # options: batch (every group), close (drain/close only), never
+        "queue_size": "10000",  # Rows buffered before write() waits on the SD card
+        "binary": "true",  # Also write a fixed-width <batch>.scans log for analytics
+    },
     "layout": {
         "entry_width": "18",
         "qr_width": "30",
@@ -181,6 +197,18 @@ class AppConfig:
     lcd_width: int
     lcd_height: int
     lcd_messages: Dict[str, str]
+    duplicates_backend: str
+    duplicates_write_behind: bool
+    duplicates_commit_interval_ms: int
+    duplicates_commit_batch_rows: int
+    duplicates_global_guard: bool
+    duplicates_global_capacity: int
+    duplicates_global_error_rate: float
+    batch_log_flush_rows: int
+    batch_log_flush_interval_ms: int
+    batch_log_fsync: str
+    batch_log_queue_size: int
+    batch_log_binary: bool
 
 
 def load_config(config_path: str | Path = CONFIG_FILE) -> AppConfig:
@@ -285,6 +313,18 @@ def load_config(config_path: str | Path = CONFIG_FILE) -> AppConfig:
             "ready": parser.get("lcd", "ready_message"),
             "scanning": parser.get("lcd", "scanning_message"),
         },
+        duplicates_backend=parser.get("duplicates", "backend"),
+        duplicates_write_behind=parser.getboolean("duplicates", "write_behind"),
+        duplicates_commit_interval_ms=parser.getint("duplicates", "commit_interval_ms"),
+        duplicates_commit_batch_rows=parser.getint("duplicates", "commit_batch_rows"),
+        duplicates_global_guard=parser.getboolean("duplicates", "global_guard"),
+        duplicates_global_capacity=parser.getint("duplicates", "global_capacity"),
+        duplicates_global_error_rate=parser.getfloat("duplicates", "global_error_rate"),
+        batch_log_flush_rows=parser.getint("batch_log", "flush_rows"),
+        batch_log_flush_interval_ms=parser.getint("batch_log", "flush_interval_ms"),
+        batch_log_fsync=parser.get("batch_log", "fsync").lower().strip(),
+        batch_log_queue_size=parser.getint("batch_log", "queue_size"),
+        batch_log_binary=parser.getboolean("batch_log", "binary"),
     )
 
 
@@ -347,3 +387,15 @@ LCD_BUS = CONFIG.lcd_bus
 LCD_WIDTH = CONFIG.lcd_width
 LCD_HEIGHT = CONFIG.lcd_height
 LCD_MESSAGES = CONFIG.lcd_messages
+DUPLICATES_BACKEND = CONFIG.duplicates_backend
+DUPLICATES_WRITE_BEHIND = CONFIG.duplicates_write_behind
+DUPLICATES_COMMIT_INTERVAL_MS = CONFIG.duplicates_commit_interval_ms
+DUPLICATES_COMMIT_BATCH_ROWS = CONFIG.duplicates_commit_batch_rows
+DUPLICATES_GLOBAL_GUARD = CONFIG.duplicates_global_guard
+DUPLICATES_GLOBAL_CAPACITY = CONFIG.duplicates_global_capacity
+DUPLICATES_GLOBAL_ERROR_RATE = CONFIG.duplicates_global_error_rate
+BATCH_LOG_FLUSH_ROWS = CONFIG.batch_log_flush_rows
+BATCH_LOG_FLUSH_INTERVAL_MS = CONFIG.batch_log_flush_interval_ms
+BATCH_LOG_FSYNC = CONFIG.batch_log_fsync
+BATCH_LOG_QUEUE_SIZE = CONFIG.batch_log_queue_size
+BATCH_LOG_BINARY = CONFIG.batch_log_binary
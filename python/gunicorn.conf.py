@@ -0,0 +1,10 @@
+"""gunicorn settings for the log viewer: gunicorn -w 3 -b 0.0.0.0:8080 log_viewer:app"""
+
+import os
+
+from serve_log_viewer import post_fork  # noqa: F401 - gunicorn server hook
+
+worker_class = "gthread"
+threads = int(os.environ.get("LOG_VIEWER_THREADS", "8"))
+# Read by log_viewer in each worker; /live streams must leave threads for pages
+os.environ.setdefault("LOG_VIEWER_LIVE_CLIENTS", str(max(1, threads // 2)))
@@ -7,8 +7,10 @@ Defaults to mock logging if the requested controller cannot be initialised.
 """
 
 import logging
+import queue
+import threading
 import time
-from typing import Optional
+from typing import Callable, NamedTuple, Optional
 
 from config import (
     ACTJ_LEGACY_GPIO_PINS,
@@ -351,6 +353,80 @@ class GPIOHardwareController(BaseHardwareController):  # pragma: no cover - hard
             raise
 
 
+class FeedbackPattern(NamedTuple):
+    """Timed light/buzzer cue; the buzzer runs while the light is on."""
+
+    color: Optional[str]
+    light_duration: float = 0.0
+    buzz_duration: float = 0.0
+
+
+class FeedbackScheduler:
+    """Play LED and buzzer patterns on a dedicated thread.
+
+    Validation code only enqueues a pattern and returns immediately, so PLC
+    and UART responses are never held up by `time.sleep` in the feedback
+    path.  A pattern that is already waiting in the queue is not queued
+    again, which keeps a burst of identical results from piling up.
+    """
+
+    def __init__(
+        self,
+        controller: BaseHardwareController,
+        on_error: Optional[Callable[[Exception], None]] = None,
+    ) -> None:
+        self._controller = controller
+        self._on_error = on_error
+        self._queue: "queue.Queue[Optional[FeedbackPattern]]" = queue.Queue()
+        self._pending: set[FeedbackPattern] = set()
+        self._lock = threading.Lock()
+        self._logger = logging.getLogger("hardware")
+        self._thread = threading.Thread(target=self._run, name="feedback", daemon=True)
+        self._thread.start()
+
+    def submit(self, pattern: FeedbackPattern) -> None:
+        """Queue a pattern unless an identical one is still pending."""
+        with self._lock:
+            if pattern in self._pending:
+                return
+            self._pending.add(pattern)
+        self._queue.put(pattern)
+
+    def close(self, timeout: float = 2.0) -> None:
+        """Stop the worker after the patterns already queued have played."""
+        self._queue.put(None)
+        self._thread.join(timeout=timeout)
+
+    def _run(self) -> None:
+        while True:
+            pattern = self._queue.get()
+            if pattern is None:
+                return
+            with self._lock:
+                self._pending.discard(pattern)
+            try:
+                self._play(pattern)
+            except Exception as exc:  # pragma: no cover - hardware dependent
+                if self._on_error:
+                    self._on_error(exc)
+                else:
+                    self._logger.exception("Feedback pattern %s failed", pattern)
+
+    def _play(self, pattern: FeedbackPattern) -> None:
+        started = time.monotonic()
+        if pattern.color:
+            self._controller.light_on(pattern.color)
+        try:
+            if pattern.buzz_duration > 0:
+                self._controller.buzz(pattern.buzz_duration)
+            remaining = pattern.light_duration - (time.monotonic() - started)
+            if pattern.color and remaining > 0:
+                time.sleep(remaining)
+        finally:
+            if pattern.color:
+                self._controller.light_off(pattern.color)
+
+
 _controller: Optional[BaseHardwareController] = None
 
 
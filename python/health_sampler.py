@@ -0,0 +1,147 @@
+"""Background sampler of Pi health for the log viewer.
+
+HealthSampler records CPU temperature, load, disk usage, free memory, scan
+rate and the age of the last scan every interval seconds into a fixed-size
+ring buffer, so pages read the latest sample instead of touching /sys,
+/proc and the log folder on every request, and the history shows whether
+thermal throttling lines up with slow scanning.
+
+Scan rate and last-scan time come from the viewer's shared LiveTailer; the
+log folder is walked only once, at start, to find the last scan before it.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import List, Optional
+
+from live_feed import LiveTailer
+
+THERMAL_ZONE = "/sys/class/thermal/thermal_zone0/temp"
+
+
+def _read_temp() -> Optional[float]:
+    try:
+        with open(THERMAL_ZONE, "r", encoding="utf-8") as handle:
+            return float(handle.read().strip()) / 1000.0
+    except (OSError, ValueError):
+        return None
+
+
+def _read_uptime() -> float:
+    try:
+        with open("/proc/uptime", "r", encoding="utf-8") as handle:
+            return float(handle.read().split()[0])
+    except (OSError, ValueError):
+        return 0.0
+
+
+def _read_mem_available_mb() -> Optional[float]:
+    try:
+        with open("/proc/meminfo", "r", encoding="utf-8") as handle:
+            for line in handle:
+                if line.startswith("MemAvailable:"):
+                    return round(int(line.split()[1]) / 1024.0, 1)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class HealthSampler:
+    """Sample system health into a ring buffer of the last history samples."""
+
+    def __init__(self, log_dir: Path | str, tailer: LiveTailer, interval: float = 5.0, history: int = 720) -> None:
+        self.log_dir = Path(log_dir)
+        self.interval = interval
+        self._tailer = tailer
+        self._samples: deque = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_rows = 0
+        self._last_time: Optional[float] = None
+        self._last_scan: Optional[float] = None
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._last_scan = self._latest_mtime()
+            self._tailer.start()
+            self._last_rows = self._tailer.rows_seen
+            self._last_time = time.time()
+            self._thread = threading.Thread(target=self._run, name="health-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def _latest_mtime(self) -> Optional[float]:
+        latest = None
+        for path in self.log_dir.glob("*.csv"):
+            try:
+                mtime = path.stat().st_mtime
+            except OSError:
+                continue
+            if latest is None or mtime > latest:
+                latest = mtime
+        return latest
+
+    def sample(self) -> dict:
+        """Take one sample, append it to the history and return it."""
+        with self._lock:
+            now = time.time()
+            rows = self._tailer.rows_seen
+            if self._tailer.last_row_time is not None:
+                self._last_scan = self._tailer.last_row_time
+            elapsed = now - self._last_time if self._last_time is not None else 0.0
+            rate = (rows - self._last_rows) * 60.0 / elapsed if elapsed > 0 else 0.0
+            self._last_rows, self._last_time = rows, now
+
+        try:
+            disk = shutil.disk_usage(self.log_dir)
+            disk_pct = disk.used * 100.0 / disk.total if disk.total else 0.0
+        except OSError:
+            disk_pct = None
+        try:
+            load = os.getloadavg()[0]
+        except (AttributeError, OSError):
+            load = None
+
+        sample = {
+            "time": round(now, 3),
+            "temp_c": _read_temp(),
+            "load1": load,
+            "disk_pct": round(disk_pct, 1) if disk_pct is not None else None,
+            "mem_available_mb": _read_mem_available_mb(),
+            "scans_per_min": round(rate, 1),
+            "last_scan": self._last_scan,
+            "last_scan_age": round(now - self._last_scan, 1) if self._last_scan else None,
+            "uptime": _read_uptime(),
+        }
+        with self._lock:
+            self._samples.append(sample)
+        return sample
+
+    def latest(self) -> dict:
+        """The newest sample, taking one now if the sampler has none yet."""
+        with self._lock:
+            if self._samples:
+                return self._samples[-1]
+        return self.sample()
+
+    def history(self, since: float = 0.0) -> List[dict]:
+        with self._lock:
+            return [sample for sample in self._samples if sample["time"] > since]
@@ -0,0 +1,209 @@
+"""Shared tailer that turns new batch log rows into live events.
+
+One LiveTailer thread watches the log folder (inotify when inotify_simple
+is installed, stat polling otherwise), reads only the bytes appended to each
+CSV and fans every new row out to subscriber queues.  However many clients
+listen, the files are read once.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import logging
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from log_index import head_fingerprint, head_matches
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:  # pragma: no cover - Linux-only optional dependency
+    INotify = None
+    flags = None
+
+_HEADER = ["Timestamp", "BatchNumber", "Mould", "QRCode", "Status"]
+_logger = logging.getLogger("live_feed")
+
+
+class LiveTailer:
+    """Tail every *.csv in log_dir and publish each new row with batch counters.
+
+    Events are dicts {"batch", "timestamp", "mould", "qr", "status",
+    "counters"}.  Files are picked up at their current end, so subscribers
+    only see rows written after the tailer started; the first time a file
+    grows its earlier rows are counted once so the counters are batch totals.
+    rows_seen and last_row_time cover every row tailed, for rate sampling.
+    """
+
+    def __init__(self, log_dir: Path | str, poll_interval: float = 0.5, queue_size: int = 500) -> None:
+        self.log_dir = Path(log_dir)
+        self._poll_interval = poll_interval
+        self._queue_size = queue_size
+        self._offsets: Dict[str, Tuple[int, int, Optional[str]]] = {}  # name -> (inode, offset, head)
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._subscribers: List[queue.Queue] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.rows_seen = 0
+        self.last_row_time: Optional[float] = None
+
+    # ---------------- Subscribers ----------------
+    def start(self) -> None:
+        """Start tailing; subscribe() does this on first use."""
+        with self._lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._prime()
+                self._thread = threading.Thread(target=self._run, name="live-tailer", daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def subscribe(self) -> queue.Queue:
+        """Register a client queue, starting the tailer thread on first use."""
+        events: queue.Queue = queue.Queue(maxsize=self._queue_size)
+        with self._lock:
+            self._subscribers.append(events)
+        self.start()
+        return events
+
+    def unsubscribe(self, events: queue.Queue) -> None:
+        with self._lock:
+            if events in self._subscribers:
+                self._subscribers.remove(events)
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def _publish(self, event: dict) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for events in subscribers:
+            try:
+                events.put_nowait(event)
+            except queue.Full:
+                # A stalled client misses rows; the next event still carries the counters
+                pass
+
+    # ---------------- Tailing ----------------
+    def _run(self) -> None:
+        if INotify is not None:
+            try:
+                watcher = INotify()
+                watcher.add_watch(str(self.log_dir), flags.MODIFY | flags.CREATE | flags.MOVED_TO)
+            except OSError:
+                _logger.exception("inotify unavailable; polling %s", self.log_dir)
+            else:
+                try:
+                    self._run_inotify(watcher)
+                finally:
+                    watcher.close()
+                return
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception:
+                _logger.exception("Live tail pass failed")
+            self._stop.wait(self._poll_interval)
+
+    def _run_inotify(self, watcher) -> None:
+        while not self._stop.is_set():
+            try:
+                # The timeout doubles as a safety poll for events inotify can miss
+                # and bounds how long stop() waits
+                names = {event.name for event in watcher.read(timeout=int(self._poll_interval * 4000))}
+                if not names:
+                    self.poll()
+                for name in names:
+                    if name.endswith(".csv"):
+                        self._tail(self.log_dir / name)
+            except Exception:
+                _logger.exception("Live tail pass failed")
+                self._stop.wait(self._poll_interval)
+
+    def _prime(self) -> None:
+        for path in self.log_dir.glob("*.csv"):
+            if path.name in self._offsets:
+                continue  # restarted after stop(): resume where tailing left off
+            try:
+                stats = path.stat()
+                self._offsets[path.name] = (stats.st_ino, stats.st_size, head_fingerprint(path, stats.st_size))
+            except OSError:
+                continue
+
+    def poll(self) -> None:
+        """Check every log once; the stat-polling fallback calls this in a loop."""
+        for path in self.log_dir.glob("*.csv"):
+            self._tail(path)
+
+    def _tail(self, path: Path) -> None:
+        try:
+            stats = path.stat()
+        except OSError:
+            return
+        inode, offset, head = self._offsets.get(path.name, (stats.st_ino, 0, None))
+        if stats.st_size == offset and inode == stats.st_ino:
+            return
+        if inode != stats.st_ino or stats.st_size < offset or not head_matches(path, head):
+            # Replaced, truncated or rewritten in place (a restarted batch): start over
+            offset = 0
+            self._counters.pop(path.name, None)
+        if stats.st_size == offset:
+            self._offsets[path.name] = (stats.st_ino, offset, None)
+            return
+        try:
+            with path.open("rb") as handle:
+                counters = self._counters.get(path.name)
+                if counters is None:
+                    counters = {"total": 0, "pass": 0, "duplicate": 0, "other": 0}
+                    for row in _rows(handle.read(offset)):
+                        _count(counters, row)
+                    self._counters[path.name] = counters
+                handle.seek(offset)
+                data = handle.read(stats.st_size - offset)
+        except OSError:
+            return
+        # Leave a half-written last line for the next pass
+        data = data[: data.rfind(b"\n") + 1]
+        try:
+            head = head_fingerprint(path, offset + len(data))
+        except OSError:
+            return
+        self._offsets[path.name] = (stats.st_ino, offset + len(data), head)
+        for row in _rows(data):
+            status = _count(counters, row)
+            self.rows_seen += 1
+            self.last_row_time = time.time()
+            self._publish(
+                {
+                    "batch": path.name,
+                    "timestamp": row[0].strip(),
+                    "mould": row[2].strip(),
+                    "qr": row[3].strip(),
+                    "status": status,
+                    "counters": dict(counters),
+                }
+            )
+
+
+def _rows(data: bytes) -> List[List[str]]:
+    reader = csv.reader(io.StringIO(data.decode("utf-8", "replace"), newline=""))
+    return [row for row in reader if len(row) >= 5 and [cell.strip() for cell in row[:5]] != _HEADER]
+
+
+def _count(counters: Dict[str, int], row: List[str]) -> str:
+    status = row[4].strip().upper()
+    counters["total"] += 1
+    counters[status.lower() if status in ("PASS", "DUPLICATE") else "other"] += 1
+    return status
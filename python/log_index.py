@@ -0,0 +1,519 @@
+"""Background indexer that feeds log_viewer's SQLite analytics store.
+
+LogIndexer tails every batch CSV in the log folder from the byte offset it
+reached last time and upserts the new rows, per-batch totals and hourly
+buckets into analytics.db, so viewer pages query a few aggregate rows
+instead of reparsing CSVs.  Offsets are kept per file together with its
+inode, size and a fingerprint of its first bytes: a file that was replaced
+(new inode), truncated (smaller than the offset) or rewritten in place
+(init_log reopens a restarted batch with "w", keeping the inode) is indexed
+again from the start.
+
+rollup_hourly and rollup_daily hold scan counts keyed by time bucket,
+batch, line (the second character of the QR code), mould and status.  They
+are updated in the same transaction as the rows, so trend charts cost one
+GROUP BY over buckets rather than a pass over every scan.
+
+Several viewer processes can share one store: an exclusive lock on
+analytics.db.lock elects the single process that indexes, the others only
+read and take over if that process exits.
+"""
+
+from __future__ import annotations
+
+import csv
+import hashlib
+import io
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: one viewer process, always the indexer
+    fcntl = None
+
+ANALYTICS_DB = "analytics.db"
+HEAD_BYTES = 4096
+_TIMESTAMP_FORMATS = ("%Y-%m-%d %H:%M:%S", "%d/%m/%Y %H:%M:%S")
+_HEADER = ["Timestamp", "BatchNumber", "Mould", "QRCode", "Status"]
+
+_logger = logging.getLogger("log_index")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    inode INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    head TEXT
+);
+CREATE TABLE IF NOT EXISTS scans (
+    file TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    ts TEXT,
+    batch TEXT,
+    mould TEXT,
+    qr TEXT,
+    status TEXT,
+    PRIMARY KEY (file, row)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS scans_status ON scans (file, status, row);
+CREATE INDEX IF NOT EXISTS scans_ts ON scans (file, ts);
+CREATE INDEX IF NOT EXISTS scans_qr ON scans (file, qr);
+CREATE TABLE IF NOT EXISTS batch_totals (
+    file TEXT PRIMARY KEY,
+    total INTEGER NOT NULL,
+    pass INTEGER NOT NULL,
+    duplicate INTEGER NOT NULL,
+    other INTEGER NOT NULL,
+    first_time TEXT,
+    last_time TEXT
+);
+CREATE TABLE IF NOT EXISTS batch_hours (
+    file TEXT NOT NULL,
+    hour TEXT NOT NULL,
+    pass INTEGER NOT NULL,
+    duplicate INTEGER NOT NULL,
+    other INTEGER NOT NULL,
+    PRIMARY KEY (file, hour)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_hourly (
+    hour TEXT NOT NULL,
+    batch TEXT NOT NULL,
+    line TEXT NOT NULL,
+    mould TEXT NOT NULL,
+    status TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (hour, batch, line, mould, status)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_daily (
+    day TEXT NOT NULL,
+    batch TEXT NOT NULL,
+    line TEXT NOT NULL,
+    mould TEXT NOT NULL,
+    status TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (day, batch, line, mould, status)
+) WITHOUT ROWID;
+"""
+
+# Rollup keys of the scans rows of one file, for removing a file's share
+_FILE_ROLLUP_SQL = """
+SELECT substr(ts, 1, 13) || ':00', batch, substr(qr, 2, 1), mould, status, count(*)
+FROM scans WHERE file = ? AND ts IS NOT NULL
+GROUP BY 1, 2, 3, 4, 5
+"""
+
+_ROLLUP_UPSERT = {
+    "rollup_hourly": """
+        INSERT INTO rollup_hourly (hour, batch, line, mould, status, count) VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (hour, batch, line, mould, status) DO UPDATE SET count = count + excluded.count
+    """,
+    "rollup_daily": """
+        INSERT INTO rollup_daily (day, batch, line, mould, status, count) VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (day, batch, line, mould, status) DO UPDATE SET count = count + excluded.count
+    """,
+}
+
+
+def _parse_timestamp(value: str) -> Optional[str]:
+    for fmt in _TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            continue
+    return None
+
+
+def head_fingerprint(path: Path | str, size: int) -> str:
+    """Identify a log by its first bytes: "<length>:<hash>" of up to HEAD_BYTES.
+
+    Batch CSVs start with a header and a timestamped first row, so a batch
+    restarted into the same file gets a different fingerprint even when it
+    grows past the old size.
+    """
+    with open(path, "rb") as handle:
+        data = handle.read(min(size, HEAD_BYTES))
+    return f"{len(data)}:{hashlib.blake2b(data, digest_size=8).hexdigest()}"
+
+
+def head_matches(path: Path | str, fingerprint: Optional[str]) -> bool:
+    """True when path still starts with the bytes fingerprint was taken from."""
+    if not fingerprint:
+        return True  # indexed before fingerprints were kept
+    length = int(fingerprint.split(":", 1)[0])
+    try:
+        return head_fingerprint(path, length) == fingerprint
+    except OSError:
+        return False
+
+
+def _kind(status: str) -> int:
+    """0 = PASS, 1 = DUPLICATE, 2 = anything else."""
+    return 0 if status == "PASS" else 1 if status == "DUPLICATE" else 2
+
+
+class LogIndexer:
+    """Incrementally index batch CSVs into an SQLite analytics store.
+
+    index_once() can be called directly; start() runs it every interval
+    seconds on a daemon thread.  ready is set after the first full pass (or,
+    in a process that lost the indexer election, once the store has caught
+    up with the files), so callers can fall back to reading CSVs until then.
+    """
+
+    def __init__(self, log_dir: Path | str, db_path: Optional[Path | str] = None, interval: float = 2.0) -> None:
+        self.log_dir = Path(log_dir)
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = Path(db_path) if db_path else self.log_dir / ANALYTICS_DB
+        self.interval = interval
+        self.ready = threading.Event()
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute("PRAGMA synchronous=NORMAL;")
+        self._conn.executescript(_SCHEMA)
+        if "head" not in [row[1] for row in self._conn.execute("PRAGMA table_info(files)")]:
+            self._conn.execute("ALTER TABLE files ADD COLUMN head TEXT")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock_file = None
+        # WAL lets each request thread read on its own connection while the indexer writes
+        self._readers = threading.local()
+        self._reader_conns: List[sqlite3.Connection] = []
+
+    # ---------------- Indexing ----------------
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="log-indexer", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                if self.acquire_writer():
+                    self.index_once()
+                elif self._caught_up():
+                    self.ready.set()
+            except Exception:
+                _logger.exception("Log indexing pass failed")
+            self._stop.wait(self.interval)
+
+    @property
+    def is_writer(self) -> bool:
+        return self._lock_file is not None
+
+    def acquire_writer(self) -> bool:
+        """Try to become the one process that indexes into this store."""
+        if self._lock_file is not None:
+            return True
+        handle = open(self.db_path.with_name(self.db_path.name + ".lock"), "a")
+        if fcntl is not None:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                handle.close()
+                return False
+        self._lock_file = handle
+        with self._lock:
+            self._backfill_rollups()
+        return True
+
+    def _caught_up(self) -> bool:
+        return all(self.is_current(path.name) for path in self.log_dir.glob("*.csv"))
+
+    def index_once(self) -> int:
+        """Index everything appended since the last pass; returns new row count.
+
+        Does nothing (returns 0) while another process holds the indexer lock.
+        """
+        if not self.acquire_writer():
+            return 0
+        present = {}
+        for path in self.log_dir.glob("*.csv"):
+            try:
+                present[path.name] = path.stat()
+            except OSError:
+                continue
+        with self._lock:
+            known = {
+                name: (inode, size, offset, rows, head)
+                for name, inode, size, offset, rows, head in self._conn.execute(
+                    "SELECT name, inode, size, offset, rows, head FROM files"
+                )
+            }
+        added = 0
+        for name in known.keys() - present.keys():
+            with self._lock, self._conn:
+                self._forget(name)
+        for name, stats in present.items():
+            inode, size, offset, rows, head = known.get(name, (None, 0, 0, 0, None))
+            if stats.st_size == size and inode == stats.st_ino:
+                continue
+            path = self.log_dir / name
+            if inode != stats.st_ino or stats.st_size < offset or not head_matches(path, head):
+                with self._lock, self._conn:
+                    self._forget(name)
+                offset, rows = 0, 0
+            try:
+                head = head_fingerprint(path, stats.st_size)
+            except OSError:
+                continue
+            added += self._index_file(name, stats.st_ino, stats.st_size, offset, rows, head)
+        self.ready.set()
+        return added
+
+    def _backfill_rollups(self) -> None:
+        """Fill empty rollup tables from scans indexed before they existed."""
+        for table in ("rollup_hourly", "rollup_daily"):
+            if self._conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+                return
+        with self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO rollup_hourly (hour, batch, line, mould, status, count)
+                SELECT substr(ts, 1, 13) || ':00', batch, substr(qr, 2, 1), mould, status, count(*)
+                FROM scans WHERE ts IS NOT NULL GROUP BY 1, 2, 3, 4, 5
+                """
+            )
+            self._conn.execute(
+                """
+                INSERT INTO rollup_daily (day, batch, line, mould, status, count)
+                SELECT substr(hour, 1, 10), batch, line, mould, status, sum(count)
+                FROM rollup_hourly GROUP BY 1, 2, 3, 4, 5
+                """
+            )
+
+    def _add_rollups(self, hourly: Dict[tuple, int], sign: int = 1) -> None:
+        """Add (or with sign=-1 remove) hourly-keyed counts to both rollups. Caller holds _lock."""
+        daily: Dict[tuple, int] = {}
+        for (hour, *rest), count in hourly.items():
+            key = (hour[:10], *rest)
+            daily[key] = daily.get(key, 0) + count
+        for table, counts in (("rollup_hourly", hourly), ("rollup_daily", daily)):
+            self._conn.executemany(_ROLLUP_UPSERT[table], [(*key, sign * count) for key, count in counts.items()])
+            if sign < 0:
+                self._conn.execute(f"DELETE FROM {table} WHERE count <= 0")
+
+    def _forget(self, name: str) -> None:
+        """Drop everything indexed for name. Caller holds _lock in a transaction."""
+        shares = {tuple(row[:5]): row[5] for row in self._conn.execute(_FILE_ROLLUP_SQL, (name,))}
+        if shares:
+            self._add_rollups(shares, sign=-1)
+        for table, column in (("files", "name"), ("scans", "file"), ("batch_totals", "file"), ("batch_hours", "file")):
+            self._conn.execute(f"DELETE FROM {table} WHERE {column} = ?", (name,))
+
+    def _index_file(self, name: str, inode: int, size: int, offset: int, rows: int, head: str) -> int:
+        with open(self.log_dir / name, "rb") as handle:
+            handle.seek(offset)
+            data = handle.read(size - offset)
+        # Leave a partially written last line for the next pass
+        end = data.rfind(b"\n") + 1
+        data = data[:end]
+
+        scans: List[tuple] = []
+        totals = [0, 0, 0]
+        first_time: Optional[str] = None
+        last_time: Optional[str] = None
+        hours: Dict[str, List[int]] = {}
+        rollups: Dict[tuple, int] = {}
+        for row in csv.reader(io.StringIO(data.decode("utf-8", "replace"), newline="")):
+            if not row or [cell.strip() for cell in row[:5]] == _HEADER:
+                continue
+            cells = [cell.strip() for cell in row[:5]] + [""] * (5 - len(row[:5]))
+            ts = _parse_timestamp(cells[0])
+            status = cells[4].upper()
+            kind = _kind(status)
+            scans.append((name, rows + len(scans), ts, cells[1], cells[2], cells[3], status))
+            totals[kind] += 1
+            if ts is not None:
+                first_time = ts if first_time is None or ts < first_time else first_time
+                last_time = ts if last_time is None or ts > last_time else last_time
+                hours.setdefault(ts[:13] + ":00", [0, 0, 0])[kind] += 1
+                key = (ts[:13] + ":00", cells[1], cells[3][1:2], cells[2], status)
+                rollups[key] = rollups.get(key, 0) + 1
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO scans (file, row, ts, batch, mould, qr, status) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                scans,
+            )
+            self._conn.execute(
+                """
+                INSERT INTO batch_totals (file, total, pass, duplicate, other, first_time, last_time)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (file) DO UPDATE SET
+                    total = total + excluded.total,
+                    pass = pass + excluded.pass,
+                    duplicate = duplicate + excluded.duplicate,
+                    other = other + excluded.other,
+                    first_time = min(coalesce(first_time, excluded.first_time), coalesce(excluded.first_time, first_time)),
+                    last_time = max(coalesce(last_time, excluded.last_time), coalesce(excluded.last_time, last_time))
+                """,
+                (name, len(scans), totals[0], totals[1], totals[2], first_time, last_time),
+            )
+            self._conn.executemany(
+                """
+                INSERT INTO batch_hours (file, hour, pass, duplicate, other) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (file, hour) DO UPDATE SET
+                    pass = pass + excluded.pass,
+                    duplicate = duplicate + excluded.duplicate,
+                    other = other + excluded.other
+                """,
+                [(name, hour, *counts) for hour, counts in hours.items()],
+            )
+            self._add_rollups(rollups)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (name, inode, size, offset, rows, head) VALUES (?, ?, ?, ?, ?, ?)",
+                (name, inode, size, offset + end, rows + len(scans), head),
+            )
+        return len(scans)
+
+    # ---------------- Queries ----------------
+    def _query(self, sql: str, params: tuple = ()) -> list:
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            self._readers.conn = conn
+            with self._lock:
+                self._reader_conns.append(conn)
+        return conn.execute(sql, params).fetchall()
+
+    def scan_totals(self) -> Tuple[int, int]:
+        """(total scans, PASS scans) over every indexed batch."""
+        total, total_pass = self._query("SELECT coalesce(sum(total), 0), coalesce(sum(pass), 0) FROM batch_totals")[0]
+        return total, total_pass
+
+    def is_current(self, name: str) -> bool:
+        """True when name is indexed up to its current size and was not rewritten."""
+        path = self.log_dir / name
+        try:
+            stats = path.stat()
+        except OSError:
+            return False
+        row = self._query("SELECT inode, offset, head FROM files WHERE name = ?", (name,))
+        return bool(row) and row[0][:2] == (stats.st_ino, stats.st_size) and head_matches(path, row[0][2])
+
+    def batch_stats(self, name: str) -> Optional[dict]:
+        """Same shape as log_viewer._batch_stats, or None if name is not indexed."""
+        row = self._query(
+            "SELECT total, pass, duplicate, other, first_time, last_time FROM batch_totals WHERE file = ?", (name,)
+        )
+        if not row:
+            return None
+        total, pass_count, duplicate, other, first_time, last_time = row[0]
+        hours = self._query("SELECT hour, pass, duplicate, other FROM batch_hours WHERE file = ? ORDER BY hour", (name,))
+        return {
+            "filename": name,
+            "total": total,
+            "pass": pass_count,
+            "duplicate": duplicate,
+            "other": other,
+            "first_time": first_time,
+            "last_time": last_time,
+            "chart_labels": [hour for hour, _, _, _ in hours],
+            "chart_pass": [count for _, count, _, _ in hours],
+            "chart_duplicate": [count for _, _, count, _ in hours],
+            "chart_other": [count for _, _, _, count in hours],
+        }
+
+    def list_batches(self, after: str = "", limit: int = 50) -> List[dict]:
+        """Indexed batch files ordered by name, starting after the cursor name."""
+        rows = self._query(
+            """
+            SELECT f.name, f.size, t.total, t.pass, t.duplicate, t.other, t.first_time, t.last_time
+            FROM files f LEFT JOIN batch_totals t ON t.file = f.name
+            WHERE f.name > ? ORDER BY f.name LIMIT ?
+            """,
+            (after, limit),
+        )
+        keys = ("name", "size", "total", "pass", "duplicate", "other", "first_time", "last_time")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def has_file(self, name: str) -> bool:
+        return bool(self._query("SELECT 1 FROM files WHERE name = ?", (name,)))
+
+    def batch_rows(
+        self,
+        name: str,
+        after: int = -1,
+        limit: int = 100,
+        status: Optional[str] = None,
+        mould: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        qr_prefix: Optional[str] = None,
+    ) -> List[dict]:
+        """Scan rows of one file after row number `after`, optionally filtered.
+
+        since/until compare against "YYYY-MM-DD HH:MM:SS" timestamps (until is
+        exclusive); qr_prefix matches the start of the QR code.
+        """
+        clauses = ["file = ?", "row > ?"]
+        params: list = [name, after]
+        for clause, value in (("status = ?", status), ("mould = ?", mould), ("ts >= ?", since), ("ts < ?", until)):
+            if value:
+                clauses.append(clause)
+                params.append(value)
+        if qr_prefix:
+            # Range form of LIKE 'prefix%' so the (file, qr) index applies
+            clauses.append("qr >= ? AND qr < ?")
+            params.extend([qr_prefix, qr_prefix + "\U0010ffff"])
+        rows = self._query(
+            f"SELECT row, ts, mould, qr, status FROM scans WHERE {' AND '.join(clauses)} ORDER BY row LIMIT ?",
+            (*params, limit),
+        )
+        return [{"row": row, "ts": ts, "mould": mould, "qr": qr, "status": status} for row, ts, mould, qr, status in rows]
+
+    def daily_trends(self) -> dict:
+        """Per-day totals plus PASS/other splits per line and per mould."""
+        days = self._query(
+            """
+            SELECT day, sum(count), sum(CASE WHEN status = 'PASS' THEN count ELSE 0 END),
+                   sum(CASE WHEN status = 'DUPLICATE' THEN count ELSE 0 END)
+            FROM rollup_daily GROUP BY day ORDER BY day
+            """
+        )
+        result = {
+            "labels": [day for day, _, _, _ in days],
+            "total": [total for _, total, _, _ in days],
+            "pass": [count for _, _, count, _ in days],
+            "duplicate": [count for _, _, _, count in days],
+        }
+        for key, column in (("lines", "line"), ("moulds", "mould")):
+            groups = self._query(
+                f"""
+                SELECT {column}, sum(CASE WHEN status = 'PASS' THEN count ELSE 0 END),
+                       sum(CASE WHEN status != 'PASS' THEN count ELSE 0 END)
+                FROM rollup_daily GROUP BY {column} ORDER BY {column}
+                """
+            )
+            result[key] = {
+                "labels": [label or "-" for label, _, _ in groups],
+                "pass": [count for _, count, _ in groups],
+                "other": [count for _, _, count in groups],
+            }
+        return result
+
+    def close(self) -> None:
+        self.stop()
+        with self._lock:
+            for conn in self._reader_conns:
+                conn.close()
+            self._reader_conns.clear()
+            self._conn.close()
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
@@ -4,18 +4,34 @@ from __future__ import annotations
 
 import copy
 import csv
+import gzip
+import hashlib
+import io
 import json
 import os
-import shutil
-import time
+import queue
+import zipfile
+import zlib
 from collections import defaultdict
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from threading import Lock
+from threading import BoundedSemaphore, Lock
 
-from flask import Flask, abort, render_template_string, request, send_from_directory
+from flask import Flask, Response, abort, jsonify, request, send_from_directory
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import is_resource_modified
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - binary scan logs are then ignored
+    np = None
 
 from config import HEADER_TEXT, FOOTER_TEXT, LOG_FOLDER
+from batch_summary import next_hour, read_summary, read_window
+from health_sampler import HealthSampler
+from live_feed import LiveTailer
+from log_index import LogIndexer, head_fingerprint, head_matches
+from scan_binlog import read_scan_log, scan_log_path
 
 
 APP_ROOT = Path(__file__).resolve().parent
@@ -27,6 +43,23 @@ FAVICON_FILENAME = os.environ.get("LOG_VIEWER_FAVICON", "footer-logo.png")
 
 app = Flask(__name__)
 
+_INDEXER_ENABLED = os.environ.get("LOG_VIEWER_INDEXER", "1") == "1"
+_INDEXER_LOCK = Lock()
+_INDEXER: LogIndexer | None = None
+
+_LIVE_TAILER = LiveTailer(BATCH_LOG_DIR, poll_interval=float(os.environ.get("LOG_VIEWER_LIVE_POLL", "0.5")))
+LIVE_KEEPALIVE_SECONDS = 15
+# Each /live stream holds a request thread for as long as it is open; keep
+# this below the server's thread count so page requests always get one
+LIVE_MAX_CLIENTS = int(os.environ.get("LOG_VIEWER_LIVE_CLIENTS", "4"))
+_LIVE_SLOTS = BoundedSemaphore(max(1, LIVE_MAX_CLIENTS))
+_HEALTH_SAMPLER = HealthSampler(
+    BATCH_LOG_DIR,
+    _LIVE_TAILER,
+    interval=float(os.environ.get("LOG_VIEWER_HEALTH_INTERVAL", "5")),
+    history=int(os.environ.get("LOG_VIEWER_HEALTH_HISTORY", "720")),
+)
+
 _CACHE_LOCK = Lock()
 _CACHE = {
     "batch_stats": {},  # filename -> {"signature": sig, "data": {...}}
@@ -45,6 +78,41 @@ def _logo_context() -> dict:
     }
 
 
+def _get_indexer() -> LogIndexer | None:
+    """Start the background analytics indexer on first use."""
+    global _INDEXER
+    if not _INDEXER_ENABLED:
+        return None
+    with _INDEXER_LOCK:
+        if _INDEXER is None:
+            _INDEXER = LogIndexer(BATCH_LOG_DIR)
+            _INDEXER.start()
+    return _INDEXER
+
+
+def warm_caches(timeout: float = 600.0) -> None:
+    """Start the health sampler and prepare the data behind the pages.
+
+    With the analytics indexer this waits for its first pass (another
+    viewer process may be doing it) and touches the store; without it every
+    batch is parsed once into the in-process caches.
+    """
+    _get_health_sampler()  # history starts at boot, not at the first page view
+    files = _list_csv(BATCH_LOG_DIR)
+    indexer = _get_indexer()
+    if indexer is not None and indexer.ready.wait(timeout):
+        indexer.scan_totals()
+        indexer.daily_trends()
+        return
+    _count_scans(files)
+    _daily_trends(files)
+    for entry in files:
+        try:
+            _batch_stats(entry["name"])
+        except HTTPException:
+            continue
+
+
 def _human_size(num_bytes: int) -> str:
     for unit in ["B", "KB", "MB", "GB"]:
         if num_bytes < 1024 or unit == "GB":
@@ -81,6 +149,11 @@ def _count_scans(files: list[dict]) -> tuple[int, int]:
     total_pass = 0
     for entry in files:
         path = BATCH_LOG_DIR / entry["name"]
+        summary = read_summary(path)
+        if summary is not None:
+            total += summary.rows
+            total_pass += summary.statuses.get("PASS", 0)
+            continue
         try:
             with path.open(newline="", encoding="utf-8") as handle:
                 reader = csv.reader(handle)
@@ -97,14 +170,6 @@ def _count_scans(files: list[dict]) -> tuple[int, int]:
     return total, total_pass
 
 
-def _file_signature(path: Path) -> tuple | None:
-    try:
-        stats = path.stat()
-        return (stats.st_mtime, stats.st_size)
-    except OSError:
-        return None
-
-
 def _read_log_rows(path: Path) -> list[dict]:
     rows: list[dict] = []
     try:
@@ -139,138 +204,227 @@ def _read_log_rows(path: Path) -> list[dict]:
     return rows
 
 
+def _summary_batch_stats(path: Path) -> dict | None:
+    """Compute _batch_stats from the batch_summary sidecar, if it is current."""
+    summary = read_summary(path)
+    if summary is None:
+        return None
+    pass_count = summary.statuses.get("PASS", 0)
+    duplicate_count = summary.statuses.get("DUPLICATE", 0)
+    chart_pass, chart_duplicate, chart_other = [], [], []
+    for hour in summary.hours:
+        counts = hour["statuses"]
+        chart_pass.append(counts.get("PASS", 0))
+        chart_duplicate.append(counts.get("DUPLICATE", 0))
+        chart_other.append(sum(counts.values()) - chart_pass[-1] - chart_duplicate[-1])
+    return {
+        "total": summary.rows,
+        "pass": pass_count,
+        "duplicate": duplicate_count,
+        "other": summary.rows - pass_count - duplicate_count,
+        "first_time": summary.first_time,
+        "last_time": summary.last_time,
+        "chart_labels": [hour["hour"] for hour in summary.hours],
+        "chart_pass": chart_pass,
+        "chart_duplicate": chart_duplicate,
+        "chart_other": chart_other,
+    }
+
+
+def _csv_row_count(path: Path) -> int:
+    """Data rows in a batch CSV, counted as lines without parsing them."""
+    lines = 0
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            lines += chunk.count(b"\n")
+    return max(lines - 1, 0)  # header
+
+
+def _binary_batch_stats(path: Path) -> dict | None:
+    """Compute _batch_stats from the binary scan log, if it holds every CSV row.
+
+    A scan log started part-way through a batch (binary logging enabled on a
+    resumed batch) has fewer records than the CSV has rows and is ignored.
+    """
+    if np is None:
+        return None
+    scans_path = scan_log_path(path)
+    try:
+        if scans_path.stat().st_mtime < path.stat().st_mtime:
+            return None
+        records = read_scan_log(scans_path)
+        if not len(records) or len(records) != _csv_row_count(path):
+            return None
+    except (OSError, ValueError):
+        return None
+
+    ts_ms = records["ts_ms"].astype(np.int64)
+    # 0 = PASS, 1 = DUPLICATE, 2 = everything else (see scan_binlog.STATUS_CODES)
+    kind = np.minimum(records["status"], 2)
+    counts = np.bincount(kind, minlength=3)
+    first_ms, last_ms = int(ts_ms.min()), int(ts_ms.max())
+
+    # Hour buckets in local time, like the CSV timestamps.  UTC offsets only
+    # change on 15-minute boundaries, so each 15-minute slot is converted on its
+    # own and DST changes inside a batch land in the right local hour.
+    slots, slot_index = np.unique(ts_ms // 900_000, return_inverse=True)
+    per_slot = np.zeros((len(slots), 3), dtype=np.int64)
+    np.add.at(per_slot, (slot_index, kind), 1)
+    hours: dict = {}
+    for slot, slot_counts in zip(slots.tolist(), per_slot):
+        label = datetime.fromtimestamp(slot * 900).strftime("%Y-%m-%d %H:00")
+        hours[label] = hours.get(label, 0) + slot_counts
+    labels = sorted(hours)
+
+    return {
+        "total": int(len(records)),
+        "pass": int(counts[0]),
+        "duplicate": int(counts[1]),
+        "other": int(counts[2]),
+        "first_time": datetime.fromtimestamp(first_ms / 1000).strftime("%Y-%m-%d %H:%M:%S"),
+        "last_time": datetime.fromtimestamp(last_ms / 1000).strftime("%Y-%m-%d %H:%M:%S"),
+        "chart_labels": labels,
+        "chart_pass": [int(hours[label][0]) for label in labels],
+        "chart_duplicate": [int(hours[label][1]) for label in labels],
+        "chart_other": [int(hours[label][2]) for label in labels],
+    }
+
+
+def _parse_log_timestamp(ts: str) -> datetime | None:
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%d/%m/%Y %H:%M:%S"):
+        try:
+            return datetime.strptime(ts, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _tail_batch_rows(path: Path, offset: int, size: int, aggregates: dict) -> int:
+    """Fold complete rows between offset and size into aggregates; return the new offset."""
+    with path.open("rb") as handle:
+        handle.seek(offset)
+        data = handle.read(size - offset)
+    # A partially written last line is picked up on the next refresh
+    data = data[: data.rfind(b"\n") + 1]
+    expected = ["Timestamp", "BatchNumber", "Mould", "QRCode", "Status"]
+    try:
+        rows = list(csv.reader(io.StringIO(data.decode("utf-8", "replace"), newline="")))
+    except csv.Error:
+        rows = []
+    if offset == 0 and rows and [h.strip() for h in rows[0]] == expected:
+        rows = rows[1:]
+    timeline = aggregates["timeline"]
+    for row in rows:
+        if not row:
+            continue
+        aggregates["total"] += 1
+        status = row[4].strip().upper() if len(row) > 4 else ""
+        kind = status if status in ("PASS", "DUPLICATE") else "OTHER"
+        aggregates[kind.lower()] += 1
+        ts = _parse_log_timestamp(row[0].strip())
+        if not ts:
+            continue
+        if aggregates["first"] is None or ts < aggregates["first"]:
+            aggregates["first"] = ts
+        if aggregates["last"] is None or ts > aggregates["last"]:
+            aggregates["last"] = ts
+        bucket = ts.replace(minute=0, second=0, microsecond=0)
+        timeline.setdefault(bucket, {"PASS": 0, "DUPLICATE": 0, "OTHER": 0})[kind] += 1
+    return offset + len(data)
+
+
 def _batch_stats(filename: str) -> dict:
+    """Totals and hourly chart data for one batch log.
+
+    Uses the summary sidecar or binary scan log when available.  Otherwise
+    the CSV is parsed once and the cache keeps the byte offset reached plus
+    the running aggregates, so when a live batch grows only the appended
+    rows are parsed.  Either result is cached until the file's mtime or
+    size changes; a log rewritten in place is parsed from the top again.
+    """
     path = (BATCH_LOG_DIR / filename).resolve()
     if not path.exists() or path.parent != BATCH_LOG_DIR.resolve():
         abort(404)
 
-    signature = _file_signature(path)
+    try:
+        stats = path.stat()
+    except OSError:
+        abort(404)
+    signature = (stats.st_mtime, stats.st_size)
     with _CACHE_LOCK:
         cached = _CACHE["batch_stats"].get(filename)
         if cached and cached["signature"] == signature:
             return copy.deepcopy(cached["data"])
+        cached = copy.deepcopy(cached)
 
-    rows = _read_log_rows(path)
-    if not rows:
-        result = {
-            "filename": filename,
-            "total": 0,
-            "pass": 0,
-            "duplicate": 0,
-            "other": 0,
-            "first_time": None,
-            "last_time": None,
-            "timeline": [],
-            "chart_labels": [],
-            "chart_pass": [],
-            "chart_duplicate": [],
-            "chart_other": [],
-        }
+    fast_stats = _summary_batch_stats(path) or _binary_batch_stats(path)
+    if fast_stats is not None:
+        result = {"filename": filename, **fast_stats}
         with _CACHE_LOCK:
-            _CACHE["batch_stats"][filename] = {
-                "signature": signature,
-                "data": copy.deepcopy(result),
-            }
+            _CACHE["batch_stats"][filename] = {"signature": signature, "data": copy.deepcopy(result)}
         return result
 
-    total = len(rows)
-    pass_count = sum(1 for r in rows if r["status"] == "PASS")
-    duplicate_count = sum(1 for r in rows if r["status"] == "DUPLICATE")
-    other_count = total - pass_count - duplicate_count
-
-    def _parse_ts(ts: str) -> datetime | None:
-        for fmt in ("%Y-%m-%d %H:%M:%S", "%d/%m/%Y %H:%M:%S"):
-            try:
-                return datetime.strptime(ts, fmt)
-            except ValueError:
-                continue
-        return None
-
-    timestamps = [t for r in rows if (t := _parse_ts(r["timestamp"]))]
-    first_time = min(timestamps).strftime("%Y-%m-%d %H:%M:%S") if timestamps else None
-    last_time = max(timestamps).strftime("%Y-%m-%d %H:%M:%S") if timestamps else None
-
-    timeline = defaultdict(lambda: {"PASS": 0, "DUPLICATE": 0, "OTHER": 0})
-    for r in rows:
-        ts = _parse_ts(r["timestamp"])
-        if not ts:
-            continue
-        bucket = ts.replace(minute=0, second=0, microsecond=0)
-        status = r["status"] if r["status"] in ("PASS", "DUPLICATE") else "OTHER"
-        timeline[bucket][status] += 1
-
-    chart_labels = []
-    chart_pass = []
-    chart_duplicate = []
-    chart_other = []
-    for bucket in sorted(timeline.keys()):
-        chart_labels.append(bucket.strftime("%Y-%m-%d %H:%M"))
-        chart_pass.append(timeline[bucket]["PASS"])
-        chart_duplicate.append(timeline[bucket]["DUPLICATE"])
-        chart_other.append(timeline[bucket]["OTHER"])
+    if (
+        cached
+        and cached.get("inode") == stats.st_ino
+        and cached["offset"] <= stats.st_size
+        and head_matches(path, cached["head"])
+    ):
+        offset, aggregates = cached["offset"], cached["aggregates"]
+    else:
+        offset = 0
+        aggregates = {"total": 0, "pass": 0, "duplicate": 0, "other": 0, "first": None, "last": None, "timeline": {}}
+    try:
+        offset = _tail_batch_rows(path, offset, stats.st_size, aggregates)
+        head = head_fingerprint(path, offset)
+    except OSError:
+        abort(404)
 
-    return {
+    timeline = aggregates["timeline"]
+    buckets = sorted(timeline)
+    result = {
         "filename": filename,
-        "total": total,
-        "pass": pass_count,
-        "duplicate": duplicate_count,
-        "other": other_count,
-        "first_time": first_time,
-        "last_time": last_time,
-        "chart_labels": chart_labels,
-        "chart_pass": chart_pass,
-        "chart_duplicate": chart_duplicate,
-        "chart_other": chart_other,
+        "total": aggregates["total"],
+        "pass": aggregates["pass"],
+        "duplicate": aggregates["duplicate"],
+        "other": aggregates["other"],
+        "first_time": aggregates["first"].strftime("%Y-%m-%d %H:%M:%S") if aggregates["first"] else None,
+        "last_time": aggregates["last"].strftime("%Y-%m-%d %H:%M:%S") if aggregates["last"] else None,
+        "chart_labels": [bucket.strftime("%Y-%m-%d %H:%M") for bucket in buckets],
+        "chart_pass": [timeline[bucket]["PASS"] for bucket in buckets],
+        "chart_duplicate": [timeline[bucket]["DUPLICATE"] for bucket in buckets],
+        "chart_other": [timeline[bucket]["OTHER"] for bucket in buckets],
     }
 
     with _CACHE_LOCK:
         _CACHE["batch_stats"][filename] = {
             "signature": signature,
+            "inode": stats.st_ino,
+            "offset": offset,
+            "head": head,
+            "aggregates": aggregates,
             "data": copy.deepcopy(result),
         }
     return result
 
 
-def _health_metrics() -> dict:
-    temp = None
-    for path in ("/sys/class/thermal/thermal_zone0/temp",):
-        try:
-            with open(path, "r", encoding="utf-8") as handle:
-                temp = float(handle.read().strip()) / 1000.0
-                break
-        except (OSError, ValueError):
-            continue
-
-    disk = shutil.disk_usage(BATCH_LOG_DIR)
-    disk_used_pct = (disk.used / disk.total) * 100 if disk.total else 0
+def _get_health_sampler() -> HealthSampler:
+    _HEALTH_SAMPLER.start()
+    return _HEALTH_SAMPLER
 
-    try:
-        with open("/proc/uptime", "r", encoding="utf-8") as handle:
-            uptime_seconds = float(handle.read().split()[0])
-    except (OSError, ValueError):
-        uptime_seconds = 0
-    uptime = timedelta(seconds=int(uptime_seconds))
-
-    latest_mtime = None
-    for path in BATCH_LOG_DIR.glob("*.csv"):
-        try:
-            mtime = path.stat().st_mtime
-            if not latest_mtime or mtime > latest_mtime:
-                latest_mtime = mtime
-        except OSError:
-            continue
-    last_event = (
-        datetime.fromtimestamp(latest_mtime).strftime("%Y-%m-%d %H:%M:%S")
-        if latest_mtime
-        else "N/A"
-    )
-    age_seconds = time.time() - latest_mtime if latest_mtime else None
 
+def _health_metrics() -> dict:
+    """Dashboard health panel text from the sampler's latest sample."""
+    sample = _get_health_sampler().latest()
+    temp = sample["temp_c"]
+    disk_pct = sample["disk_pct"]
+    last_scan = sample["last_scan"]
+    age_seconds = sample["last_scan_age"]
     return {
         "temp": f"{temp:.1f} °C" if temp is not None else "N/A",
-        "disk": f"{disk_used_pct:.1f}% used",
-        "uptime": str(uptime),
-        "last_event": last_event,
+        "disk": f"{disk_pct:.1f}% used" if disk_pct is not None else "N/A",
+        "uptime": str(timedelta(seconds=int(sample["uptime"]))),
+        "last_event": datetime.fromtimestamp(last_scan).strftime("%Y-%m-%d %H:%M:%S") if last_scan else "N/A",
         "last_event_age": f"{int(age_seconds // 60)} mins ago" if age_seconds else "N/A",
     }
 
@@ -285,6 +439,15 @@ def _daily_trends(files: list[dict]) -> dict:
     totals = defaultdict(lambda: {"total": 0, "pass": 0, "duplicate": 0})
     for entry in files:
         path = BATCH_LOG_DIR / entry["name"]
+        summary = read_summary(path)
+        if summary is not None:
+            for hour in summary.hours:
+                day = datetime.strptime(hour["hour"][:10], "%Y-%m-%d").date()
+                counts = hour["statuses"]
+                totals[day]["total"] += sum(counts.values())
+                totals[day]["pass"] += counts.get("PASS", 0)
+                totals[day]["duplicate"] += counts.get("DUPLICATE", 0)
+            continue
         rows = _read_log_rows(path)
         for row in rows:
             ts = row["timestamp"]
@@ -327,6 +490,7 @@ TEMPLATE = """
         {% if favicon_available %}
         <link rel="icon" type="image/png" href="{{ url_for('static', filename=favicon_filename) }}" />
         {% endif %}
+        <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
         <style>
             * { box-sizing: border-box; }
             body { font-family: "Segoe UI", Arial, sans-serif; background: #f8fafc; color: #1f2937; margin:0; padding-top:150px; padding-bottom:80px; }
@@ -363,6 +527,12 @@ TEMPLATE = """
             .health-grid { display:grid; grid-template-columns: repeat(auto-fit, minmax(180px, 1fr)); gap:1rem; }
             .health-item { font-size:0.95rem; }
             .health-label { font-weight:600; color:#0f172a; display:block; text-transform:uppercase; letter-spacing:0.06em; margin-bottom:0.3rem; font-size:0.78rem; }
+            .live-panel { background:#ffffff; border-radius:10px; padding:1rem 1.2rem; box-shadow: 0 12px 28px -18px rgba(15,23,42,0.45); margin-bottom:1.5rem; }
+            .live-status { font-size:0.85rem; color:#64748b; margin-left:0.5rem; font-weight:400; }
+            .live-rows { list-style:none; margin:0.6rem 0 0; padding:0; max-height:220px; overflow-y:auto; font-family:Consolas, monospace; font-size:0.85rem; }
+            .live-rows li { padding:0.2rem 0; border-bottom:1px solid #f1f5f9; }
+            .live-rows .pass { color:#16a34a; }
+            .live-rows .fail { color:#dc2626; }
             .actions a { display:inline-block; padding:0.35rem 0.65rem; border-radius:4px; background:#2563eb; color:#ffffff; font-size:0.85rem; margin-right:0.4rem; }
             .actions a:last-child { margin-right:0; background:#0f172a; }
             .actions a:hover { filter:brightness(1.05); }
@@ -478,6 +648,18 @@ TEMPLATE = """
                 <div class="health-item"><span class="health-label">Uptime</span>{{ health.uptime }}</div>
                 <div class="health-item"><span class="health-label">Last Scan</span>{{ health.last_event }}<br><small>{{ health.last_event_age }}</small></div>
             </div>
+            <canvas id="healthChart" height="90"></canvas>
+        </section>
+        <section class="live-panel">
+            <h2>Live Scans<span class="live-status" id="live-status">connecting...</span></h2>
+            <div class="health-grid">
+                <div class="health-item"><span class="health-label">Batch</span><span id="live-batch">--</span></div>
+                <div class="health-item"><span class="health-label">Total</span><span id="live-total">--</span></div>
+                <div class="health-item"><span class="health-label">Pass</span><span id="live-pass">--</span></div>
+                <div class="health-item"><span class="health-label">Duplicate</span><span id="live-duplicate">--</span></div>
+                <div class="health-item"><span class="health-label">Other</span><span id="live-other">--</span></div>
+            </div>
+            <ul class="live-rows" id="live-rows"></ul>
         </section>
         <main>
         <section id="batch">
@@ -512,6 +694,51 @@ TEMPLATE = """
         </main>
         </div>
         <footer>{{ footer_text }}</footer>
+        <script>
+            fetch('/health').then(function (response) { return response.json(); }).then(function (health) {
+                if (!window.Chart || !health.history.length) { return; }
+                const labels = health.history.map(function (s) { return new Date(s.time * 1000).toLocaleTimeString(); });
+                const series = function (key) { return health.history.map(function (s) { return s[key]; }); };
+                new Chart(document.getElementById('healthChart'), {
+                    type: 'line',
+                    data: {
+                        labels: labels,
+                        datasets: [
+                            { label: 'CPU Temp (°C)', data: series('temp_c'), borderColor:'#dc2626', yAxisID:'y', pointRadius:0 },
+                            { label: 'Load (1 min)', data: series('load1'), borderColor:'#2563eb', yAxisID:'y1', pointRadius:0 },
+                            { label: 'Scans / min', data: series('scans_per_min'), borderColor:'#16a34a', yAxisID:'y', pointRadius:0 }
+                        ]
+                    },
+                    options: {
+                        responsive:true,
+                        animation:false,
+                        scales:{ y:{ beginAtZero:true, position:'left' }, y1:{ beginAtZero:true, position:'right', grid:{ drawOnChartArea:false } } }
+                    }
+                });
+            });
+        </script>
+        <script>
+            (function () {
+                if (!window.EventSource) { return; }
+                const status = document.getElementById('live-status');
+                const rows = document.getElementById('live-rows');
+                const source = new EventSource('/live');
+                source.onopen = function () { status.textContent = 'connected'; };
+                source.onerror = function () { status.textContent = 'reconnecting...'; };
+                source.addEventListener('scan', function (message) {
+                    const scan = JSON.parse(message.data);
+                    document.getElementById('live-batch').textContent = scan.batch;
+                    ['total', 'pass', 'duplicate', 'other'].forEach(function (key) {
+                        document.getElementById('live-' + key).textContent = scan.counters[key];
+                    });
+                    const item = document.createElement('li');
+                    item.className = scan.status === 'PASS' ? 'pass' : 'fail';
+                    item.textContent = scan.timestamp + '  ' + scan.qr + '  ' + scan.status + (scan.mould ? '  (' + scan.mould + ')' : '');
+                    rows.insertBefore(item, rows.firstChild);
+                    while (rows.children.length > 50) { rows.removeChild(rows.lastChild); }
+                });
+            })();
+        </script>
     </body>
 </html>
 """
@@ -540,6 +767,9 @@ DETAIL_TEMPLATE = """
             .toolbar { display:flex; flex-wrap:wrap; justify-content:space-between; align-items:center; gap:0.75rem; margin-bottom:1rem; }
             .refresh-toggle { color:#64748b; font-size:0.9rem; display:flex; flex-wrap:wrap; align-items:center; gap:0.75rem; }
             .last-refresh { font-weight:500; color:#475569; }
+            table { width:100%; border-collapse:collapse; margin-top:1rem; }
+            th, td { padding:0.5rem 0.75rem; border-bottom:1px solid #e2e8f0; text-align:left; }
+            thead th { background:#f1f5f9; font-weight:600; color:#0f172a; }
         </style>
         <script>
             const DETAIL_REFRESH_INTERVAL = 60000;
@@ -611,6 +841,19 @@ DETAIL_TEMPLATE = """
             </div>
             <h2>Hourly Breakdown</h2>
             <canvas id="timelineChart"></canvas>
+            {% if hour %}
+            <h2>Scans in {{ hour }} <a href="?">(clear)</a></h2>
+            <table>
+                <thead><tr><th>Timestamp</th><th>Mould</th><th>QR Code</th><th>Status</th></tr></thead>
+                <tbody>
+                {% for row in hour_rows %}
+                <tr><td>{{ row[0] }}</td><td>{{ row[2] }}</td><td>{{ row[3] }}</td><td>{{ row[4] }}</td></tr>
+                {% else %}
+                <tr><td colspan="4">No scans in this hour.</td></tr>
+                {% endfor %}
+                </tbody>
+            </table>
+            {% endif %}
         </div>
         <script>
             const timelineData = {{ chart_json | safe }};
@@ -629,6 +872,12 @@ DETAIL_TEMPLATE = """
                     responsive: true,
                     scales: {
                         y: { beginAtZero: true }
+                    },
+                    onClick: (event, elements) => {
+                        if (elements.length) {
+                            const hour = timelineData.labels[elements[0].index];
+                            window.location.search = "?hour=" + encodeURIComponent(hour);
+                        }
                     }
                 }
             });
@@ -735,6 +984,16 @@ TRENDS_TEMPLATE = """
                 <h2>Daily Pass / Duplicate</h2>
                 <canvas id="qualityChart"></canvas>
             </div>
+            {% if has_breakdowns %}
+            <div class="chart-card">
+                <h2>Pass / Rejected by Line</h2>
+                <canvas id="lineChart"></canvas>
+            </div>
+            <div class="chart-card">
+                <h2>Pass / Rejected by Mould</h2>
+                <canvas id="mouldChart"></canvas>
+            </div>
+            {% endif %}
         </div>
         <script>
             const trendData = {{ trends_json | safe }};
@@ -762,19 +1021,113 @@ TRENDS_TEMPLATE = """
                 },
                 options: { responsive:true, scales:{ y:{ beginAtZero:true } } }
             });
+
+            function breakdownChart(canvasId, data) {
+                const canvas = document.getElementById(canvasId);
+                if (!canvas || !data) {
+                    return;
+                }
+                new Chart(canvas, {
+                    type: 'bar',
+                    data: {
+                        labels: data.labels,
+                        datasets: [
+                            { label: 'Pass', data: data.pass, backgroundColor:'#16a34a' },
+                            { label: 'Rejected', data: data.other, backgroundColor:'#f97316' }
+                        ]
+                    },
+                    options: { responsive:true, scales:{ x:{ stacked:true }, y:{ stacked:true, beginAtZero:true } } }
+                });
+            }
+            breakdownChart('lineChart', trendData.lines);
+            breakdownChart('mouldChart', trendData.moulds);
         </script>
     </body>
 </html>
 """
 
 
+# Compiled once; render_template_string would recompile the source on every request
+_INDEX_VIEW = app.jinja_env.from_string(TEMPLATE)
+_DETAIL_VIEW = app.jinja_env.from_string(DETAIL_TEMPLATE)
+_TRENDS_VIEW = app.jinja_env.from_string(TRENDS_TEMPLATE)
+# Part of every ETag, so cached pages are refetched after the templates change
+_TEMPLATE_TAG = hashlib.sha1((TEMPLATE + DETAIL_TEMPLATE + TRENDS_TEMPLATE).encode("utf-8")).hexdigest()[:8]
+
+GZIP_MIN_BYTES = 1024
+_GZIP_TYPES = {"text/html", "text/csv", "application/json"}
+
+
+def _render(view, **context) -> str:
+    app.update_template_context(context)
+    return view.render(context)
+
+
+def _accepts_gzip() -> bool:
+    return request.accept_encodings["gzip"] > 0
+
+
+def _not_modified(etag: str, last_modified: float) -> bool:
+    """True when the client's cached copy (plain or gzip variant) is current."""
+    if request.if_none_match:
+        return request.if_none_match.contains(etag) or request.if_none_match.contains(etag + "-gz")
+    return not is_resource_modified(request.environ, last_modified=datetime.fromtimestamp(last_modified, timezone.utc))
+
+
+def _cacheable(response: Response, etag: str, last_modified: float) -> Response:
+    response.set_etag(etag)
+    response.last_modified = datetime.fromtimestamp(last_modified, timezone.utc)
+    # Live batches keep growing: let browsers keep a copy but always revalidate
+    response.cache_control.no_cache = True
+    return response
+
+
+def _not_modified_response(etag: str, last_modified: float) -> Response:
+    response = _cacheable(Response(status=304), etag, last_modified)
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def _file_etag(stats: os.stat_result) -> str:
+    return f"{stats.st_ino:x}-{stats.st_mtime_ns:x}-{stats.st_size:x}-{_TEMPLATE_TAG}"
+
+
+@app.after_request
+def _compress(response: Response) -> Response:
+    """Gzip buffered text responses for clients that accept it."""
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code != 200
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in _GZIP_TYPES
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    if not _accepts_gzip():
+        return response
+    body = response.get_data()
+    if len(body) < GZIP_MIN_BYTES:
+        return response
+    response.set_data(gzip.compress(body, compresslevel=6))
+    response.headers["Content-Encoding"] = "gzip"
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(etag + "-gz", weak=weak)
+    return response
+
+
 @app.route("/")
 def index():
     batch_files = _list_csv(BATCH_LOG_DIR)
-    scan_stats = _count_scans(batch_files)
+    indexer = _get_indexer()
+    if indexer is not None and indexer.ready.is_set():
+        scan_stats = indexer.scan_totals()
+    else:
+        scan_stats = _count_scans(batch_files)
     health = _health_metrics()
-    return render_template_string(
-        TEMPLATE,
+    return _render(
+        _INDEX_VIEW,
         batch_files=batch_files,
         batch_count=len(batch_files),
         batch_total_size=_human_size(sum(f["size"] for f in batch_files) or 0.0),
@@ -787,13 +1140,42 @@ def index():
     )
 
 
+def _gzip_file(path: Path, size: int):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    with path.open("rb") as handle:
+        remaining = size
+        while remaining > 0:
+            chunk = handle.read(min(EXPORT_CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+    yield compressor.flush()
+
+
 def _send_csv(directory: Path, filename: str):
     safe_name = Path(filename).name
     target = directory / safe_name
     if not target.exists() or target.suffix.lower() != ".csv":
         abort(404)
     download = request.args.get("download") == "1"
-    return send_from_directory(directory, safe_name, as_attachment=download)
+    stats = target.stat()
+    etag = _file_etag(stats)
+    if _not_modified(etag, stats.st_mtime):
+        return _not_modified_response(etag, stats.st_mtime)
+    if not _accepts_gzip() or request.range is not None:
+        response = send_from_directory(directory, safe_name, as_attachment=download, etag=False)
+        response.vary.add("Accept-Encoding")
+        return _cacheable(response, etag, stats.st_mtime)
+    # Compressed a chunk at a time up to the size we stat'ed, so a growing log is not buffered
+    response = Response(_gzip_file(target, stats.st_size), mimetype="text/csv")
+    response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    if download:
+        response.headers["Content-Disposition"] = f"attachment; filename={safe_name}"
+    return _cacheable(response, etag + "-gz", stats.st_mtime)
 
 
 @app.route("/batch/<path:filename>")
@@ -803,33 +1185,351 @@ def batch_file(filename: str):
 
 @app.route("/batch/<path:filename>/details")
 def batch_details(filename: str):
-    stats = _batch_stats(filename)
+    path = (BATCH_LOG_DIR / filename).resolve()
+    if not path.exists() or path.parent != BATCH_LOG_DIR.resolve():
+        abort(404)
+    file_stats = path.stat()
+    etag = _file_etag(file_stats)
+    if _not_modified(etag, file_stats.st_mtime):
+        return _not_modified_response(etag, file_stats.st_mtime)
+
+    indexer = _get_indexer()
+    stats = None
+    if indexer is not None and indexer.is_current(filename):
+        stats = indexer.batch_stats(filename)
+    if stats is None:
+        # The indexer is behind on this file (e.g. a live batch): read it directly
+        stats = _batch_stats(filename)
     chart_payload = {
         "labels": stats.pop("chart_labels"),
         "pass": stats.pop("chart_pass"),
         "duplicate": stats.pop("chart_duplicate"),
         "other": stats.pop("chart_other"),
     }
-    return render_template_string(
-        DETAIL_TEMPLATE,
+    # ?hour=YYYY-MM-DD HH:00 lists that hour's scans, read from its byte span via the summary
+    hour = (request.args.get("hour") or "").strip()
+    hour_rows = []
+    if hour:
+        try:
+            hour_rows = list(read_window(path, hour, next_hour(hour)))
+        except ValueError:
+            abort(400)
+    body = _render(
+        _DETAIL_VIEW,
         stats=stats,
         chart_json=json.dumps(chart_payload),
+        hour=hour,
+        hour_rows=hour_rows,
         **_logo_context(),
     )
+    # The validators predate the read, so rows appended meanwhile make the next request a miss
+    return _cacheable(Response(body, mimetype="text/html"), etag, file_stats.st_mtime)
 
 
 @app.route("/trends")
 def trends():
-    batch_files = _list_csv(BATCH_LOG_DIR)
-    aggregated = _daily_trends(batch_files)
-    return render_template_string(
-        TRENDS_TEMPLATE,
+    files = _list_csv(BATCH_LOG_DIR)
+    signature = repr([(entry["name"], entry["mtime"], entry["size"]) for entry in files])
+    etag = hashlib.sha1(signature.encode("utf-8")).hexdigest()[:16] + "-" + _TEMPLATE_TAG
+    last_modified = max((entry["mtime"] for entry in files), default=0.0)
+    if _not_modified(etag, last_modified):
+        return _not_modified_response(etag, last_modified)
+
+    indexer = _get_indexer()
+    current = True
+    if indexer is not None and indexer.ready.is_set():
+        aggregated = indexer.daily_trends()
+        current = all(indexer.is_current(entry["name"]) for entry in files)
+    else:
+        aggregated = _daily_trends(files)
+    body = _render(
+        _TRENDS_VIEW,
         trends_json=json.dumps(aggregated),
+        has_breakdowns="lines" in aggregated,
         **_logo_context(),
     )
+    response = Response(body, mimetype="text/html")
+    if not current:
+        # The index still lags the files; validators would pin this stale page
+        return response
+    return _cacheable(response, etag, last_modified)
+
+
+# ---------------- JSON API ----------------
+API_DEFAULT_LIMIT = 100
+API_MAX_LIMIT = 500
+
+
+def _api_error(status: int, message: str):
+    response = jsonify(error=message)
+    response.status_code = status
+    abort(response)
+
+
+def _api_indexer() -> LogIndexer:
+    indexer = _get_indexer()
+    if indexer is None or not indexer.ready.is_set():
+        _api_error(503, "index not ready")
+    return indexer
+
+
+def _api_int(name: str, default: int, minimum: int, maximum: int | None = None) -> int:
+    raw = request.args.get(name)
+    if raw in (None, ""):
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        _api_error(400, f"{name} must be an integer")
+    if value < minimum or (maximum is not None and value > maximum):
+        _api_error(400, f"{name} out of range")
+    return value
+
+
+def _api_time(name: str) -> str | None:
+    raw = request.args.get(name)
+    if not raw:
+        return None
+    for fmt in ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(raw, fmt).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            continue
+    _api_error(400, f"{name} must be YYYY-MM-DD[THH:MM:SS]")
+
+
+@app.route("/api/batches")
+def api_batches():
+    """Batch files with totals, paged by name: ?cursor=<last name>&limit=N."""
+    indexer = _api_indexer()
+    limit = _api_int("limit", API_DEFAULT_LIMIT, 1, API_MAX_LIMIT)
+    items = indexer.list_batches(after=request.args.get("cursor", ""), limit=limit + 1)
+    next_cursor = items[limit - 1]["name"] if len(items) > limit else None
+    return jsonify(items=items[:limit], next_cursor=next_cursor)
+
+
+@app.route("/api/batches/<path:filename>/rows")
+def api_batch_rows(filename: str):
+    """Scan rows of one batch, paged by row number: ?cursor=<last row>&limit=N.
+
+    Filters: status, mould, from, to (exclusive) and qr_prefix.
+    """
+    indexer = _api_indexer()
+    if not indexer.has_file(filename):
+        _api_error(404, "unknown batch")
+    limit = _api_int("limit", API_DEFAULT_LIMIT, 1, API_MAX_LIMIT)
+    items = indexer.batch_rows(
+        filename,
+        after=_api_int("cursor", -1, -1),
+        limit=limit + 1,
+        status=(request.args.get("status") or "").strip().upper() or None,
+        mould=(request.args.get("mould") or "").strip() or None,
+        since=_api_time("from"),
+        until=_api_time("to"),
+        qr_prefix=(request.args.get("qr_prefix") or "").strip() or None,
+    )
+    next_cursor = items[limit - 1]["row"] if len(items) > limit else None
+    return jsonify(items=items[:limit], next_cursor=next_cursor)
+
+
+# ---------------- Export ----------------
+EXPORT_CHUNK_BYTES = 64 * 1024
+_LOG_HEADER = ["Timestamp", "BatchNumber", "Mould", "QRCode", "Status"]
+
+
+class _ChunkSink:
+    """Write-only file object that buffers output for a streaming generator."""
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        self.size = 0
+        return data
+
+
+def _export_files(since: datetime | None, until: datetime | None) -> list[Path]:
+    """Batch CSVs that may hold rows in [since, until), oldest first."""
+    paths = [BATCH_LOG_DIR / entry["name"] for entry in reversed(_list_csv(BATCH_LOG_DIR))]
+    indexer = _get_indexer()
+    if indexer is None or not indexer.ready.is_set() or (since is None and until is None):
+        return paths
+    selected = []
+    for path in paths:
+        stats = indexer.batch_stats(path.name) if indexer.is_current(path.name) else None
+        if stats and stats["first_time"] and stats["last_time"]:
+            if since and stats["last_time"] < since.strftime("%Y-%m-%d %H:%M:%S"):
+                continue
+            if until and stats["first_time"] >= until.strftime("%Y-%m-%d %H:%M:%S"):
+                continue
+        selected.append(path)
+    return selected
+
+
+def _export_rows(path: Path, since, until, line: str | None, statuses: set[str] | None):
+    """Yield the matching data rows of one batch CSV, reading it line by line."""
+    try:
+        with path.open(newline="", encoding="utf-8", errors="replace") as handle:
+            for row in csv.reader(handle):
+                if len(row) < 5 or [cell.strip() for cell in row[:5]] == _LOG_HEADER:
+                    continue
+                if statuses and row[4].strip().upper() not in statuses:
+                    continue
+                if line and row[3].strip()[1:2] != line:
+                    continue
+                if since or until:
+                    ts = _parse_log_timestamp(row[0].strip())
+                    if ts is None or (since and ts < since) or (until and ts >= until):
+                        continue
+                yield row
+    except OSError:
+        return
+
+
+def _export_gzip(paths: list[Path], filters: tuple):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    text = io.StringIO()
+    writer = csv.writer(text)
+    writer.writerow(_LOG_HEADER)
+    for path in paths:
+        for row in _export_rows(path, *filters):
+            writer.writerow(row)
+            if text.tell() >= EXPORT_CHUNK_BYTES:
+                chunk = compressor.compress(text.getvalue().encode("utf-8"))
+                text.seek(0)
+                text.truncate()
+                if chunk:
+                    yield chunk
+    yield compressor.compress(text.getvalue().encode("utf-8")) + compressor.flush()
+
+
+def _export_zip(paths: list[Path], filters: tuple):
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for path in paths:
+            with archive.open(path.name, "w", force_zip64=True) as member:
+                text = io.StringIO()
+                writer = csv.writer(text)
+                writer.writerow(_LOG_HEADER)
+                for row in _export_rows(path, *filters):
+                    writer.writerow(row)
+                    if text.tell() >= EXPORT_CHUNK_BYTES:
+                        member.write(text.getvalue().encode("utf-8"))
+                        text.seek(0)
+                        text.truncate()
+                        if sink.size:
+                            yield sink.drain()
+                member.write(text.getvalue().encode("utf-8"))
+            if sink.size:
+                yield sink.drain()
+    yield sink.drain()
+
+
+@app.route("/export")
+def export():
+    """Stream matching rows of many batches as one CSV.gz or a zip of CSVs.
+
+    Query: from, to (exclusive), line, status (comma separated), batch
+    (repeatable; default all) and format=gz|zip.  Rows are read and
+    compressed a chunk at a time, so memory use does not grow with the export.
+    """
+    since, until = _api_time("from"), _api_time("to")
+    since = datetime.strptime(since, "%Y-%m-%d %H:%M:%S") if since else None
+    until = datetime.strptime(until, "%Y-%m-%d %H:%M:%S") if until else None
+    line = (request.args.get("line") or "").strip().upper() or None
+    statuses = {s.strip().upper() for s in (request.args.get("status") or "").split(",") if s.strip()} or None
+    fmt = request.args.get("format", "gz")
+    if fmt not in ("gz", "zip"):
+        _api_error(400, "format must be gz or zip")
+
+    paths = _export_files(since, until)
+    wanted = set(request.args.getlist("batch"))
+    if wanted:
+        paths = [path for path in paths if path.name in wanted or path.stem in wanted]
+    filters = (since, until, line, statuses)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    if fmt == "zip":
+        body, mimetype, name = _export_zip(paths, filters), "application/zip", f"batches_{stamp}.zip"
+    else:
+        body, mimetype, name = _export_gzip(paths, filters), "application/gzip", f"batches_{stamp}.csv.gz"
+    return Response(body, mimetype=mimetype, headers={"Content-Disposition": f"attachment; filename={name}"})
+
+
+@app.route("/live")
+def live():
+    """Server-Sent Events stream of scans as they are appended to batch_logs/.
+
+    Each row arrives as a "scan" event whose JSON carries the row and the
+    running counters of its batch.  All clients share one tailer thread.
+    At most LIVE_MAX_CLIENTS streams are open per process; beyond that the
+    answer is 503 and EventSource retries after the retry delay.
+    """
+    if not _LIVE_SLOTS.acquire(blocking=False):
+        response = jsonify(error="too many live clients")
+        response.status_code = 503
+        response.headers["Retry-After"] = "30"
+        return response
+    try:
+        events = _LIVE_TAILER.subscribe()
+    except BaseException:
+        _LIVE_SLOTS.release()
+        raise
+
+    def stream():
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                event = events.get(timeout=LIVE_KEEPALIVE_SECONDS)
+            except queue.Empty:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: scan\ndata: {json.dumps(event)}\n\n"
+
+    def close() -> None:
+        # Runs when the server closes the response, even if the stream never started
+        _LIVE_TAILER.unsubscribe(events)
+        _LIVE_SLOTS.release()
+
+    response = Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    response.call_on_close(close)
+    return response
+
+
+@app.route("/health")
+def health():
+    """Latest health sample and the ring-buffer history (?since=<epoch seconds> for newer only)."""
+    try:
+        since = float(request.args.get("since", 0))
+    except ValueError:
+        _api_error(400, "since must be epoch seconds")
+    sampler = _get_health_sampler()
+    return jsonify(
+        {
+            "interval": sampler.interval,
+            "latest": sampler.latest(),
+            "history": sampler.history(since),
+        }
+    )
 
 
 if __name__ == "__main__":
+    # Development server; serve_log_viewer.py is the production entry point
     port = int(os.environ.get("LOG_VIEWER_PORT", "8080"))
     debug = os.environ.get("LOG_VIEWER_DEBUG", "0") == "1"
     app.run(host="0.0.0.0", port=port, debug=debug)
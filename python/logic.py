@@ -1,19 +1,41 @@
 # logic.py
 
 import csv
+import io
 import json
 import logging
 import os
+import queue
 import re
 import string
+import threading
 import time
+from bisect import bisect_right
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Callable, Optional
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Tuple
 
 import tkinter as tk
 
-from config import LOG_FOLDER, RECOVERY_FILE
-from hardware import get_hardware_controller
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - only needed for bulk re-audits
+    np = None
+
+from config import (
+    BATCH_LOG_BINARY,
+    BATCH_LOG_FLUSH_INTERVAL_MS,
+    BATCH_LOG_FLUSH_ROWS,
+    BATCH_LOG_FSYNC,
+    BATCH_LOG_QUEUE_SIZE,
+    LOG_FOLDER,
+    RECOVERY_FILE,
+)
+from batch_summary import BatchSummary
+from hardware import FeedbackPattern, FeedbackScheduler, get_hardware_controller
+from scan_binlog import ScanLogWriter, scan_log_path
 
 
 # Hardware controller
@@ -55,22 +77,33 @@ def _handle_hardware_exception(exc: Exception) -> None:
 
 
 # ---------------- LED & BUZZER Integration ----------------
+# Patterns play on the scheduler thread; hardware errors reach the same
+# throttled handler as before.
+_feedback = FeedbackScheduler(_hardware, on_error=_handle_hardware_exception)
+
+PASS_FEEDBACK = FeedbackPattern("GREEN", 0.3)
+DUPLICATE_FEEDBACK = FeedbackPattern("YELLOW", 0.3)
+REJECT_FEEDBACK = FeedbackPattern("RED", 0.3, 0.5)
+
+
+def signal_feedback(pattern):
+    """Queue a light/buzzer pattern without blocking the caller."""
+    _feedback.submit(pattern)
+
+
 def blink_light(color, duration=0.3):
-    """Trigger LED blink; swallow hardware errors to keep UI alive."""
-    try:
-        _hardware.light_on(color)
-        time.sleep(duration)
-        _hardware.light_off(color)
-    except Exception as exc:  # pragma: no cover - hardware dependent
-        _handle_hardware_exception(exc)
+    """Queue an LED blink; hardware errors are reported asynchronously."""
+    signal_feedback(FeedbackPattern(color, duration))
 
 
 def buzz(duration=0.5):
-    """Trigger buzzer with hardware exception handling."""
-    try:
-        _hardware.buzz(duration)
-    except Exception as exc:  # pragma: no cover - hardware dependent
-        _handle_hardware_exception(exc)
+    """Queue a buzzer pulse; hardware errors are reported asynchronously."""
+    signal_feedback(FeedbackPattern(None, 0.0, duration))
+
+
+def shutdown_feedback():
+    """Let queued feedback finish and stop the scheduler thread."""
+    _feedback.close()
 
 
 # ---------------- Highlight + Validation Helpers ----------------
@@ -105,18 +138,89 @@ def force_uppercase(entry_widget, validator=None, on_valid=None):
     return entry_var
 
 
+# ---------------- Parsed QR Codes ----------------
+QR_LENGTH = 14
+_BATCH_NUMBER_PATTERN = re.compile(r"^M[V][A-Z][A-Z]{2}\d{5}$")
+_QR_TAIL_PATTERN = re.compile(r"([A-Z])(\d{4})$")
+
+
+def _range_key(text):
+    """Range-check key: (the code up to its last 4 characters, those as a number).
+
+    None when the last 4 characters are not digits; such a code is never
+    inside a mould range, even one that spans two alpha blocks.
+    """
+    tail = text[-4:]
+    if not (tail.isascii() and tail.isdigit()):
+        return None
+    return (text[:-4], int(tail))
+
+
+def _range_keys(codes):
+    """_range_key over a NumPy array of 14-character codes.
+
+    Returns (heads, serials) arrays; serial is -1 where _range_key is None.
+    """
+    chars = np.ascontiguousarray(codes, dtype="<U14").view(np.uint32).reshape(codes.size, QR_LENGTH)
+    heads = np.ascontiguousarray(chars[:, :-4]).view(f"<U{QR_LENGTH - 4}").ravel()
+    digits = chars[:, -4:].astype(np.int64) - ord("0")
+    numeric = ((digits >= 0) & (digits <= 9)).all(axis=1)
+    serials = np.where(numeric, digits @ np.array([1000, 100, 10, 1]), -1)
+    return heads, serials
+
+
+class QRCode:
+    """A QR code split into its fields once, e.g. VAN142536A0001.
+
+    Index 1 is the line, 2:5 the mould type, and the code ends in an alpha
+    block letter followed by a 4-digit serial.  key is only set for
+    well-formed codes and is what the range index compares.
+    """
+
+    __slots__ = ("text", "well_formed", "line", "mould_type", "alpha_block", "serial", "key")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.well_formed = len(text) == QR_LENGTH and text.isalnum()
+        self.line = text[1:2]
+        self.mould_type = text[2:5]
+        tail = _QR_TAIL_PATTERN.search(text)
+        self.alpha_block = tail.group(1) if tail else None
+        self.serial = int(tail.group(2)) if tail else None
+        self.key = _range_key(text) if self.well_formed else None
+
+    def __str__(self) -> str:
+        return self.text
+
+    def __repr__(self) -> str:
+        return f"QRCode({self.text!r})"
+
+
+@lru_cache(maxsize=4096)
+def parse_qr(text: str) -> QRCode:
+    """Parse text into a QRCode, reusing recent results."""
+    return QRCode(text)
+
+
+def as_qr(qr_code) -> QRCode:
+    """Accept a QRCode or a raw string and return the parsed QRCode."""
+    if isinstance(qr_code, QRCode):
+        return qr_code
+    return parse_qr(qr_code)
+
+
 # ---------------- Validators ----------------
 def validate_batch_number(batch_no):
-    pattern = r"^M[V][A-Z][A-Z]{2}\d{5}$"
-    return re.match(pattern, batch_no) is not None
+    return _BATCH_NUMBER_PATTERN.match(batch_no) is not None
 
 
 def validate_qr_format(qr_code):
-    return len(qr_code) == 14 and qr_code.isalnum()
+    return as_qr(qr_code).well_formed
 
 
 def validate_qr_match(qr_code, line, mould_type):
-    return len(qr_code) >= 5 and qr_code[1] == line and qr_code[2:5] == mould_type
+    qr = as_qr(qr_code)
+    return len(qr.text) >= 5 and qr.line == line and qr.mould_type == mould_type
 
 
 def batch_number_validator(val):
@@ -149,20 +253,19 @@ def qr_validator(val, line_val, mould_type):
 # ---------------- Batch Calculation ----------------
 def calculate_batch_size(qr_start, qr_end):
     """Calculate the number of QR codes between the provided range."""
-    match_start = re.match(r".*([A-Z])(\d{4})$", qr_start)
-    match_end = re.match(r".*([A-Z])(\d{4})$", qr_end)
-    if not match_start or not match_end:
+    start, end = as_qr(qr_start), as_qr(qr_end)
+    if start.serial is None or end.serial is None:
         return 0
-    start_alpha, start_serial = match_start.groups()
-    end_alpha, end_serial = match_end.groups()
-    start_serial = int(start_serial)
-    end_serial = int(end_serial)
+    start_alpha, start_serial = start.alpha_block, start.serial
+    end_alpha, end_serial = end.alpha_block, end.serial
     alpha_list = list(string.ascii_uppercase)
     start_index = alpha_list.index(start_alpha)
     end_index = alpha_list.index(end_alpha)
     total_count = 0
     for offset, alpha in enumerate(alpha_list[start_index : end_index + 1]):
-        if offset == 0:
+        if start_index == end_index:
+            total_count += end_serial - start_serial + 1
+        elif offset == 0:
             total_count += 9999 - start_serial + 1
         elif offset == (end_index - start_index):
             total_count += end_serial
@@ -171,91 +274,547 @@ def calculate_batch_size(qr_start, qr_end):
     return total_count
 
 
+# ---------------- Mould Range Index ----------------
+class MouldRangeIndex:
+    """Sorted, non-overlapping mould QR ranges with bisect lookup.
+
+    Built once when a batch is set up and shared by every validation path, so
+    the per-scan range check stays O(log n) whatever the mould count.  Bounds
+    are stored as parsed QRCode keys.  Malformed, inverted or overlapping
+    ranges raise ValueError at construction time instead of letting the first
+    matching mould win silently.
+    """
+
+    __slots__ = ("_starts", "_ends", "_moulds", "_ranges")
+
+    def __init__(self, mould_ranges: Dict[str, Tuple[str, str]]):
+        entries = []
+        for mould, (start, end) in mould_ranges.items():
+            start_qr, end_qr = as_qr(start), as_qr(end)
+            if start_qr.key is None or end_qr.key is None:
+                raise ValueError(f"Mould {mould}: QR range {start}-{end} is not a pair of valid QR codes")
+            if start_qr.key > end_qr.key:
+                raise ValueError(f"Mould {mould}: QR start {start} is after QR end {end}")
+            entries.append((start_qr.key, end_qr.key, mould))
+        entries.sort()
+        for prev, entry in zip(entries, entries[1:]):
+            if entry[0] <= prev[1]:
+                raise ValueError(f"Mould {entry[2]} QR range overlaps mould {prev[2]}")
+        self._starts = [entry[0] for entry in entries]
+        self._ends = [entry[1] for entry in entries]
+        self._moulds = [entry[2] for entry in entries]
+        self._ranges = dict(mould_ranges)
+
+    def lookup(self, qr_code) -> Optional[str]:
+        """Return the mould whose range contains qr_code, or None."""
+        key = as_qr(qr_code).key
+        if key is None:
+            return None
+        pos = bisect_right(self._starts, key) - 1
+        if pos >= 0 and key <= self._ends[pos]:
+            return self._moulds[pos]
+        return None
+
+    def items(self):
+        return self._ranges.items()
+
+    def lookup_many(self, codes):
+        """lookup for a NumPy array of well-formed codes; returns an object array of moulds.
+
+        Keys are packed into integers, head rank * 10000 + serial, where a
+        bound's head ranks 2i+1 and a head between bounds ranks 2i, so one
+        searchsorted does what bisect does in lookup.
+        """
+        heads, serials = _range_keys(codes)
+        moulds = np.full(codes.size, None, dtype=object)
+        if not self._moulds:
+            return moulds
+        bound_heads = np.unique([head for head, _ in self._starts + self._ends])
+
+        def packed(head_array, serial_array):
+            pos = np.searchsorted(bound_heads, head_array)
+            exact = bound_heads[np.minimum(pos, bound_heads.size - 1)] == head_array
+            return (2 * pos + exact) * 10000 + serial_array
+
+        starts = packed(np.array([head for head, _ in self._starts]), np.array([serial for _, serial in self._starts]))
+        ends = packed(np.array([head for head, _ in self._ends]), np.array([serial for _, serial in self._ends]))
+        keys = packed(heads, serials)
+        pos = np.searchsorted(starts, keys, side="right") - 1
+        hit = (serials >= 0) & (pos >= 0)
+        hit[hit] = keys[hit] <= ends[pos[hit]]
+        moulds[hit] = np.array(self._moulds, dtype=object)[pos[hit]]
+        return moulds
+
+    def __len__(self) -> int:
+        return len(self._moulds)
+
+    def __contains__(self, mould) -> bool:
+        return mould in self._ranges
+
+
+def as_range_index(mould_ranges) -> MouldRangeIndex:
+    """Return mould_ranges as a MouldRangeIndex, indexing plain dicts on the fly."""
+    if isinstance(mould_ranges, MouldRangeIndex):
+        return mould_ranges
+    return MouldRangeIndex(mould_ranges or {})
+
+
 # ---------------- QR Scan Logic ----------------
-def handle_qr_scan(qr_code, batch_line, mould_ranges, duplicate_checker=None):
+def handle_qr_scan(qr_code, batch_line, mould_ranges, duplicate_checker=None, claim=None):
     """Validate a QR code and return (status, mould).
 
-    duplicate_checker is an optional callable that receives qr_code and
+    qr_code may be a raw string or a QRCode; it is parsed once and the parsed
+    fields are reused by every check below.
+
+    mould_ranges should be the MouldRangeIndex built at batch setup; a plain
+    {mould: (start, end)} dict is still accepted and indexed per call.
+
+    duplicate_checker is an optional callable that receives the QR string and
     returns True if the code has already been scanned for the active batch.
+
+    claim, if given, is used instead: it receives the QR string, records it
+    and returns False if it was already recorded (DuplicateTracker.claim), so
+    a PASS needs no separate record_scan afterwards.
     """
-    if not validate_qr_format(qr_code):
-        blink_light("RED")
-        buzz()
+    qr = as_qr(qr_code)
+    if not qr.well_formed:
+        signal_feedback(REJECT_FEEDBACK)
         return "INVALID FORMAT", None
 
-    if qr_code[1] != batch_line:
-        blink_light("RED")
-        buzz()
+    if qr.line != batch_line:
+        signal_feedback(REJECT_FEEDBACK)
         return "LINE MISMATCH", None
 
-    for mould, (start, end) in mould_ranges.items():
-        if start <= qr_code <= end:
-            if duplicate_checker and duplicate_checker(qr_code):
-                blink_light("YELLOW")
-                return "DUPLICATE", mould
-            blink_light("GREEN")
-            return "PASS", mould
-
-    blink_light("RED")
-    buzz()
+    mould = as_range_index(mould_ranges).lookup(qr)
+    if mould is not None:
+        if claim is not None:
+            duplicate = not claim(qr.text)
+        else:
+            duplicate = bool(duplicate_checker and duplicate_checker(qr.text))
+        if duplicate:
+            signal_feedback(DUPLICATE_FEEDBACK)
+            return "DUPLICATE", mould
+        signal_feedback(PASS_FEEDBACK)
+        return "PASS", mould
+
+    signal_feedback(REJECT_FEEDBACK)
     return "OUT OF BATCH", None
 
 
+# ---------------- Batch Context ----------------
+@dataclass(frozen=True)
+class BatchContext:
+    """Immutable per-batch state shared by the UI, legacy UART and PLC paths.
+
+    Built once when a batch starts (or resumes) so the scan path reads
+    precomputed fields instead of re-deriving them from widgets.  duplicates
+    is the DuplicateTracker-style handle (already_scanned/claim) or None
+    for offline audits; capacities maps each mould to calculate_batch_size
+    and sizes the duplicate tracker's per-mould bitsets.
+    """
+
+    batch_number: str
+    line: str
+    range_index: MouldRangeIndex
+    duplicates: Optional[object] = None
+    capacities: Mapping[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def create(cls, batch_number, line, mould_ranges, duplicates=None) -> "BatchContext":
+        """Index mould_ranges and work out per-mould capacities.
+
+        Raises ValueError for malformed, inverted or overlapping ranges.
+        """
+        index = as_range_index(mould_ranges)
+        capacities = {mould: calculate_batch_size(start, end) for mould, (start, end) in index.items()}
+        load_batch = getattr(duplicates, "load_batch", None)
+        if load_batch and batch_number:
+            load_batch(batch_number, index.items(), capacities)
+        return cls(batch_number, line, index, duplicates, MappingProxyType(capacities))
+
+    def mould_ranges(self) -> List[Dict[str, str]]:
+        """Mould ranges in setup order, in the recovery-state layout."""
+        return [
+            {"name": mould, "qr_start": start, "qr_end": end}
+            for mould, (start, end) in self.range_index.items()
+        ]
+
+    def is_duplicate(self, qr_code) -> bool:
+        if self.duplicates is None or not self.batch_number:
+            return False
+        return self.duplicates.already_scanned(self.batch_number, str(qr_code))
+
+    def claim(self, qr_code) -> bool:
+        """Record qr_code as scanned; False if it already was."""
+        if self.duplicates is None or not self.batch_number:
+            return True
+        return self.duplicates.claim(self.batch_number, str(qr_code))
+
+    def scan(self, qr_code) -> Tuple[str, Optional[str]]:
+        """handle_qr_scan against this batch; a PASS is already recorded on return."""
+        return handle_qr_scan(qr_code, self.line, self.range_index, claim=self.claim)
+
+
+# ---------------- Bulk Validation ----------------
+def validate_many(qr_codes: Iterable[str], batch_context: BatchContext) -> List[Tuple[str, Optional[str]]]:
+    """Classify many QR codes at once and return [(status, mould), ...].
+
+    Applies the same rules as handle_qr_scan in a few vectorised passes and
+    never touches the LEDs or buzzer.  A code counts as DUPLICATE when it
+    already passed earlier in qr_codes; the live duplicate tracker is not
+    consulted.
+    """
+    if np is None:
+        raise RuntimeError("numpy not installed")
+
+    codes = np.array(list(qr_codes), dtype=str)
+    count = codes.size
+    statuses = np.full(count, "OUT OF BATCH", dtype=object)
+    moulds = np.full(count, None, dtype=object)
+    if count == 0:
+        return []
+
+    well_formed = (np.char.str_len(codes) == QR_LENGTH) & np.char.isalnum(codes)
+    line_ok = np.zeros(count, dtype=bool)
+    if len(batch_context.line) == 1:
+        # Column 1 of the code's UCS-4 characters is the line
+        line = np.ascontiguousarray(codes[well_formed], dtype="<U14").view(np.uint32).reshape(-1, QR_LENGTH)[:, 1]
+        line_ok[well_formed] = line == ord(batch_context.line)
+
+    candidates = np.flatnonzero(line_ok)
+    moulds[candidates] = batch_context.range_index.lookup_many(codes[candidates])
+    in_range = np.zeros(count, dtype=bool)
+    in_range[candidates] = np.not_equal(moulds[candidates], None)
+
+    first_seen = np.zeros(count, dtype=bool)
+    candidates = np.flatnonzero(in_range)
+    _, first = np.unique(codes[candidates], return_index=True)
+    first_seen[candidates[first]] = True
+
+    statuses[~well_formed] = "INVALID FORMAT"
+    statuses[well_formed & ~line_ok] = "LINE MISMATCH"
+    statuses[in_range] = "DUPLICATE"
+    statuses[first_seen] = "PASS"
+    return list(zip(statuses.tolist(), moulds.tolist()))
+
+
+def audit_batch_log(csv_path, batch_context: BatchContext) -> List[Tuple[int, str, str, str]]:
+    """Re-validate a finished batch log and report rows whose status differs.
+
+    Returns (row_number, qr_code, logged_status, audited_status) tuples; row
+    numbers count the header as row 1 to match spreadsheet views.
+    """
+    with open(csv_path, newline="") as handle:
+        rows = list(csv.DictReader(handle))
+    results = validate_many((row["QRCode"] for row in rows), batch_context)
+    return [
+        (row_number, row["QRCode"], row["Status"], status)
+        for row_number, (row, (status, _)) in enumerate(zip(rows, results), start=2)
+        if row["Status"] != status
+    ]
+
+
 # ---------------- CSV Logging ----------------
-def init_log(batch_number):
+LOG_HEADER = ["Timestamp", "BatchNumber", "Mould", "QRCode", "Status"]
+FSYNC_POLICIES = ("never", "batch", "close")
+_log_logger = logging.getLogger("batch_log")
+
+
+class BatchLogWriter:
+    """Append scan rows to a batch CSV from a background thread.
+
+    write() stamps the row and queues it, so the Tk thread never waits on the
+    SD card.  The writer thread writes queued rows in groups once flush_rows
+    are waiting or flush_interval_ms has passed since the first of them.
+    fsync is "batch" (fsync after every group), "close" (only in drain and
+    close) or "never" (leave it to the OS).  drain() returns once every row
+    queued before it has been written out.
+
+    With binary_path set, every row is also written as a fixed-width record
+    to a scan_binlog scan log in the same group.  The batch_summary sidecar
+    is brought up to date after every group.
+    """
+
+    _STOP = object()
+    _ALIVE_CHECK_SECONDS = 1.0
+
+    def __init__(
+        self,
+        csv_path,
+        append: bool = False,
+        flush_rows: int = 50,
+        flush_interval_ms: int = 250,
+        fsync: str = "batch",
+        queue_size: int = 10000,
+        binary_path=None,
+    ) -> None:
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+        self.path = csv_path
+        write_header = not (append and os.path.exists(csv_path))
+        self._file = open(csv_path, mode="a" if append else "w", newline="", encoding="utf-8")
+        if write_header:
+            csv.writer(self._file).writerow(LOG_HEADER)
+            self._file.flush()
+        self._summary = BatchSummary.open(csv_path)
+        self._line = io.StringIO()
+        self._line_writer = csv.writer(self._line)
+        self._binary = ScanLogWriter(binary_path, append=append) if binary_path else None
+        self._flush_rows = max(flush_rows, 1)
+        self._flush_interval = max(flush_interval_ms, 1) / 1000.0
+        self._fsync = fsync
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(queue_size, 1))
+        self._closed = False
+        self._stalled = False
+        self._thread = threading.Thread(target=self._run, name="batch-log-writer", daemon=True)
+        self._thread.start()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def write(self, batch_number, mould, qr_code, status) -> None:
+        """Queue one row; raises RuntimeError if the writer thread has died."""
+        if self._closed:
+            raise ValueError("write to closed batch log")
+        now = time.time()
+        stamp = datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S")
+        row = (int(now * 1000), [stamp, batch_number, mould or "UNKNOWN", qr_code, status])
+        self._put(row)
+
+    def drain(self) -> None:
+        """Block until every row written so far is flushed (and fsynced unless fsync is "never")."""
+        if self._closed:
+            return
+        done = threading.Event()
+        self._put(done)
+        while not done.wait(self._ALIVE_CHECK_SECONDS):
+            self._check_alive()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        try:
+            self.drain()
+            self._put(self._STOP)
+            self._thread.join()
+        except RuntimeError:
+            _log_logger.error("Batch log writer for %s had stopped; queued rows were not written", self.path)
+        finally:
+            self._closed = True
+            self._file.close()
+            if self._binary is not None:
+                self._binary.close()
+
+    def _check_alive(self) -> None:
+        if not self._thread.is_alive():
+            raise RuntimeError(f"Batch log writer for {self.path} has stopped")
+
+    def _put(self, item) -> None:
+        """Queue item, waiting while the queue is full but never on a dead writer."""
+        self._check_alive()
+        try:
+            self._queue.put_nowait(item)
+            self._stalled = False
+            return
+        except queue.Full:
+            if not self._stalled:
+                _log_logger.warning("Batch log queue full; waiting for %s", self.path)
+                self._stalled = True
+        while True:
+            try:
+                self._queue.put(item, timeout=self._ALIVE_CHECK_SECONDS)
+                return
+            except queue.Full:
+                self._check_alive()
+
+    def _run(self) -> None:
+        while True:
+            rows: List[Tuple[int, list]] = []
+            item = self._queue.get()
+            deadline = time.monotonic() + self._flush_interval
+            while isinstance(item, tuple):
+                rows.append(item)
+                if len(rows) >= self._flush_rows:
+                    item = None
+                    break
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    item = None
+            # item is now None (group full or timed out), a drain() Event or _STOP
+            self._write_rows(rows, sync=self._fsync == "batch" or (item is not None and self._fsync == "close"))
+            if item is self._STOP:
+                return
+            if item is not None:
+                item.set()
+
+    def _write_rows(self, rows: List[Tuple[int, list]], sync: bool) -> None:
+        try:
+            if rows:
+                offset = self._summary.csv_size
+                lines = []
+                for _, row in rows:
+                    self._line.seek(0)
+                    self._line.truncate()
+                    self._line_writer.writerow(row)
+                    line = self._line.getvalue()
+                    size = len(line.encode("utf-8"))
+                    self._summary.add(row, offset, size)
+                    offset += size
+                    lines.append(line)
+                self._file.write("".join(lines))
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+            if rows:
+                self._summary.save(offset)
+            if self._binary is not None:
+                if rows:
+                    self._binary.write_records((ts_ms, row[2], row[3], row[4]) for ts_ms, row in rows)
+                self._binary.flush()
+                if sync:
+                    os.fsync(self._binary.fileno())
+        except Exception:
+            # Keep the thread alive: a dead writer would leave drain() and write() waiting
+            _log_logger.exception("Failed to write %d rows to %s", len(rows), self.path)
+
+
+def _batch_log_path(batch_number) -> str:
     os.makedirs(LOG_FOLDER, exist_ok=True)
-    csv_path = os.path.join(LOG_FOLDER, f"{batch_number}.csv")
-    log_file = open(csv_path, mode="w", newline="")
-    csv_writer = csv.writer(log_file)
-    csv_writer.writerow(["Timestamp", "BatchNumber", "Mould", "QRCode", "Status"])
-    return log_file, csv_writer
+    return os.path.join(LOG_FOLDER, f"{batch_number}.csv")
 
 
-def write_log(csv_writer, log_file, batch_number, mould, qr_code, status):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    csv_writer.writerow([timestamp, batch_number, mould or "UNKNOWN", qr_code, status])
-    log_file.flush()
+def _open_batch_log(batch_number, append: bool) -> BatchLogWriter:
+    csv_path = _batch_log_path(batch_number)
+    return BatchLogWriter(
+        csv_path,
+        append=append,
+        flush_rows=BATCH_LOG_FLUSH_ROWS,
+        flush_interval_ms=BATCH_LOG_FLUSH_INTERVAL_MS,
+        fsync=BATCH_LOG_FSYNC,
+        queue_size=BATCH_LOG_QUEUE_SIZE,
+        binary_path=scan_log_path(csv_path) if BATCH_LOG_BINARY else None,
+    )
 
 
-def close_log(log_file):
-    if log_file and not log_file.closed:
-        log_file.close()
+def init_log(batch_number) -> BatchLogWriter:
+    return _open_batch_log(batch_number, append=False)
 
 
-def resume_log(batch_number):
-    os.makedirs(LOG_FOLDER, exist_ok=True)
-    csv_path = os.path.join(LOG_FOLDER, f"{batch_number}.csv")
-    file_exists = os.path.exists(csv_path)
-    log_file = open(csv_path, mode="a", newline="")
-    csv_writer = csv.writer(log_file)
-    if not file_exists:
-        csv_writer.writerow(["Timestamp", "BatchNumber", "Mould", "QRCode", "Status"])
-    return log_file, csv_writer
+def resume_log(batch_number) -> BatchLogWriter:
+    return _open_batch_log(batch_number, append=True)
+
+
+def write_log(batch_log, batch_number, mould, qr_code, status):
+    batch_log.write(batch_number, mould, qr_code, status)
+
+
+def close_log(batch_log):
+    if batch_log and not batch_log.closed:
+        batch_log.close()
+
+
+# ---------------- Recovery ----------------
+# Recovery state is a JSON checkpoint plus an append-only journal of the scans
+# made since it was written.  A scan costs one short appended line; the full
+# state is only rewritten at checkpoints, atomically via a temp file + rename.
+RECOVERY_CHECKPOINT_SCANS = 500
+_recovery_journal = None  # open append handle on the journal
+_recovery_journal_lines = 0
+
+
+def _recovery_path():
+    return os.path.join(LOG_FOLDER, RECOVERY_FILE)
+
+
+def _recovery_journal_path():
+    return os.path.splitext(_recovery_path())[0] + ".journal"
+
+
+def _close_recovery_journal():
+    global _recovery_journal
+    if _recovery_journal is not None:
+        _recovery_journal.close()
+        _recovery_journal = None
+
+
+def _counter_for_status(status):
+    if status == "PASS":
+        return "accepted"
+    if status == "DUPLICATE":
+        return "duplicate"
+    return "rejected"
 
 
 def save_recovery_state(state_data):
+    """Write a full checkpoint atomically and start an empty journal."""
+    global _recovery_journal_lines
     os.makedirs(LOG_FOLDER, exist_ok=True)
-    recovery_path = os.path.join(LOG_FOLDER, RECOVERY_FILE)
-    with open(recovery_path, "w", encoding="utf-8") as handle:
-        json.dump(state_data, handle, ensure_ascii=False, indent=2)
+    recovery_path = _recovery_path()
+    tmp_path = recovery_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(state_data, handle, ensure_ascii=False, separators=(",", ":"))
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, recovery_path)
+    _close_recovery_journal()
+    open(_recovery_journal_path(), "w").close()
+    _recovery_journal_lines = 0
+
+
+def append_recovery_scan(qr_code, status):
+    """Journal one scan; returns True once a new checkpoint is due."""
+    global _recovery_journal, _recovery_journal_lines
+    if _recovery_journal is None:
+        os.makedirs(LOG_FOLDER, exist_ok=True)
+        _recovery_journal = open(_recovery_journal_path(), "a", encoding="utf-8")
+    _recovery_journal.write(json.dumps([qr_code, status], ensure_ascii=False, separators=(",", ":")) + "\n")
+    _recovery_journal.flush()
+    _recovery_journal_lines += 1
+    return _recovery_journal_lines >= RECOVERY_CHECKPOINT_SCANS
 
 
 def load_recovery_state():
-    recovery_path = os.path.join(LOG_FOLDER, RECOVERY_FILE)
+    """Return the last checkpoint with the journal replayed on top, or None."""
     try:
-        with open(recovery_path, "r", encoding="utf-8") as handle:
-            return json.load(handle)
+        with open(_recovery_path(), "r", encoding="utf-8") as handle:
+            state = json.load(handle)
     except FileNotFoundError:
         return None
     except json.JSONDecodeError:
         clear_recovery_state()
         return None
-
-
-def clear_recovery_state():
-    recovery_path = os.path.join(LOG_FOLDER, RECOVERY_FILE)
+    if not isinstance(state, dict):
+        clear_recovery_state()
+        return None
+    counters = state.setdefault("counters", {})
     try:
-        os.remove(recovery_path)
+        with open(_recovery_journal_path(), "r", encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # torn final append after a power cut
+                if not (isinstance(entry, list) and len(entry) == 2 and all(isinstance(v, str) for v in entry)):
+                    break  # not a [qr_code, status] entry; stop as for a torn line
+                qr_code, status = entry
+                key = _counter_for_status(status)
+                counters[key] = int(counters.get(key, 0)) + 1
+                counters["total"] = int(counters.get("total", 0)) + 1
+                state["last_qr"] = qr_code
+                state["last_status"] = status
     except FileNotFoundError:
         pass
+    return state
+
 
+def clear_recovery_state():
+    global _recovery_journal_lines
+    _close_recovery_journal()
+    _recovery_journal_lines = 0
+    for path in (_recovery_path(), _recovery_journal_path()):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
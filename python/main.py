@@ -103,15 +103,24 @@ from config import (
     CAMERA_PORT,
     CAMERA_BAUDRATE,
     CAMERA_TIMEOUT,
+    DUPLICATES_BACKEND,
+    DUPLICATES_COMMIT_BATCH_ROWS,
+    DUPLICATES_COMMIT_INTERVAL_MS,
+    DUPLICATES_GLOBAL_CAPACITY,
+    DUPLICATES_GLOBAL_ERROR_RATE,
+    DUPLICATES_GLOBAL_GUARD,
+    DUPLICATES_WRITE_BEHIND,
 )
-from duplicate_tracker import DuplicateTracker
+from duplicate_tracker import DuplicateTracker, create_backend
+from qr_history import GlobalDuplicateGuard
 from layout import create_main_window
 from logic import (
+    BatchContext,
+    append_recovery_scan,
     batch_number_validator,
     clear_recovery_state,
     close_log,
     force_uppercase,
-    handle_qr_scan,
     highlight_invalid,
     init_log,
     load_recovery_state,
@@ -122,6 +131,7 @@ from logic import (
     resume_log,
     set_hardware_error_handler,
     save_recovery_state,
+    shutdown_feedback,
     write_log,
 )
 from hardware import get_hardware_controller
@@ -377,10 +387,21 @@ class BatchScannerApp:
         self.create_fields_button = None
         self.dynamic_widgets = []
         self.mould_rows = []
-        self.mould_ranges = {}
-        self.duplicate_tracker = DuplicateTracker()
-        self.csv_writer = None
-        self.log_file = None
+        self.batch_context = None
+        global_guard = None
+        if DUPLICATES_GLOBAL_GUARD:
+            global_guard = GlobalDuplicateGuard(
+                capacity=DUPLICATES_GLOBAL_CAPACITY,
+                error_rate=DUPLICATES_GLOBAL_ERROR_RATE,
+            )
+        self.duplicate_tracker = DuplicateTracker(
+            write_behind=DUPLICATES_WRITE_BEHIND,
+            commit_interval_ms=DUPLICATES_COMMIT_INTERVAL_MS,
+            commit_batch_rows=DUPLICATES_COMMIT_BATCH_ROWS,
+            global_guard=global_guard,
+            backend=create_backend(DUPLICATES_BACKEND),
+        )
+        self.batch_log = None
         self.batch_number = ""
         self.batch_line = ""
         self.counters = {"accepted": 0, "duplicate": 0, "rejected": 0, "total": 0}
@@ -856,11 +877,6 @@ class BatchScannerApp:
         if self.auto_advance and widget:
             self.window.after_idle(widget.focus_set)
 
-    def _check_duplicate(self, qr_code: str) -> bool:
-        if not self.batch_number:
-            return False
-        return self.duplicate_tracker.already_scanned(self.batch_number, qr_code)
-
     def _focus_next_after_qr_end(self, index):
         next_index = index + 1
         if next_index < len(self.mould_rows):
@@ -1227,7 +1243,7 @@ class BatchScannerApp:
         self.num_moulds_var.set(str(len(moulds)))
         self._create_mould_entries()
 
-        self.mould_ranges = {}
+        mould_ranges = {}
         for data, row in zip(moulds, self.mould_rows):
             name = data.get("name", "").strip().upper()
             start = data.get("qr_start", "").strip().upper()
@@ -1236,9 +1252,19 @@ class BatchScannerApp:
             row["qr_start_var"].set(start)
             row["qr_end_var"].set(end)
             if name and start and end:
-                self.mould_ranges[name] = (start, end)
+                mould_ranges[name] = (start, end)
 
-        if not self.mould_ranges:
+        if not mould_ranges:
+            clear_recovery_state()
+            self._show_setup()
+            return
+
+        try:
+            self.batch_context = BatchContext.create(
+                self.batch_number, self.batch_line, mould_ranges, self.duplicate_tracker
+            )
+        except ValueError as exc:
+            logging.getLogger("recovery").warning("Discarding recovery state: %s", exc)
             clear_recovery_state()
             self._show_setup()
             return
@@ -1258,12 +1284,13 @@ class BatchScannerApp:
         else:
             self.session_start = datetime.now()
 
-        self.log_file, self.csv_writer = resume_log(self.batch_number)
+        self.batch_log = resume_log(self.batch_number)
         self.scanning_active = True
         self._show_scan()
         self._update_scan_display(self.last_qr, self.last_status, mould=None, persist=False)
         self._update_session_footer()
-    # self._persist_state() removed: not needed, function does not exist
+        # Fold the replayed journal into a fresh checkpoint
+        self._persist_state()
 
     # ---------------- Setup Helpers ----------------
     def _validate_mould_count(self):
@@ -1506,7 +1533,7 @@ class BatchScannerApp:
             return
 
         mould_data = []
-        self.mould_ranges.clear()
+        mould_ranges = {}
         seen_moulds = set()
 
         for row in self.mould_rows:
@@ -1534,12 +1561,20 @@ class BatchScannerApp:
                 continue
 
             seen_moulds.add(mould)
-            self.mould_ranges[mould] = (qr_start, qr_end)
+            mould_ranges[mould] = (qr_start, qr_end)
             mould_data.append([self.batch_number, self.batch_line, mould, qr_start, qr_end])
 
         if not valid:
             return
 
+        try:
+            self.batch_context = BatchContext.create(
+                self.batch_number, self.batch_line, mould_ranges, self.duplicate_tracker
+            )
+        except ValueError as exc:
+            messagebox.showerror("Error", str(exc))
+            return
+
         os.makedirs(SETUP_LOG_FOLDER, exist_ok=True)
         setup_path = os.path.join(SETUP_LOG_FOLDER, f"{self.batch_number}_setup.csv")
         with open(setup_path, "w", newline="") as handle:
@@ -1548,7 +1583,7 @@ class BatchScannerApp:
             writer.writerows(mould_data)
 
         clear_recovery_state()
-        self.log_file, self.csv_writer = init_log(self.batch_number)
+        self.batch_log = init_log(self.batch_number)
         self.session_start = datetime.now()
         self._reset_scan_state()
         
@@ -1559,12 +1594,7 @@ class BatchScannerApp:
                 legacy = get_legacy_integration()
                 
                 # Set batch context for QR validation (include batch number for LCD)
-                legacy.set_batch_context(
-                    self.batch_line, 
-                    self.mould_ranges, 
-                    lambda code: self._check_duplicate(code),
-                    self.batch_number
-                )
+                legacy.set_context(self.batch_context)
                 
                 # Set result callback to update UI
                 legacy.set_result_callback(self._on_legacy_qr_result)
@@ -1648,12 +1678,13 @@ class BatchScannerApp:
             except Exception as e:
                 logger.warning(f"Failed to parse firmware data: {e}")
 
-        status, mould = handle_qr_scan(
-            qr_code,
-            self.batch_line,
-            self.mould_ranges,
-            duplicate_checker=lambda code: self._check_duplicate(code),
-        )
+        status, mould = self.batch_context.scan(qr_code)
+
+        # Answer the firmware first; UI and log bookkeeping must not delay the jig
+        logger.info("[DEBUG] Sending result to firmware after QR validation")
+        if self.controller_link and self.controller_link.active:
+            self.controller_link.send_result(status)
+        self.awaiting_hardware = False
 
         # Map error codes to user feedback
         error_map = {
@@ -1670,7 +1701,6 @@ class BatchScannerApp:
 
         if status == "PASS":
             self.counters["accepted"] += 1
-            self.duplicate_tracker.record_scan(self.batch_number, qr_code)
             logger.info(f"QR accepted: {qr_code} -> {mould}")
         elif status == "DUPLICATE":
             self.counters["duplicate"] += 1
@@ -1682,14 +1712,8 @@ class BatchScannerApp:
         self.counters["total"] += 1
         self._update_scan_display(qr_code, status, mould)
 
-        if self.csv_writer and self.log_file:
-            write_log(self.csv_writer, self.log_file, self.batch_number, mould, qr_code, status)
-
-        # Send result to firmware controller if active
-        logger.info("[DEBUG] Sending result to firmware after QR validation")
-        if self.controller_link and self.controller_link.active:
-            self.controller_link.send_result(status)
-        self.awaiting_hardware = False
+        if self.batch_log:
+            write_log(self.batch_log, self.batch_number, mould, qr_code, status)
 
     def _update_scan_display(self, qr_code, status, mould=None, persist=True):
         self.last_qr = qr_code
@@ -1703,19 +1727,19 @@ class BatchScannerApp:
         self.counter_labels["rejected"].config(text=str(self.counters["rejected"]))
         self._update_session_footer()
         detail = self._format_status_detail(status, qr_code, mould)
-        moulds_data = []
-        for row in self.mould_rows:
-            name = row["mould_var"].get().strip().upper()
-            start = row["qr_start_var"].get().strip().upper()
-            end = row["qr_end_var"].get().strip().upper()
-            if name and start and end:
-                moulds_data.append({"name": name, "qr_start": start, "qr_end": end})
-        if not moulds_data:
+        if not persist or not self.batch_context:
+            return
+        if append_recovery_scan(qr_code, status):
+            self._persist_state()
+
+    def _persist_state(self):
+        """Checkpoint the full session for _maybe_resume_session."""
+        if not self.batch_context:
             return
         state = {
             "batch_number": self.batch_number,
             "batch_line": self.batch_line,
-            "moulds": moulds_data,
+            "moulds": self.batch_context.mould_ranges(),
             "counters": dict(self.counters),
             "last_qr": self.last_qr,
             "last_status": self.last_status,
@@ -1744,19 +1768,18 @@ class BatchScannerApp:
         except ImportError:
             pass  # Legacy integration not available
             
-        if not self.scanning_active and not self.log_file:
+        if not self.scanning_active and not self.batch_log:
             return
         self.scanning_active = False
         self.qr_entry.config(state="disabled")
         self._set_qr_focus(False)
         self.qr_entry.delete(0, tk.END)
-        close_log(self.log_file)
-        self.log_file = None
-        self.csv_writer = None
+        close_log(self.batch_log)
+        self.batch_log = None
         clear_recovery_state()
         if self.batch_number:
-            self.duplicate_tracker.reset_batch(self.batch_number)
-        self.mould_ranges.clear()
+            self.duplicate_tracker.archive_batch(self.batch_number)
+        self.batch_context = None
         for key in self.counters:
             self.counters[key] = 0
         self.last_qr = "None"
@@ -1833,11 +1856,9 @@ class BatchScannerApp:
         if not self.scanning_active:
             return
             
-        # Update counters based on result
+        # Update counters based on result (a PASS was already claimed in the tracker)
         if status == "PASS":
             self.counters["accepted"] += 1
-            if self.duplicate_tracker and self.batch_number:
-                self.duplicate_tracker.record_scan(self.batch_number, qr_code)
         elif status == "DUPLICATE":
             self.counters["duplicate"] += 1
         else:
@@ -1849,8 +1870,8 @@ class BatchScannerApp:
         self._update_scan_display(qr_code, status, mould)
         
         # Log to CSV if active
-        if self.csv_writer and self.log_file:
-            write_log(self.csv_writer, self.log_file, self.batch_number, mould, qr_code, status)
+        if self.batch_log:
+            write_log(self.batch_log, self.batch_number, mould, qr_code, status)
     
     def _on_close(self):
         set_hardware_error_handler(None)
@@ -1867,10 +1888,9 @@ class BatchScannerApp:
         
         if self.scanning_active:
             self._persist_state()
-        if self.log_file:
-            close_log(self.log_file)
-            self.log_file = None
-            self.csv_writer = None
+        if self.batch_log:
+            close_log(self.batch_log)
+            self.batch_log = None
         if self.controller_link:
             self.controller_link.close()
         if self.camera_scanner:
@@ -1880,6 +1900,7 @@ class BatchScannerApp:
         except Exception:
             pass
         self.duplicate_tracker.close()
+        shutdown_feedback()
         self.window.destroy()
 
 
@@ -0,0 +1,168 @@
+"""Cross-batch duplicate guard over every QR code ever accepted."""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import mmap
+import sqlite3
+import struct
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+# Version 2 changed the hash functions; version 1 files are rebuilt from the table
+_MAGIC = b"QRBLOOM2"
+_HEADER = struct.Struct("<8sQI")  # magic, bit count, hash count
+_HEADER_SIZE = 64
+_blake2b = hashlib.blake2b
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter stored in a memory-mapped file.
+
+    The file is the filter: opening it maps the bits directly, so startup
+    does not depend on how many codes have been added.  A new file gets its
+    magic only when seal() is called, so a filter whose initial fill was cut
+    short by a crash is not trusted on the next start.
+    """
+
+    def __init__(self, path: Path | str, capacity: int, error_rate: float) -> None:
+        self.path = Path(path)
+        bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self._bits = (bits + 7) // 8 * 8
+        self._hashes = max(1, round(self._bits / capacity * math.log(2)))
+        self._rounds = range(self._hashes)
+        self.created = not self._header_matches()
+        if self.created:
+            with open(self.path, "wb") as handle:
+                handle.write(_HEADER.pack(bytes(len(_MAGIC)), self._bits, self._hashes).ljust(_HEADER_SIZE, b"\0"))
+                handle.truncate(_HEADER_SIZE + self._bits // 8)
+        self._file = open(self.path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), 0)
+
+    def _header_matches(self) -> bool:
+        try:
+            with open(self.path, "rb") as handle:
+                header = handle.read(_HEADER.size)
+        except FileNotFoundError:
+            return False
+        return len(header) == _HEADER.size and _HEADER.unpack(header) == (_MAGIC, self._bits, self._hashes)
+
+    def _probes(self, key: str) -> Tuple[int, int]:
+        """First bit and step, reduced mod the bit count, from one 64-bit BLAKE2b.
+
+        Probe i is (first + i * step) % bits (double hashing); walking it by
+        adding step avoids a multiply and a modulo per probe.  Stable across
+        runs, which a persisted filter needs (str hash() is salted).
+        """
+        digest = int.from_bytes(_blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+        return (digest & 0xFFFFFFFF) % self._bits, ((digest >> 32) | 1) % self._bits
+
+    def __contains__(self, key: str) -> bool:
+        pos, step = self._probes(key)
+        data, bits = self._map, self._bits
+        for _ in self._rounds:
+            if not data[_HEADER_SIZE + (pos >> 3)] >> (pos & 7) & 1:
+                return False
+            pos += step
+            if pos >= bits:
+                pos -= bits
+        return True
+
+    def add(self, key: str) -> None:
+        pos, step = self._probes(key)
+        data, bits = self._map, self._bits
+        for _ in self._rounds:
+            data[_HEADER_SIZE + (pos >> 3)] |= 1 << (pos & 7)
+            pos += step
+            if pos >= bits:
+                pos -= bits
+
+    def flush(self) -> None:
+        self._map.flush()
+
+    def seal(self) -> None:
+        """Flush the bits, then mark the file as a complete filter."""
+        self._map.flush()
+        self._map[: len(_MAGIC)] = _MAGIC
+        self._map.flush()
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+
+class GlobalDuplicateGuard:
+    """Catch QR codes that were already accepted in an earlier batch.
+
+    Every accepted code goes into a Bloom filter and an accepted_qr SQLite
+    table.  Lookups that miss the filter (almost all of them) never touch
+    SQLite; filter hits are confirmed against the table, so false positives
+    never reject a good cartridge.  If the filter file is missing or was
+    built with different sizing it is rebuilt from the table.
+    """
+
+    def __init__(
+        self,
+        db_path: Path | str = "qr_history.db",
+        bloom_path: Optional[Path | str] = None,
+        capacity: int = 5_000_000,
+        error_rate: float = 0.001,
+    ) -> None:
+        db_path = Path(db_path)
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute("PRAGMA synchronous=NORMAL;")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS accepted_qr (
+                qr TEXT PRIMARY KEY,
+                batch TEXT NOT NULL,
+                accepted_at TEXT NOT NULL
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._bloom = BloomFilter(bloom_path or db_path.with_suffix(".bloom"), capacity, error_rate)
+        if self._bloom.created:
+            for (qr_code,) in self._conn.execute("SELECT qr FROM accepted_qr"):
+                self._bloom.add(qr_code)
+            self._bloom.seal()
+
+    def accepted_batch(self, qr_code: str) -> Optional[str]:
+        """Return the batch that accepted qr_code, or None if it never was."""
+        if qr_code not in self._bloom:
+            return None
+        with self._lock:
+            row = self._conn.execute("SELECT batch FROM accepted_qr WHERE qr = ?", (qr_code,)).fetchone()
+        return row[0] if row else None
+
+    def seen_in_other_batch(self, batch: str, qr_code: str) -> bool:
+        previous = self.accepted_batch(qr_code)
+        return previous is not None and previous != batch
+
+    def record_many(self, rows: Iterable[Tuple[str, str]]) -> None:
+        """Remember (batch, qr) pairs as accepted; the first batch to accept a code wins."""
+        accepted_at = datetime.now().isoformat(timespec="seconds")
+        rows = [(qr_code, batch, accepted_at) for batch, qr_code in rows]
+        if not rows:
+            return
+        # Filter bits reach the disk before the rows commit, so after a power cut
+        # every committed code is still in the filter; a stray bit only costs a
+        # confirming SELECT
+        for qr_code, _, _ in rows:
+            self._bloom.add(qr_code)
+        self._bloom.flush()
+        with self._lock:
+            self._conn.executemany("INSERT OR IGNORE INTO accepted_qr (qr, batch, accepted_at) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def close(self) -> None:
+        self._bloom.flush()
+        self._bloom.close()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,213 @@
+"""Fixed-width binary scan log written next to each batch CSV.
+
+Every scan is one 32-byte little-endian record:
+
+    ts_ms   u8   epoch milliseconds
+    status  u1   STATUS_CODES index (255 for anything else)
+    line    u1   line letter from the QR code (ord, 0 if missing)
+    mould   u2   1-based index into the <batch>.moulds sidecar (0 = unknown)
+    serial  u4   alpha block * 10000 + 4-digit serial (0xFFFFFFFF if unparsable)
+    qr      S16  QR code, ASCII, NUL padded
+
+after a 32-byte header.  read_scan_log maps the file as a NumPy structured
+array, so totals over a whole batch are vectorised instead of reparsing CSV
+text.  Run this module to convert existing batch_logs/*.csv files.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import re
+import struct
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - only needed for reading
+    np = None
+
+SCAN_LOG_SUFFIX = ".scans"
+MOULDS_SUFFIX = ".moulds"
+
+_MAGIC = b"QRSCANS1"
+_HEADER = struct.Struct("<8sHH20x")  # magic, version, record size
+_RECORD = struct.Struct("<QBBHI16s")
+_VERSION = 1
+
+STATUS_CODES = ("PASS", "DUPLICATE", "INVALID FORMAT", "LINE MISMATCH", "OUT OF BATCH")
+STATUS_OTHER = 255
+NO_SERIAL = 0xFFFFFFFF
+_STATUS_INDEX = {status: index for index, status in enumerate(STATUS_CODES)}
+_SERIAL_TAIL = re.compile(r"([A-Z])(\d{4})$")
+
+RECORD_DTYPE = (
+    np.dtype(
+        [
+            ("ts_ms", "<u8"),
+            ("status", "u1"),
+            ("line", "u1"),
+            ("mould", "<u2"),
+            ("serial", "<u4"),
+            ("qr", "S16"),
+        ]
+    )
+    if np is not None
+    else None
+)
+
+
+def scan_log_path(csv_path) -> Path:
+    return Path(csv_path).with_suffix(SCAN_LOG_SUFFIX)
+
+
+def _moulds_path(path) -> Path:
+    return Path(path).with_suffix(MOULDS_SUFFIX)
+
+
+def read_moulds(path) -> List[str]:
+    """Mould names of a scan log; record mould index i refers to names[i - 1]."""
+    try:
+        return _moulds_path(path).read_text(encoding="utf-8").splitlines()
+    except FileNotFoundError:
+        return []
+
+
+def _serial(qr_code: str) -> int:
+    match = _SERIAL_TAIL.search(qr_code)
+    if not match:
+        return NO_SERIAL
+    alpha, digits = match.groups()
+    return (ord(alpha) - ord("A")) * 10000 + int(digits)
+
+
+def _has_header(path: Path) -> bool:
+    try:
+        with open(path, "rb") as handle:
+            header = handle.read(_HEADER.size)
+    except FileNotFoundError:
+        return False
+    return len(header) == _HEADER.size and _HEADER.unpack(header) == (_MAGIC, _VERSION, _RECORD.size)
+
+
+class ScanLogWriter:
+    """Append fixed-width scan records to a binary log.
+
+    Not thread-safe; BatchLogWriter calls it from its writer thread.
+    """
+
+    def __init__(self, path, append: bool = False) -> None:
+        self.path = Path(path)
+        self._moulds_file = _moulds_path(self.path)
+        if append and _has_header(self.path):
+            self._moulds = {name: index for index, name in enumerate(read_moulds(self.path), start=1)}
+            self._file = open(self.path, "ab")
+        else:
+            # New log, or one whose header never reached the disk: start it over
+            self._moulds = {}
+            self._moulds_file.write_text("", encoding="utf-8")
+            self._file = open(self.path, "wb")
+            self._file.write(_HEADER.pack(_MAGIC, _VERSION, _RECORD.size))
+        # A torn record from a crash would shift every later one; drop it
+        size = self._file.tell() - _HEADER.size
+        if size % _RECORD.size:
+            self._file.truncate(self._file.tell() - size % _RECORD.size)
+            self._file.seek(0, os.SEEK_END)
+
+    def _mould_index(self, mould: Optional[str]) -> int:
+        if not mould or mould == "UNKNOWN":
+            return 0
+        index = self._moulds.get(mould)
+        if index is None:
+            index = len(self._moulds) + 1
+            self._moulds[mould] = index
+            with open(self._moulds_file, "a", encoding="utf-8") as handle:
+                handle.write(mould + "\n")
+        return index
+
+    def pack(self, ts_ms: int, mould: Optional[str], qr_code: str, status: str) -> bytes:
+        line = ord(qr_code[1]) if len(qr_code) > 1 and qr_code[1].isascii() else 0
+        return _RECORD.pack(
+            ts_ms,
+            _STATUS_INDEX.get(status, STATUS_OTHER),
+            line,
+            self._mould_index(mould),
+            _serial(qr_code),
+            qr_code.encode("ascii", "replace")[:16],
+        )
+
+    def write_records(self, records: Iterable[Tuple[int, Optional[str], str, str]]) -> None:
+        """Write (ts_ms, mould, qr_code, status) records in one call."""
+        self._file.write(b"".join(self.pack(*record) for record in records))
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def fileno(self) -> int:
+        return self._file.fileno()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def read_scan_log(path):
+    """Map a scan log as a read-only NumPy structured array of RECORD_DTYPE."""
+    if np is None:
+        raise RuntimeError("numpy not installed")
+    path = Path(path)
+    with open(path, "rb") as handle:
+        magic, version, record_size = _HEADER.unpack(handle.read(_HEADER.size))
+    if magic != _MAGIC or record_size != RECORD_DTYPE.itemsize:
+        raise ValueError(f"Not a scan log: {path}")
+    count = (path.stat().st_size - _HEADER.size) // record_size
+    if count == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=_HEADER.size, shape=(count,))
+
+
+def convert_csv(csv_path, out_path=None) -> Path:
+    """Write the scan log for an existing batch CSV and return its path."""
+    out_path = Path(out_path) if out_path else scan_log_path(csv_path)
+    writer = ScanLogWriter(out_path)
+    try:
+        with open(csv_path, newline="", encoding="utf-8") as handle:
+            records = []
+            for row in csv.reader(handle):
+                if len(row) < 5 or row[0].strip() == "Timestamp":
+                    continue
+                try:
+                    stamp = datetime.strptime(row[0].strip(), "%Y-%m-%d %H:%M:%S")
+                except ValueError:
+                    continue
+                records.append(
+                    (int(stamp.timestamp() * 1000), row[2].strip(), row[3].strip(), row[4].strip().upper())
+                )
+        writer.write_records(records)
+    finally:
+        writer.close()
+    return out_path
+
+
+def main() -> None:
+    from config import LOG_FOLDER
+
+    parser = argparse.ArgumentParser(description="Convert batch CSV logs to binary scan logs.")
+    parser.add_argument("paths", nargs="*", help=f"CSV files (default: every {LOG_FOLDER}/*.csv)")
+    parser.add_argument("--force", action="store_true", help="rewrite scan logs that already exist")
+    args = parser.parse_args()
+
+    paths = [Path(p) for p in args.paths] or sorted(Path(LOG_FOLDER).glob("*.csv"))
+    for csv_path in paths:
+        target = scan_log_path(csv_path)
+        if target.exists() and not args.force:
+            print(f"skip {csv_path} ({target.name} exists)")
+            continue
+        convert_csv(csv_path, target)
+        print(f"{csv_path} -> {target}")
+
+
+if __name__ == "__main__":
+    main()
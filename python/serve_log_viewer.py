@@ -0,0 +1,144 @@
+"""Production entry point for the log viewer.
+
+Serves log_viewer.app on waitress when it is installed, otherwise on
+werkzeug's threaded server; either way at most --threads requests are
+handled at once and the rest wait their turn.  Open /live streams each hold
+one of those threads, so they are capped at --live-clients (half the
+threads by default) and page requests always find a free one.  The process
+lowers its own CPU priority so report pulls never starve the scanner on the
+same Pi, and warms the analytics store in the background while the server
+is already accepting requests.
+
+For several processes run the app under gunicorn from this directory:
+
+    gunicorn -w 3 -b 0.0.0.0:8080 log_viewer:app
+
+gunicorn.conf.py sets the thread count and /live cap from the same
+LOG_VIEWER_* variables and calls post_fork below, which renices each worker
+and warms its caches.  The workers share batch_logs/analytics.db; a file
+lock elects the one worker that indexes and the others read from it.  What
+is not shared is log_viewer's in-memory cache: batch stats for logs the
+index has not caught up with yet (live batches, or any batch while the
+index is lagging) are parsed and cached by each worker separately.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import threading
+
+try:
+    import waitress
+except ImportError:  # pragma: no cover - optional production server
+    waitress = None
+
+_logger = logging.getLogger("serve_log_viewer")
+
+
+def _lower_priority(increment: int) -> None:
+    if increment <= 0 or not hasattr(os, "nice"):
+        return
+    try:
+        os.nice(increment)
+    except OSError:
+        _logger.warning("Could not lower viewer priority by %d", increment)
+
+
+def _bound_threads(server, threads: int) -> None:
+    """Cap a werkzeug ThreadingMixIn server at threads concurrent requests."""
+    slots = threading.BoundedSemaphore(max(1, threads))
+    spawn, handle = server.process_request, server.process_request_thread
+
+    def process_request(request, client_address):
+        slots.acquire()
+        try:
+            spawn(request, client_address)
+        except BaseException:
+            slots.release()
+            raise
+
+    def process_request_thread(request, client_address):
+        try:
+            handle(request, client_address)
+        finally:
+            slots.release()
+
+    server.process_request = process_request
+    server.process_request_thread = process_request_thread
+
+
+def _start_warming() -> None:
+    import log_viewer
+
+    threading.Thread(target=log_viewer.warm_caches, name="cache-warmer", daemon=True).start()
+
+
+def post_fork(server, worker) -> None:
+    """gunicorn hook: renice the new worker and warm its caches.
+
+    Threads do not survive fork, so this runs in every worker (with or
+    without --preload) rather than once in the master.
+    """
+    _lower_priority(int(os.environ.get("LOG_VIEWER_NICE", "10")))
+    if os.environ.get("LOG_VIEWER_WARM", "1") == "1":
+        _start_warming()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the batch log viewer.")
+    parser.add_argument("--host", default=os.environ.get("LOG_VIEWER_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("LOG_VIEWER_PORT", "8080")))
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("LOG_VIEWER_THREADS", "16")))
+    parser.add_argument(
+        "--live-clients",
+        type=int,
+        default=int(os.environ.get("LOG_VIEWER_LIVE_CLIENTS", "0")),
+        help="open /live streams allowed at once (default: half of --threads)",
+    )
+    parser.add_argument(
+        "--nice",
+        type=int,
+        default=int(os.environ.get("LOG_VIEWER_NICE", "10")),
+        help="CPU priority decrease relative to the scanner (0 to disable)",
+    )
+    parser.add_argument("--no-warm", action="store_true", help="skip cache warming at startup")
+    args = parser.parse_args()
+    live_clients = args.live_clients or max(1, args.threads // 2)
+    if live_clients >= args.threads:
+        parser.error("--live-clients must be below --threads so pages still get a thread")
+    os.environ["LOG_VIEWER_LIVE_CLIENTS"] = str(live_clients)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    _lower_priority(args.nice)
+
+    # Imported after renicing so the indexer and tailer threads inherit the priority
+    import log_viewer
+
+    if not args.no_warm:
+        _start_warming()
+
+    if waitress is not None:
+        _logger.info(
+            "Serving on waitress at %s:%d with %d threads (%d for /live)",
+            args.host,
+            args.port,
+            args.threads,
+            live_clients,
+        )
+        waitress.serve(log_viewer.app, host=args.host, port=args.port, threads=args.threads)
+        return
+
+    from werkzeug.serving import make_server
+
+    _logger.info(
+        "waitress not installed; serving on werkzeug at %s:%d with %d threads", args.host, args.port, args.threads
+    )
+    server = make_server(args.host, args.port, log_viewer.app, threaded=True)
+    _bound_threads(server, args.threads)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
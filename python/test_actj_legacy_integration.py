@@ -0,0 +1,33 @@
+"""pytest coverage for batch context handling in the ACTJv20 legacy integration."""
+
+from actj_legacy_integration import ACTJLegacyIntegration
+from duplicate_tracker import DuplicateTracker, MemoryBackend
+from logic import BatchContext
+
+RANGES = {"A01": ("VAN142536A0001", "VAN142536A0100")}
+
+
+def test_set_context_validates_and_records_through_the_context():
+    tracker = DuplicateTracker(backend=MemoryBackend())
+    context = BatchContext.create("MVAN142536", "A", RANGES, tracker)
+    integration = ACTJLegacyIntegration()
+    integration.set_context(context)
+
+    assert integration.batch_context is context
+    assert integration.current_batch_number == "MVAN142536"
+    assert integration._validate_qr_code("VAN142536A0001") == ("PASS", "A01")
+    assert integration._validate_qr_code("VAN142536A0001") == ("DUPLICATE", "A01")
+    assert tracker.count("MVAN142536") == 1
+    tracker.close()
+
+
+def test_set_batch_context_keeps_the_positional_form():
+    seen = {"VAN142536A0002"}
+    integration = ACTJLegacyIntegration()
+    integration.set_batch_context("a", RANGES, seen.__contains__, "MVAN142536")
+
+    assert integration.batch_context is None
+    assert integration.current_batch_line == "A"
+    assert integration._validate_qr_code("VAN142536A0001") == ("PASS", "A01")
+    assert integration._validate_qr_code("VAN142536A0002") == ("DUPLICATE", "A01")
+    assert integration._validate_qr_code("VAN142536A0101") == ("OUT OF BATCH", None)
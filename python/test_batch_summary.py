@@ -0,0 +1,98 @@
+"""pytest coverage for batch summary sidecars and hour windows."""
+
+import json
+
+import pytest
+
+import log_viewer
+from batch_summary import BatchSummary, read_summary, read_window, summary_path
+
+HEADER = "Timestamp,BatchNumber,Mould,QRCode,Status\n"
+
+
+def _row(time, serial, status="PASS", mould="A01"):
+    return f"2026-10-17 {time},MVAN142536,{mould},VAN142536A{serial:04d},{status}\n"
+
+
+def _write(path, text):
+    path.write_text(text, encoding="utf-8")
+    summary = BatchSummary.build(path)
+    summary.save(summary.csv_size)
+    return summary
+
+
+def test_build_counts_and_hour_spans(tmp_path):
+    path = tmp_path / "MVAN142536.csv"
+    summary = _write(
+        path,
+        HEADER + _row("10:00:00", 1) + _row("10:30:00", 1, "DUPLICATE") + _row("11:00:00", 2, mould="B02"),
+    )
+    assert summary.rows == 3
+    assert summary.statuses == {"PASS": 2, "DUPLICATE": 1}
+    assert summary.moulds == {"A01": 2, "B02": 1}
+    assert (summary.first_time, summary.last_time) == ("2026-10-17 10:00:00", "2026-10-17 11:00:00")
+    assert [h["hour"] for h in summary.hours] == ["2026-10-17 10:00", "2026-10-17 11:00"]
+    ten, eleven = summary.hours
+    assert (ten["offset"], ten["end"], eleven["offset"]) == (len(HEADER), eleven["offset"], ten["end"])
+    assert eleven["end"] == path.stat().st_size
+
+
+def test_summary_is_stale_after_the_csv_changes(tmp_path):
+    path = tmp_path / "MVAN142536.csv"
+    _write(path, HEADER + _row("10:00:00", 1))
+    assert read_summary(path).rows == 1
+    with open(path, "a", encoding="utf-8") as handle:
+        handle.write(_row("10:00:01", 2))
+    assert read_summary(path) is None
+    assert BatchSummary.open(path).rows == 2
+
+
+def test_sidecar_without_hour_ends_is_rebuilt(tmp_path):
+    path = tmp_path / "MVAN142536.csv"
+    _write(path, HEADER + _row("10:00:00", 1))
+    sidecar = summary_path(path)
+    data = json.loads(sidecar.read_text())
+    del data["hours"][0]["end"]
+    sidecar.write_text(json.dumps(data))
+    assert read_summary(path) is None
+
+
+def test_clock_set_back_merges_into_the_earlier_hour(tmp_path):
+    path = tmp_path / "MVAN142536.csv"
+    summary = _write(
+        path,
+        HEADER
+        + _row("10:00:00", 1)
+        + _row("11:00:00", 2)
+        + _row("10:59:00", 3, "DUPLICATE")
+        + _row("11:00:05", 4)
+        + _row("09:00:00", 5),
+    )
+    assert [h["hour"] for h in summary.hours] == ["2026-10-17 09:00", "2026-10-17 10:00", "2026-10-17 11:00"]
+    assert [h["statuses"] for h in summary.hours] == [{"PASS": 1}, {"PASS": 1, "DUPLICATE": 1}, {"PASS": 2}]
+
+    ten = [row[3] for row in read_window(path, "2026-10-17 10:00", "2026-10-17 11:00")]
+    assert ten == ["VAN142536A0001", "VAN142536A0003"]
+    from_eleven = [row[3] for row in read_window(path, "2026-10-17 11:00")]
+    assert from_eleven == ["VAN142536A0002", "VAN142536A0004"]
+    assert list(read_window(path, "2026-10-17 12:00")) == []
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_viewer, "_INDEXER_ENABLED", False)
+    monkeypatch.setattr(log_viewer, "BATCH_LOG_DIR", tmp_path)
+    log_viewer._CACHE["batch_stats"].clear()
+    return log_viewer.app.test_client()
+
+
+def test_details_view_lists_one_hour(client, tmp_path):
+    _write(tmp_path / "MVAN142536.csv", HEADER + _row("10:00:00", 1) + _row("11:00:00", 2) + _row("11:30:00", 3))
+    page = client.get("/batch/MVAN142536.csv/details?hour=2026-10-17 11:00").get_data(as_text=True)
+    assert "Scans in 2026-10-17 11:00" in page
+    assert "VAN142536A0002" in page and "VAN142536A0003" in page
+    assert "VAN142536A0001" not in page
+
+    page = client.get("/batch/MVAN142536.csv/details").get_data(as_text=True)
+    assert "Scans in" not in page
+    assert client.get("/batch/MVAN142536.csv/details?hour=yesterday").status_code == 400
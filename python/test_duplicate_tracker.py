@@ -0,0 +1,104 @@
+"""pytest coverage for DuplicateTracker and its storage backends."""
+
+from pathlib import Path
+
+import pytest
+
+from duplicate_tracker import DuplicateTracker, _BatchIndex, create_backend
+from logic import calculate_batch_size
+
+BATCH = "MVAN142536"
+RANGES = {"A01": ("VAN142536A0001", "VAN142536A0100")}
+CAPACITIES = {"A01": 100}
+
+
+def _tracker(tmp_path, backend, write_behind):
+    return DuplicateTracker(
+        write_behind=write_behind,
+        commit_interval_ms=10,
+        backend=create_backend(backend, tmp_path / "scan_state.db"),
+    )
+
+
+@pytest.mark.parametrize("write_behind", [False, True])
+@pytest.mark.parametrize("backend", ["sqlite", "bitset", "memory"])
+@pytest.mark.parametrize("indexed", [False, True])
+def test_claim_records_each_code_once(tmp_path, backend, write_behind, indexed):
+    tracker = _tracker(tmp_path, backend, write_behind)
+    if indexed:
+        tracker.load_batch(BATCH, RANGES.items(), CAPACITIES)
+
+    assert tracker.claim(BATCH, "VAN142536A0001")
+    assert tracker.claim(BATCH, "VAN142536A0002")
+    assert not tracker.claim(BATCH, "VAN142536A0001")
+    assert tracker.already_scanned(BATCH, "VAN142536A0002")
+    assert not tracker.already_scanned(BATCH, "VAN142536A0003")
+    # Batches are kept apart
+    assert tracker.claim("MVAN142537", "VAN142536A0001")
+    assert tracker.count(BATCH) == 2
+    tracker.close()
+
+
+@pytest.mark.parametrize("write_behind", [False, True])
+@pytest.mark.parametrize("backend", ["sqlite", "bitset"])
+def test_claims_survive_reopen(tmp_path, backend, write_behind):
+    tracker = _tracker(tmp_path, backend, write_behind)
+    tracker.load_batch(BATCH, RANGES.items(), CAPACITIES)
+    for serial in range(1, 11):
+        assert tracker.claim(BATCH, f"VAN142536A{serial:04d}")
+    tracker.close()
+
+    tracker = _tracker(tmp_path, backend, write_behind)
+    tracker.load_batch(BATCH, RANGES.items(), CAPACITIES)
+    assert not tracker.claim(BATCH, "VAN142536A0005")
+    assert tracker.claim(BATCH, "VAN142536A0011")
+    assert tracker.count(BATCH) == 11
+    tracker.close()
+
+
+def test_lookup_does_not_create_partition(tmp_path):
+    tracker = _tracker(tmp_path, "sqlite", False)
+    assert not tracker.already_scanned("MVAN999999", "VAN142536A0001")
+    assert tracker.count("MVAN999999") == 0
+    tracker.close()
+    assert not any("999999" in path.name for path in tmp_path.rglob("*"))
+
+
+def test_batches_with_similar_names_stay_apart(tmp_path):
+    tracker = _tracker(tmp_path, "sqlite", False)
+    assert tracker.claim("MV/A", "VAN142536A0001")
+    assert tracker.claim("MV_A", "VAN142536A0001")
+    tracker.reset_batch("MV/A")
+    assert not tracker.already_scanned("MV/A", "VAN142536A0001")
+    assert tracker.already_scanned("MV_A", "VAN142536A0001")
+    tracker.close()
+
+
+def test_scanner_copies_match():
+    """The SCANNER builds ship their own copy; it must stay the same code."""
+    here = Path(__file__).resolve().parent
+    source = (here / "duplicate_tracker.py").read_text()
+    for copy in ("SCANNER/duplicate_tracker.py", "SCANNER/WINDOWS_TEST/duplicate_tracker.py"):
+        path = here.parent / copy
+        if path.exists():
+            assert source in path.read_bytes().decode("utf-8").replace("\r\n", "\n"), copy
+
+
+def test_batch_index_is_sized_by_calculate_batch_size():
+    ranges = {"A01": ("VAN142536A9990", "VAN142536C0010"), "A02": ("VAN142537A0001", "VAN142537A0050")}
+    capacities = {mould: calculate_batch_size(start, end) for mould, (start, end) in ranges.items()}
+    index = _BatchIndex(ranges.items(), capacities)
+    assert [len(bits) for *_, bits in index._bitsets] == [(capacities["A01"] + 7) // 8, (capacities["A02"] + 7) // 8]
+
+    in_range = [f"VAN142536A{serial:04d}" for serial in range(9990, 10000)]
+    in_range += [f"VAN142536B{serial:04d}" for serial in range(1, 10000)]
+    in_range += [f"VAN142536C{serial:04d}" for serial in range(1, 11)]
+    assert len(in_range) == capacities["A01"]
+    # Every cartridge of the range gets its own bit
+    assert len({index._slot(code)[1] for code in in_range}) == capacities["A01"]
+    for code in in_range + ["VAN142536B0000", "VAN142536C0011", "VAN142537A0050"]:
+        assert code not in index
+        index.add(code)
+        assert code in index
+    assert "VAN142536C0000" not in index
+    assert index._extra == {"VAN142536B0000", "VAN142536C0011"}
@@ -0,0 +1,71 @@
+"""pytest coverage for the shared live tailer."""
+
+import queue
+
+import pytest
+
+from live_feed import LiveTailer
+
+HEADER = "Timestamp,BatchNumber,Mould,QRCode,Status\n"
+
+
+def _row(serial, status="PASS"):
+    return f"2026-10-17 10:00:00,MVAN142536,A01,VAN142536A{serial:04d},{status}\n"
+
+
+@pytest.fixture
+def tailer(tmp_path):
+    tailer = LiveTailer(tmp_path, poll_interval=0.02)
+    yield tailer
+    tailer.stop()
+
+
+def test_new_rows_reach_every_subscriber_with_batch_counters(tmp_path, tailer):
+    path = tmp_path / "MVAN142536.csv"
+    path.write_text(HEADER + _row(1) + _row(1, "DUPLICATE"))
+    first, second = tailer.subscribe(), tailer.subscribe()
+    with open(path, "a") as handle:
+        handle.write(_row(2) + "2026-10-17 10:00:01,MVAN1")
+    for events in (first, second):
+        event = events.get(timeout=5)
+        assert (event["batch"], event["qr"], event["status"]) == ("MVAN142536.csv", "VAN142536A0002", "PASS")
+        assert event["counters"] == {"total": 3, "pass": 2, "duplicate": 1, "other": 0}
+    assert first.empty()  # the half-written row waits for its newline
+    tailer.unsubscribe(second)
+    assert tailer.subscriber_count == 1
+
+
+def test_a_failing_pass_is_logged_and_tailing_continues(tmp_path, tailer, monkeypatch, caplog):
+    path = tmp_path / "MVAN142536.csv"
+    path.write_text(HEADER)
+    poll = tailer.poll
+    failures = []
+
+    def flaky_poll():
+        if not failures:
+            failures.append(1)
+            raise RuntimeError("disk hiccup")
+        poll()
+
+    monkeypatch.setattr(tailer, "poll", flaky_poll)
+    events = tailer.subscribe()
+    with open(path, "a") as handle:
+        handle.write(_row(1))
+    assert events.get(timeout=5)["qr"] == "VAN142536A0001"
+    assert "Live tail pass failed" in caplog.text
+
+
+def test_stop_ends_the_thread_and_start_resumes(tmp_path, tailer):
+    path = tmp_path / "MVAN142536.csv"
+    path.write_text(HEADER)
+    events = tailer.subscribe()
+    thread = tailer._thread
+    tailer.stop()
+    assert not thread.is_alive() and tailer._thread is None
+
+    with open(path, "a") as handle:
+        handle.write(_row(1))
+    with pytest.raises(queue.Empty):
+        events.get(timeout=0.2)
+    tailer.start()
+    assert events.get(timeout=5)["qr"] == "VAN142536A0001"
@@ -0,0 +1,104 @@
+"""pytest coverage for incremental indexing in LogIndexer."""
+
+import os
+
+import pytest
+
+from log_index import LogIndexer
+
+HEADER = "Timestamp,BatchNumber,Mould,QRCode,Status\n"
+
+
+def _rows(count, hour="10", start=1):
+    return "".join(
+        f"2026-10-17 {hour}:00:{(serial - start) % 60:02d},MVAN142536,A01,VAN142536A{serial:04d},PASS\n"
+        for serial in range(start, start + count)
+    )
+
+
+@pytest.fixture
+def indexer(tmp_path):
+    log_dir = tmp_path / "batch_logs"
+    indexer = LogIndexer(log_dir)
+    yield indexer
+    indexer.close()
+
+
+def _rollup_total(indexer):
+    hourly = indexer._query("SELECT coalesce(sum(count), 0) FROM rollup_hourly")[0][0]
+    daily = indexer._query("SELECT coalesce(sum(count), 0) FROM rollup_daily")[0][0]
+    assert hourly == daily
+    return hourly
+
+
+def test_append_indexes_only_new_rows(indexer):
+    path = indexer.log_dir / "MVAN142536.csv"
+    path.write_text(HEADER + _rows(10))
+    assert indexer.index_once() == 10
+    assert indexer.index_once() == 0
+    with open(path, "a") as handle:
+        handle.write(_rows(5, start=11) + "2026-10-17 10:00:59,MVAN142536,A01,VAN1")
+    assert indexer.index_once() == 5
+    assert not indexer.is_current(path.name)
+    with open(path, "a") as handle:
+        handle.write("42536A0016,PASS\n")
+    assert indexer.index_once() == 1
+    assert indexer.is_current(path.name)
+    assert indexer.batch_stats(path.name)["total"] == 16
+    assert _rollup_total(indexer) == 16
+
+
+def test_truncate_reindexes_from_start(indexer):
+    path = indexer.log_dir / "MVAN142536.csv"
+    path.write_text(HEADER + _rows(20))
+    indexer.index_once()
+    with open(path, "r+") as handle:
+        handle.truncate(len(HEADER) + len(_rows(5)))
+    indexer.index_once()
+    assert indexer.batch_stats(path.name)["total"] == 5
+    assert _rollup_total(indexer) == 5
+
+
+def test_replaced_file_is_reindexed(indexer):
+    path = indexer.log_dir / "MVAN142536.csv"
+    path.write_text(HEADER + _rows(20))
+    indexer.index_once()
+    replacement = indexer.log_dir / "replacement.tmp"
+    replacement.write_text(HEADER + _rows(30, hour="11"))
+    os.replace(replacement, path)
+    indexer.index_once()
+    stats = indexer.batch_stats(path.name)
+    assert stats["total"] == 30
+    assert stats["chart_labels"] == ["2026-10-17 11:00"]
+    assert _rollup_total(indexer) == 30
+
+
+def test_rewrite_in_place_is_reindexed(indexer):
+    path = indexer.log_dir / "MVAN142536.csv"
+    path.write_text(HEADER + _rows(20))
+    indexer.index_once()
+    inode = path.stat().st_ino
+    with open(path, "w") as handle:
+        handle.write(HEADER + _rows(40, hour="12"))
+    assert path.stat().st_ino == inode
+    indexer.index_once()
+    stats = indexer.batch_stats(path.name)
+    assert stats["total"] == 40
+    assert stats["chart_labels"] == ["2026-10-17 12:00"]
+    assert _rollup_total(indexer) == 40
+
+
+def test_forget_subtracts_rollup_share(indexer):
+    first = indexer.log_dir / "MVAN142536.csv"
+    second = indexer.log_dir / "MVAN142537.csv"
+    first.write_text(HEADER + _rows(10))
+    second.write_text(HEADER + _rows(7, hour="11"))
+    indexer.index_once()
+    assert _rollup_total(indexer) == 17
+
+    first.unlink()
+    indexer.index_once()
+    assert indexer.batch_stats(first.name) is None
+    assert _rollup_total(indexer) == 7
+    hours = indexer._query("SELECT hour FROM rollup_hourly")
+    assert hours == [("2026-10-17 11:00",)]
@@ -0,0 +1,406 @@
+"""pytest coverage for the log viewer's batch statistics and HTTP endpoints."""
+
+import gzip
+import io
+import json
+import os
+import threading
+import time
+import zipfile
+
+import pytest
+
+import log_viewer
+from batch_summary import BatchSummary
+from health_sampler import HealthSampler
+from live_feed import LiveTailer
+from log_index import LogIndexer
+
+HEADER = "Timestamp,BatchNumber,Mould,QRCode,Status\n"
+
+
+def _rows(count, hour="10", start=1, status="PASS"):
+    return "".join(
+        f"2026-10-17 {hour}:00:{(serial - start) % 60:02d},MVAN142536,A01,VAN142536A{serial:04d},{status}\n"
+        for serial in range(start, start + count)
+    )
+
+
+def _touch(path, step=1):
+    """Move mtime forward so a rewrite is never hidden by timestamp granularity."""
+    stats = path.stat()
+    os.utime(path, ns=(stats.st_atime_ns, stats.st_mtime_ns + step * 1_000_000_000))
+
+
+@pytest.fixture
+def log_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_viewer, "_INDEXER_ENABLED", False)
+    monkeypatch.setattr(log_viewer, "BATCH_LOG_DIR", tmp_path)
+    log_viewer._CACHE["batch_stats"].clear()
+    log_viewer._CACHE["daily_trends"] = {"signature": None, "data": None}
+    return tmp_path
+
+
+@pytest.fixture
+def tail_offsets(monkeypatch):
+    """Record the offset every CSV parse in _batch_stats starts from."""
+    offsets = []
+    tail = log_viewer._tail_batch_rows
+
+    def recording(path, offset, size, aggregates):
+        offsets.append(offset)
+        return tail(path, offset, size, aggregates)
+
+    monkeypatch.setattr(log_viewer, "_tail_batch_rows", recording)
+    return offsets
+
+
+# ---------------- _batch_stats ----------------
+def test_batch_stats_parses_only_appended_rows(log_dir, tail_offsets):
+    path = log_dir / "MVAN142536.csv"
+    path.write_text(HEADER + _rows(10))
+    stats = log_viewer._batch_stats(path.name)
+    assert (stats["total"], stats["pass"]) == (10, 10)
+
+    with open(path, "a") as handle:
+        handle.write(_rows(3, hour="11", start=11, status="DUPLICATE") + "2026-10-17 11:00:03,MVAN1")
+    _touch(path)
+    stats = log_viewer._batch_stats(path.name)
+    assert (stats["total"], stats["duplicate"]) == (13, 3)
+    assert stats["chart_labels"] == ["2026-10-17 10:00", "2026-10-17 11:00"]
+    assert stats["chart_duplicate"] == [0, 3]
+
+    # The torn last line is parsed once it is complete
+    with open(path, "a") as handle:
+        handle.write("42536,A01,VAN142536A0014,PASS\n")
+    _touch(path, 2)
+    assert log_viewer._batch_stats(path.name)["total"] == 14
+    assert tail_offsets[0] == 0 and all(offset > len(HEADER) for offset in tail_offsets[1:])
+    assert len(tail_offsets) == 3
+
+
+def test_batch_stats_is_cached_until_the_file_changes(log_dir, tail_offsets):
+    path = log_dir / "MVAN142536.csv"
+    path.write_text(HEADER + _rows(5))
+    first = log_viewer._batch_stats(path.name)
+    first["total"] = -1  # callers get copies
+    assert log_viewer._batch_stats(path.name)["total"] == 5
+    assert len(tail_offsets) == 1
+
+
+def test_batch_stats_reparses_a_log_rewritten_in_place(log_dir, tail_offsets):
+    path = log_dir / "MVAN142536.csv"
+    path.write_text(HEADER + _rows(10))
+    log_viewer._batch_stats(path.name)
+    inode = path.stat().st_ino
+    with open(path, "w") as handle:
+        handle.write(HEADER + _rows(20, hour="12", status="DUPLICATE"))
+    _touch(path)
+    assert path.stat().st_ino == inode
+    stats = log_viewer._batch_stats(path.name)
+    assert (stats["total"], stats["pass"], stats["duplicate"]) == (20, 0, 20)
+    assert stats["chart_labels"] == ["2026-10-17 12:00"]
+    assert tail_offsets == [0, 0]
+
+
+def test_batch_stats_fast_path_is_cached(log_dir, tail_offsets, monkeypatch):
+    path = log_dir / "MVAN142536.csv"
+    path.write_text(HEADER + _rows(8) + _rows(2, hour="11", start=9, status="DUPLICATE"))
+    summary = BatchSummary.build(path)
+    summary.save(summary.csv_size)
+    stats = log_viewer._batch_stats(path.name)
+    assert (stats["total"], stats["pass"], stats["duplicate"]) == (10, 8, 2)
+    assert stats["chart_labels"] == ["2026-10-17 10:00", "2026-10-17 11:00"]
+    assert tail_offsets == []
+
+    def unexpected(path):
+        raise AssertionError("summary read again")
+
+    monkeypatch.setattr(log_viewer, "_summary_batch_stats", unexpected)
+    assert log_viewer._batch_stats(path.name)["total"] == 10
+
+
+@pytest.fixture
+def client(log_dir):
+    return log_viewer.app.test_client()
+
+
+@pytest.fixture
+def indexer(log_dir, monkeypatch):
+    """A synchronously driven LogIndexer behind the viewer; call index_once() after writing logs."""
+    indexer = LogIndexer(log_dir)
+    monkeypatch.setattr(log_viewer, "_INDEXER_ENABLED", True)
+    monkeypatch.setattr(log_viewer, "_INDEXER", indexer)
+    yield indexer
+    indexer.close()
+
+
+# ---------------- JSON API ----------------
+def test_api_needs_a_ready_index(client, indexer):
+    response = client.get("/api/batches")
+    assert response.status_code == 503
+    assert response.get_json() == {"error": "index not ready"}
+
+
+def test_api_batches_pages_by_name(client, indexer):
+    for number in range(5):
+        (indexer.log_dir / f"MVAN14253{number}.csv").write_text(HEADER + _rows(number + 1))
+    indexer.index_once()
+
+    names, cursor = [], ""
+    while True:
+        page = client.get(f"/api/batches?limit=2&cursor={cursor}").get_json()
+        assert len(page["items"]) <= 2
+        names += [item["name"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert names == [f"MVAN14253{number}.csv" for number in range(5)]
+    first = client.get("/api/batches").get_json()["items"][0]
+    assert (first["total"], first["pass"], first["first_time"]) == (1, 1, "2026-10-17 10:00:00")
+
+    assert client.get("/api/batches?limit=0").status_code == 400
+    assert client.get(f"/api/batches?limit={log_viewer.API_MAX_LIMIT + 1}").status_code == 400
+    assert client.get("/api/batches?limit=ten").status_code == 400
+
+
+def test_api_batch_rows_filters_and_pages(client, indexer):
+    path = indexer.log_dir / "MVAN142536.csv"
+    path.write_text(HEADER + _rows(6) + _rows(4, hour="11", start=7, status="DUPLICATE"))
+    indexer.index_once()
+    url = f"/api/batches/{path.name}/rows"
+
+    page = client.get(url + "?limit=4").get_json()
+    assert [item["qr"] for item in page["items"]] == [f"VAN142536A{serial:04d}" for serial in range(1, 5)]
+    rest = client.get(f"{url}?limit=100&cursor={page['next_cursor']}").get_json()
+    assert len(rest["items"]) == 6 and rest["next_cursor"] is None
+
+    duplicates = client.get(url + "?status=duplicate").get_json()["items"]
+    assert [item["qr"][-4:] for item in duplicates] == ["0007", "0008", "0009", "0010"]
+    window = client.get(url + "?from=2026-10-17T10:00:02&to=2026-10-17 11:00:00").get_json()["items"]
+    assert [item["qr"][-4:] for item in window] == ["0003", "0004", "0005", "0006"]
+    assert len(client.get(url + "?qr_prefix=VAN142536A001").get_json()["items"]) == 1
+    assert client.get(url + "?mould=B02").get_json()["items"] == []
+
+    assert client.get(url + "?from=yesterday").status_code == 400
+    assert client.get("/api/batches/missing.csv/rows").status_code == 404
+
+
+# ---------------- Export ----------------
+def _export_logs(log_dir):
+    (log_dir / "MVAN142536.csv").write_text(HEADER + _rows(6) + _rows(4, hour="11", start=7, status="DUPLICATE"))
+    (log_dir / "MVBN142537.csv").write_text(HEADER + _rows(5, hour="12", start=20).replace("VAN", "VBN"))
+    _touch(log_dir / "MVBN142537.csv")
+
+
+def _csv_rows(data):
+    return [line.split(",") for line in data.decode("utf-8").splitlines()[1:]]
+
+
+def test_export_streams_a_filtered_gzip(client, log_dir):
+    _export_logs(log_dir)
+    response = client.get("/export")
+    assert response.is_streamed
+    assert response.mimetype == "application/gzip"
+    assert response.headers["Content-Disposition"].endswith(".csv.gz")
+    rows = _csv_rows(gzip.decompress(response.get_data()))
+    assert [row[3][-4:] for row in rows] == [f"{serial:04d}" for serial in [*range(1, 11), *range(20, 25)]]
+
+    response = client.get("/export?status=duplicate,invalid format&line=A")
+    assert [row[3][-4:] for row in _csv_rows(gzip.decompress(response.get_data()))] == ["0007", "0008", "0009", "0010"]
+    response = client.get("/export?from=2026-10-17T10:00:04&to=2026-10-17T12:00:02")
+    rows = _csv_rows(gzip.decompress(response.get_data()))
+    assert [row[3][-4:] for row in rows] == ["0005", "0006", "0007", "0008", "0009", "0010", "0020", "0021"]
+    response = client.get("/export?line=B")
+    assert [row[1] for row in _csv_rows(gzip.decompress(response.get_data()))] == ["MVBN142536"] * 5
+
+
+def test_export_zip_has_one_member_per_batch(client, log_dir):
+    _export_logs(log_dir)
+    response = client.get("/export?format=zip&batch=MVAN142536&status=PASS")
+    assert response.mimetype == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(response.get_data())) as archive:
+        assert archive.namelist() == ["MVAN142536.csv"]
+        data = archive.read("MVAN142536.csv")
+    assert data.decode("utf-8").splitlines()[0] == HEADER.strip()
+    assert len(_csv_rows(data)) == 6
+
+    response = client.get("/export?format=zip")
+    with zipfile.ZipFile(io.BytesIO(response.get_data())) as archive:
+        assert sorted(archive.namelist()) == ["MVAN142536.csv", "MVBN142537.csv"]
+    assert client.get("/export?format=tar").status_code == 400
+
+
+def test_export_is_sent_in_chunks(client, log_dir, monkeypatch):
+    monkeypatch.setattr(log_viewer, "EXPORT_CHUNK_BYTES", 4096)
+    # Random moulds keep the data from compressing into a single deflate block
+    rows = "".join(row.replace(",A01,", f",{os.urandom(16).hex()},") for row in _rows(2000).splitlines(True))
+    (log_dir / "MVAN142536.csv").write_text(HEADER + rows)
+    for fmt in ("gz", "zip"):
+        response = client.get(f"/export?format={fmt}", buffered=False)
+        chunks = list(response.response)
+        response.close()
+        assert len(chunks) >= 3
+        data = b"".join(chunks)
+        if fmt == "gz":
+            assert len(_csv_rows(gzip.decompress(data))) == 2000
+        else:
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                assert len(_csv_rows(archive.read("MVAN142536.csv"))) == 2000
+
+
+# ---------------- Live feed ----------------
+@pytest.fixture
+def tailer(log_dir, monkeypatch):
+    tailer = LiveTailer(log_dir, poll_interval=0.02)
+    monkeypatch.setattr(log_viewer, "_LIVE_TAILER", tailer)
+    yield tailer
+    tailer.stop()
+
+
+def test_live_streams_new_rows_as_events(client, log_dir, tailer, monkeypatch):
+    monkeypatch.setattr(log_viewer, "LIVE_KEEPALIVE_SECONDS", 0.05)
+    path = log_dir / "MVAN142536.csv"
+    path.write_text(HEADER + _rows(2))
+    response = client.get("/live", buffered=False)
+    assert response.mimetype == "text/event-stream"
+    assert response.headers["Cache-Control"] == "no-cache"
+    stream = iter(response.response)
+    assert next(stream) == b"retry: 3000\n\n"
+    assert tailer.subscriber_count == 1
+    assert next(stream) == b": keepalive\n\n"
+
+    with open(path, "a") as handle:
+        handle.write(_rows(1, start=3, status="DUPLICATE"))
+    chunk = next(stream)
+    while chunk == b": keepalive\n\n":
+        chunk = next(stream)
+    event_line, data_line = chunk.decode("utf-8").strip().split("\n")
+    assert event_line == "event: scan"
+    event = json.loads(data_line[len("data: "):])
+    assert (event["qr"], event["status"]) == ("VAN142536A0003", "DUPLICATE")
+    assert event["counters"] == {"total": 3, "pass": 2, "duplicate": 1, "other": 0}
+
+    response.close()
+    assert tailer.subscriber_count == 0
+
+
+# ---------------- Conditional caching and compression ----------------
+def test_csv_download_revalidates_and_gzips(client, log_dir):
+    path = log_dir / "MVAN142536.csv"
+    path.write_text(HEADER + _rows(50))
+    plain = client.get("/batch/MVAN142536.csv")
+    assert plain.status_code == 200 and plain.get_data(as_text=True) == path.read_text()
+    etag = plain.headers["ETag"]
+    assert plain.headers["Last-Modified"] and "no-cache" in plain.headers["Cache-Control"]
+    assert client.get("/batch/MVAN142536.csv", headers={"If-None-Match": etag}).status_code == 304
+    since = {"If-Modified-Since": plain.headers["Last-Modified"]}
+    assert client.get("/batch/MVAN142536.csv", headers=since).status_code == 304
+
+    packed = client.get("/batch/MVAN142536.csv", headers={"Accept-Encoding": "gzip"})
+    assert packed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(packed.get_data()) == path.read_bytes()
+    assert packed.headers["ETag"] == etag[:-1] + '-gz"'
+    for tag in (etag, packed.headers["ETag"]):
+        response = client.get("/batch/MVAN142536.csv", headers={"If-None-Match": tag, "Accept-Encoding": "gzip"})
+        assert response.status_code == 304
+
+    with open(path, "a") as handle:
+        handle.write(_rows(1, start=51))
+    _touch(path)
+    assert client.get("/batch/MVAN142536.csv", headers={"If-None-Match": etag}).status_code == 200
+    assert client.get("/batch/missing.csv").status_code == 404
+
+
+def test_pages_revalidate_and_gzip(client, log_dir):
+    path = log_dir / "MVAN142536.csv"
+    path.write_text(HEADER + _rows(20))
+    for url in ("/batch/MVAN142536.csv/details", "/trends"):
+        page = client.get(url)
+        assert page.status_code == 200
+        etag = page.headers["ETag"]
+        assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+        packed = client.get(url, headers={"Accept-Encoding": "gzip"})
+        assert packed.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in packed.headers["Vary"]
+        assert gzip.decompress(packed.get_data()) == page.get_data()
+        response = client.get(url, headers={"If-None-Match": packed.headers["ETag"], "Accept-Encoding": "gzip"})
+        assert response.status_code == 304
+
+    etag = client.get("/trends").headers["ETag"]
+    (log_dir / "MVAN142537.csv").write_text(HEADER + _rows(5, hour="11"))
+    assert client.get("/trends", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_templates_are_not_compiled_per_request(client, log_dir, monkeypatch):
+    (log_dir / "MVAN142536.csv").write_text(HEADER + _rows(5))
+
+    def compile_again(*args, **kwargs):
+        raise AssertionError("template compiled during a request")
+
+    monkeypatch.setattr(log_viewer.app.jinja_env, "compile", compile_again)
+    assert client.get("/batch/MVAN142536.csv/details").status_code == 200
+    assert client.get("/trends").status_code == 200
+
+
+# ---------------- Health ----------------
+@pytest.fixture
+def sampler(log_dir, tailer, monkeypatch):
+    sampler = HealthSampler(log_dir, tailer, interval=0.02, history=3)
+    monkeypatch.setattr(log_viewer, "_HEALTH_SAMPLER", sampler)
+    yield sampler
+    sampler.stop()
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_health_reports_latest_sample_and_bounded_history(client, log_dir, sampler):
+    body = client.get("/health").get_json()
+    assert body["interval"] == 0.02
+    fields = {"time", "temp_c", "load1", "disk_pct", "mem_available_mb", "scans_per_min", "last_scan_age"}
+    assert set(body["latest"]) >= fields
+    assert body["latest"]["disk_pct"] is not None
+
+    _wait_for(lambda: len(sampler.history()) == 3)
+    time.sleep(0.1)
+    history = client.get("/health").get_json()["history"]
+    assert len(history) == 3  # the ring buffer drops the oldest samples
+    assert [sample["time"] for sample in history] == sorted(sample["time"] for sample in history)
+    newer = client.get(f"/health?since={history[1]['time']}").get_json()["history"]
+    assert newer and all(sample["time"] > history[1]["time"] for sample in newer)
+    assert client.get("/health?since=noon").status_code == 400
+
+
+def test_health_tracks_scans_through_the_tailer(client, log_dir, sampler):
+    path = log_dir / "MVAN142536.csv"
+    path.write_text(HEADER)
+    assert client.get("/health").get_json()["latest"]["last_scan"] is not None  # the file's mtime at start
+    with open(path, "a") as handle:
+        handle.write(_rows(5))
+    _wait_for(lambda: sampler._tailer.rows_seen == 5)
+    _wait_for(lambda: sampler.latest()["last_scan"] == sampler._tailer.last_row_time)
+    assert client.get("/health").get_json()["latest"]["last_scan_age"] < 5
+
+
+def test_live_clients_are_capped(client, log_dir, tailer, monkeypatch):
+    monkeypatch.setattr(log_viewer, "_LIVE_SLOTS", threading.BoundedSemaphore(2))
+    streams = [client.get("/live", buffered=False) for _ in range(2)]
+    refused = client.get("/live")
+    assert refused.status_code == 503
+    assert refused.headers["Retry-After"] == "30"
+    assert tailer.subscriber_count == 2
+
+    # A stream closed before it sent anything still gives its slot back
+    streams.pop().close()
+    assert tailer.subscriber_count == 1
+    streams.append(client.get("/live", buffered=False))
+    assert streams[-1].status_code == 200
+    for response in streams:
+        response.close()
+    assert tailer.subscriber_count == 0
@@ -0,0 +1,213 @@
+"""pytest coverage for the scan-path helpers in logic."""
+
+import csv
+import json
+import random
+
+import pytest
+
+import logic
+from logic import LOG_HEADER, BatchContext, BatchLogWriter, MouldRangeIndex, handle_qr_scan, validate_many
+
+
+def _read_rows(path):
+    with open(path, newline="", encoding="utf-8") as handle:
+        return list(csv.reader(handle))
+
+
+# ---------------- BatchLogWriter ----------------
+def test_writer_drain_makes_rows_visible(tmp_path):
+    path = tmp_path / "MVAN142536.csv"
+    writer = BatchLogWriter(str(path), flush_rows=1000, flush_interval_ms=60000)
+    for serial in range(1, 6):
+        writer.write("MVAN142536", "A01", f"VAN142536A{serial:04d}", "PASS")
+    writer.drain()
+    rows = _read_rows(path)
+    assert rows[0] == LOG_HEADER
+    assert [row[3] for row in rows[1:]] == [f"VAN142536A{serial:04d}" for serial in range(1, 6)]
+    writer.close()
+
+
+def test_writer_close_flushes_and_append_keeps_one_header(tmp_path):
+    path = tmp_path / "MVAN142536.csv"
+    writer = BatchLogWriter(str(path), fsync="close")
+    writer.write("MVAN142536", None, "VAN142536A0001", "PASS")
+    writer.close()
+    assert writer.closed
+    with pytest.raises(ValueError):
+        writer.write("MVAN142536", "A01", "VAN142536A0002", "PASS")
+
+    writer = BatchLogWriter(str(path), append=True)
+    writer.write("MVAN142536", "A01", "VAN142536A0001", "DUPLICATE")
+    writer.close()
+    rows = _read_rows(path)
+    assert rows[0] == LOG_HEADER and LOG_HEADER not in rows[1:]
+    assert [(row[2], row[4]) for row in rows[1:]] == [("UNKNOWN", "PASS"), ("A01", "DUPLICATE")]
+
+
+def test_writer_survives_write_errors(tmp_path, monkeypatch):
+    path = tmp_path / "MVAN142536.csv"
+    writer = BatchLogWriter(str(path))
+    original = writer._summary.save
+    calls = []
+
+    def failing_save(offset):
+        calls.append(offset)
+        if len(calls) == 1:
+            raise OSError("disk full")
+        original(offset)
+
+    monkeypatch.setattr(writer._summary, "save", failing_save)
+    writer.write("MVAN142536", "A01", "VAN142536A0001", "PASS")
+    writer.drain()
+    writer.write("MVAN142536", "A01", "VAN142536A0002", "PASS")
+    writer.close()
+    assert len(calls) == 2
+    assert len(_read_rows(path)) == 3
+
+
+def test_writer_raises_once_thread_is_dead(tmp_path):
+    writer = BatchLogWriter(str(tmp_path / "MVAN142536.csv"))
+    writer._put(writer._STOP)
+    writer._thread.join()
+    with pytest.raises(RuntimeError):
+        writer.write("MVAN142536", "A01", "VAN142536A0001", "PASS")
+    with pytest.raises(RuntimeError):
+        writer.drain()
+    writer.close()
+    assert writer.closed
+
+
+def test_writer_rejects_unknown_fsync_policy(tmp_path):
+    with pytest.raises(ValueError):
+        BatchLogWriter(str(tmp_path / "MVAN142536.csv"), fsync="sometimes")
+
+
+# ---------------- Recovery ----------------
+@pytest.fixture
+def recovery_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(logic, "LOG_FOLDER", str(tmp_path))
+    yield tmp_path
+    logic.clear_recovery_state()
+
+
+def test_recovery_replays_journal(recovery_dir):
+    logic.save_recovery_state({"batch_number": "MVAN142536", "counters": {"total": 2, "accepted": 2}})
+    logic.append_recovery_scan("VAN142536A0003", "PASS")
+    logic.append_recovery_scan("VAN142536A0003", "DUPLICATE")
+    logic.append_recovery_scan("VAN142536Z0001", "OUT OF BATCH")
+    state = logic.load_recovery_state()
+    assert state["counters"] == {"total": 5, "accepted": 3, "duplicate": 1, "rejected": 1}
+    assert (state["last_qr"], state["last_status"]) == ("VAN142536Z0001", "OUT OF BATCH")
+
+
+@pytest.mark.parametrize("bad_line", ['["VAN142536A0009", "PA', "null", "{}", "5", '["VAN142536A0009"]', "[1, 2]"])
+def test_recovery_stops_at_torn_or_garbage_line(recovery_dir, bad_line):
+    logic.save_recovery_state({"counters": {"total": 0}})
+    logic.append_recovery_scan("VAN142536A0001", "PASS")
+    logic._close_recovery_journal()
+    with open(logic._recovery_journal_path(), "a", encoding="utf-8") as handle:
+        handle.write(bad_line + "\n" + json.dumps(["VAN142536A0002", "PASS"]) + "\n")
+    state = logic.load_recovery_state()
+    assert state["counters"] == {"total": 1, "accepted": 1}
+    assert state["last_qr"] == "VAN142536A0001"
+
+
+@pytest.mark.parametrize("checkpoint", ["{not json", "[]", "null"])
+def test_recovery_discards_bad_checkpoint(recovery_dir, checkpoint):
+    with open(logic._recovery_path(), "w", encoding="utf-8") as handle:
+        handle.write(checkpoint)
+    assert logic.load_recovery_state() is None
+    assert not (recovery_dir / logic.RECOVERY_FILE).exists()
+
+
+# ---------------- Range checks ----------------
+SPANNING = {"A01": ("VAN142536A9990", "VAN142536B0010")}
+
+
+@pytest.mark.parametrize(
+    "code, expected",
+    [
+        ("VAN142536A9990", ("PASS", "A01")),
+        ("VAN142536A9999", ("PASS", "A01")),
+        ("VAN142536B0000", ("PASS", "A01")),
+        ("VAN142536B0010", ("PASS", "A01")),
+        ("VAN142536A9989", ("OUT OF BATCH", None)),
+        ("VAN142536B0011", ("OUT OF BATCH", None)),
+        ("VAN142536AABCD", ("OUT OF BATCH", None)),
+        ("VAN142536A99X9", ("OUT OF BATCH", None)),
+        ("VAN142536BABCD", ("OUT OF BATCH", None)),
+    ],
+)
+def test_range_spanning_alpha_blocks(code, expected):
+    assert handle_qr_scan(code, "A", SPANNING) == expected
+
+
+def test_range_bounds_need_numeric_serials():
+    with pytest.raises(ValueError):
+        MouldRangeIndex({"A01": ("VAN142536AABCD", "VAN142536B0010")})
+
+
+# ---------------- Bulk validation ----------------
+MULTI = {
+    "A01": ("VAN142536A0001", "VAN142536A0100"),
+    "A02": ("VAN142536A9990", "VAN142536C0010"),
+    "B01": ("VAN142537A0500", "VAN142537A0600"),
+}
+EDGE_CODES = [
+    "VAN142536A0001",
+    "VAN142536A0100",
+    "VAN142536A0101",
+    "VAN142536A9990",
+    "VAN142536B5000",
+    "VAN142536C0010",
+    "VAN142536C0011",
+    "VAN142536AABCD",
+    "VAN142536A99X9",
+    "VAN142536BABCD",
+    "VAN142536B\uff10\uff10\uff10\uff11",
+    "VAN142537A0550",
+    "VAN142537A0601",
+    "VBN142536A0002",
+    "VAN142536A0001",
+    "VAN142536A000",
+    "VAN142536A00-1",
+    "VAN142536A00011",
+    "",
+]
+
+
+def _scan_one_by_one(codes, context):
+    seen = set()
+
+    def claim(code):
+        if code in seen:
+            return False
+        seen.add(code)
+        return True
+
+    return [handle_qr_scan(code, context.line, context.range_index, claim=claim) for code in codes]
+
+
+@pytest.mark.parametrize("line", ["A", "B", ""])
+def test_validate_many_matches_handle_qr_scan(line):
+    pytest.importorskip("numpy")
+    context = BatchContext.create("MVAN142536", line, MULTI)
+    assert validate_many(EDGE_CODES, context) == _scan_one_by_one(EDGE_CODES, context)
+
+
+def test_validate_many_matches_handle_qr_scan_on_random_codes():
+    pytest.importorskip("numpy")
+    rng = random.Random(1)
+    heads = ["VAN142536A", "VAN142536B", "VAN142536C", "VAN142536D", "VAN142537A", "VAN142535Z", "VBN142536B"]
+    tails = "0123456789X"
+    codes = [rng.choice(heads) + "".join(rng.choice(tails) for _ in range(4)) for _ in range(5000)]
+    context = BatchContext.create("MVAN142536", "A", MULTI)
+    assert validate_many(codes, context) == _scan_one_by_one(codes, context)
+
+
+def test_validate_many_without_ranges():
+    pytest.importorskip("numpy")
+    context = BatchContext.create("MVAN142536", "A", {})
+    assert validate_many(["VAN142536A0001"], context) == [("OUT OF BATCH", None)]
+    assert validate_many([], context) == []
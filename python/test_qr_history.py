@@ -0,0 +1,55 @@
+"""pytest coverage for the cross-batch duplicate guard."""
+
+from qr_history import _MAGIC, BloomFilter, GlobalDuplicateGuard
+
+
+def test_guard_remembers_the_first_accepting_batch(tmp_path):
+    guard = GlobalDuplicateGuard(tmp_path / "qr_history.db", capacity=1000)
+    guard.record_many([("MVAN142536", "VAN142536A0001"), ("MVAN142537", "VAN142536A0001")])
+    assert guard.accepted_batch("VAN142536A0001") == "MVAN142536"
+    assert guard.seen_in_other_batch("MVAN142537", "VAN142536A0001")
+    assert not guard.seen_in_other_batch("MVAN142536", "VAN142536A0001")
+    assert guard.accepted_batch("VAN142536A0002") is None
+    guard.close()
+
+
+def test_filter_hits_are_confirmed_against_the_table(tmp_path):
+    guard = GlobalDuplicateGuard(tmp_path / "qr_history.db", capacity=1000)
+    # A stray bit pattern: the filter claims the code, the table does not have it
+    guard._bloom.add("VAN142536A0009")
+    assert guard.accepted_batch("VAN142536A0009") is None
+    guard.close()
+
+
+def test_filter_is_rebuilt_unless_sealed(tmp_path):
+    db_path = tmp_path / "qr_history.db"
+    guard = GlobalDuplicateGuard(db_path, capacity=1000)
+    guard.record_many([("MVAN142536", f"VAN142536A{serial:04d}") for serial in range(1, 101)])
+    guard.close()
+
+    # Reopening a sealed filter maps it as is
+    guard = GlobalDuplicateGuard(db_path, capacity=1000)
+    assert not guard._bloom.created
+    guard.close()
+
+    # A fill cut short leaves the magic zeroed, so the next start rebuilds
+    bloom_path = db_path.with_suffix(".bloom")
+    with open(bloom_path, "r+b") as handle:
+        handle.write(bytes(len(_MAGIC)))
+        handle.seek(64)
+        handle.write(bytes(len(bloom_path.read_bytes()) - 64))
+    guard = GlobalDuplicateGuard(db_path, capacity=1000)
+    assert guard._bloom.created
+    assert all(guard.accepted_batch(f"VAN142536A{serial:04d}") == "MVAN142536" for serial in range(1, 101))
+    guard.close()
+
+
+def test_filter_has_no_false_negatives_and_few_false_positives(tmp_path):
+    bloom = BloomFilter(tmp_path / "test.bloom", capacity=20000, error_rate=0.001)
+    codes = [f"VAN142536{chr(65 + serial // 10000)}{serial % 10000:04d}" for serial in range(20000)]
+    for code in codes:
+        bloom.add(code)
+    assert all(code in bloom for code in codes)
+    false_positives = sum(f"VBN142536A{serial:04d}" in bloom for serial in range(10000))
+    assert false_positives < 50
+    bloom.close()
@@ -0,0 +1,86 @@
+"""pytest coverage for the binary scan log."""
+
+from scan_binlog import (
+    _HEADER,
+    _RECORD,
+    NO_SERIAL,
+    STATUS_CODES,
+    STATUS_OTHER,
+    ScanLogWriter,
+    convert_csv,
+    read_moulds,
+    read_scan_log,
+)
+
+RECORDS = [
+    (1000, "A01", "VAN142536A0001", "PASS"),
+    (2000, "A01", "VAN142536A0001", "DUPLICATE"),
+    (3000, "B02", "VAN142536B0042", "PASS"),
+    (4000, None, "garbage", "INVALID FORMAT"),
+    (5000, "UNKNOWN", "VAN142536A9999", "REVIEW"),
+]
+
+
+def _write(path, records, append=False):
+    writer = ScanLogWriter(path, append=append)
+    writer.write_records(records)
+    writer.close()
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "MVAN142536.scans"
+    _write(path, RECORDS)
+    scans = read_scan_log(path)
+    assert scans["ts_ms"].tolist() == [1000, 2000, 3000, 4000, 5000]
+    assert scans["status"].tolist() == [0, 1, 0, STATUS_CODES.index("INVALID FORMAT"), STATUS_OTHER]
+    assert scans["line"].tolist() == [ord("A")] * 3 + [ord("a"), ord("A")]
+    assert scans["mould"].tolist() == [1, 1, 2, 0, 0]
+    assert scans["serial"].tolist() == [1, 1, 10042, NO_SERIAL, 9999]
+    assert scans["qr"][2] == b"VAN142536B0042"
+    assert read_moulds(path) == ["A01", "B02"]
+
+
+def test_append_keeps_mould_indexes(tmp_path):
+    path = tmp_path / "MVAN142536.scans"
+    _write(path, RECORDS[:3])
+    _write(path, [(6000, "C03", "VAN142536A0002", "PASS"), (7000, "B02", "VAN142536B0043", "PASS")], append=True)
+    scans = read_scan_log(path)
+    assert len(scans) == 5
+    assert scans["mould"].tolist() == [1, 1, 2, 3, 2]
+    assert read_moulds(path) == ["A01", "B02", "C03"]
+
+
+def test_append_drops_a_torn_record(tmp_path):
+    path = tmp_path / "MVAN142536.scans"
+    _write(path, RECORDS[:2])
+    with open(path, "ab") as handle:
+        handle.write(b"\x01" * (_RECORD.size // 2))
+    _write(path, RECORDS[2:3], append=True)
+    scans = read_scan_log(path)
+    assert path.stat().st_size == _HEADER.size + 3 * _RECORD.size
+    assert scans["qr"].tolist() == [b"VAN142536A0001", b"VAN142536A0001", b"VAN142536B0042"]
+
+
+def test_append_rewrites_a_missing_header(tmp_path):
+    for prefix in (b"", b"QRSC", bytes(_HEADER.size)):
+        path = tmp_path / "MVAN142536.scans"
+        path.write_bytes(prefix)
+        _write(path, RECORDS[:2], append=True)
+        scans = read_scan_log(path)
+        assert path.stat().st_size == _HEADER.size + 2 * _RECORD.size
+        assert scans["mould"].tolist() == [1, 1]
+        assert read_moulds(path) == ["A01"]
+
+
+def test_convert_csv_skips_header_and_bad_rows(tmp_path):
+    csv_path = tmp_path / "MVAN142536.csv"
+    csv_path.write_text(
+        "Timestamp,BatchNumber,Mould,QRCode,Status\n"
+        "2026-10-17 10:00:00,MVAN142536,A01,VAN142536A0001,pass\n"
+        "not a time,MVAN142536,A01,VAN142536A0002,PASS\n"
+        "short,row\n"
+        "2026-10-17 10:00:01,MVAN142536,A01,VAN142536A0001,DUPLICATE\n"
+    )
+    scans = read_scan_log(convert_csv(csv_path))
+    assert scans["status"].tolist() == [0, 1]
+    assert scans["ts_ms"][1] - scans["ts_ms"][0] == 1000
@@ -0,0 +1,26 @@
+"""pytest coverage for the production entry point's gunicorn hook."""
+
+import threading
+
+import log_viewer
+import serve_log_viewer
+
+
+def test_post_fork_renices_and_warms_the_worker(monkeypatch):
+    warmed = threading.Event()
+    niced = []
+    monkeypatch.setenv("LOG_VIEWER_NICE", "7")
+    monkeypatch.setattr(serve_log_viewer, "_lower_priority", niced.append)
+    monkeypatch.setattr(log_viewer, "warm_caches", warmed.set)
+    serve_log_viewer.post_fork(server=None, worker=None)
+    assert niced == [7]
+    assert warmed.wait(5)
+
+
+def test_post_fork_can_skip_warming(monkeypatch):
+    monkeypatch.setenv("LOG_VIEWER_WARM", "0")
+    started = []
+    monkeypatch.setattr(serve_log_viewer, "_lower_priority", lambda increment: None)
+    monkeypatch.setattr(serve_log_viewer, "_start_warming", lambda: started.append(True))
+    serve_log_viewer.post_fork(server=None, worker=None)
+    assert started == []